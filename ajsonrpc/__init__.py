@@ -1,4 +1,25 @@
-from .dispatcher import Dispatcher
-from .manager import AsyncJSONRPCResponseManager
+import importlib
 
 __version__ = "2.2.9"
+
+# name -> submodule, imported on first access (PEP 562)
+_LAZY_NAMES = {
+    'Dispatcher': 'dispatcher',
+    'AsyncJSONRPCResponseManager': 'manager',
+}
+
+__all__ = list(_LAZY_NAMES)
+
+
+def __getattr__(name: str):
+    try:
+        module_name = _LAZY_NAMES[name]
+    except KeyError:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}') from None
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES))
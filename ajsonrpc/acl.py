@@ -0,0 +1,34 @@
+"""Compiled ACL of methods.
+
+MethodSettings.acl maps module name to required access bits:
+{ module_name: min_lvl, }, user acl (request.extra_data['user_acl']) maps
+module name to user access bits. Access is granted if any module of method
+acl is granted to user with all required bits, independent of modules order.
+
+Rules are compiled once per method, a check is a few dict lookups, so
+decisions are not memoized: a fingerprint of the user acl costs more than
+the check itself.
+
+"""
+from typing import Mapping
+
+
+class CompiledACL:
+
+    """ACL check of method."""
+
+    __slots__ = ('rules',)
+
+    def __init__(self, acl: Mapping[str, int]):
+        """
+        acl: { module_name: required access bits, }
+        """
+        # (module_name, required bits), sorted for deterministic evaluation
+        self.rules = tuple(sorted(acl.items(), key=lambda rule: str(rule[0])))
+
+    def allows(self, user_acl: Mapping[str, int]) -> bool:
+        for module_name, required in self.rules:
+            granted = user_acl.get(module_name)
+            if granted is not None and granted & required == required:
+                return True
+        return False
@@ -0,0 +1,117 @@
+"""Admission control and load shedding.
+
+Saturated worker should reject new work before it is parsed, authenticated
+and queued, otherwise all of the queued requests miss their deadlines.
+Load is estimated by number of in-flight calls and event loop lag.
+
+"""
+import asyncio
+from typing import Optional
+
+import logging
+logger = logging.getLogger()
+
+
+class LoopLagMonitor:
+
+    """Measure event loop lag: delay of a callback scheduled with call_later."""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        # last measured lag, seconds
+        self.lag = 0.0
+        self._loop = None
+        self._handle = None
+        self._expected = None
+
+    @property
+    def running(self) -> bool:
+        return self._handle is not None and self._loop is not None and not self._loop.is_closed()
+
+    def start(self, loop: asyncio.AbstractEventLoop = None) -> None:
+        if self.running:
+            return
+        self._loop = loop or asyncio.get_event_loop()
+        self._schedule()
+
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+        self._handle = None
+        self.lag = 0.0
+
+    def _schedule(self) -> None:
+        self._expected = self._loop.time() + self.interval
+        self._handle = self._loop.call_later(self.interval, self._tick)
+
+    def _tick(self) -> None:
+        self.lag = max(self._loop.time() - self._expected, 0.0)
+        self._schedule()
+
+
+class AdmissionController:
+
+    """Decide if new work is admitted.
+
+    Load is the highest ratio of in-flight calls to max_inflight and loop lag
+    to max_loop_lag. Request with priority p is rejected when
+    load >= 1 + p * priority_step, so critical (higher priority) methods are
+    shed last. Negative priorities are shed first.
+
+    """
+
+    def __init__(self,
+                 max_inflight: Optional[int] = None,
+                 max_loop_lag: Optional[float] = None,
+                 priority_step: float = 0.25,
+                 http_priority: int = 0,
+                 lag_interval: float = 0.1):
+        """
+        max_inflight: limit of executing calls, None - no limit
+        max_loop_lag: limit of event loop lag in seconds, None - no limit
+        priority_step: extra load allowed per priority level
+        http_priority: priority used for early (before auth and parse) http-level checks,
+            set it to the highest method priority to shed on http level only when critical methods are shed too
+        lag_interval: loop lag measure interval in seconds
+        """
+        self.max_inflight = max_inflight
+        self.max_loop_lag = max_loop_lag
+        self.priority_step = priority_step
+        self.http_priority = http_priority
+        self.lag_monitor = LoopLagMonitor(lag_interval) if max_loop_lag else None
+        # number of rejected requests
+        self.rejected = 0
+
+    def load(self, inflight: int) -> float:
+        load = 0.0
+        if self.max_inflight:
+            load = inflight / self.max_inflight
+        if self.lag_monitor:
+            if not self.lag_monitor.running:
+                self.lag_monitor.start()
+            load = max(load, self.lag_monitor.lag / self.max_loop_lag)
+        return load
+
+    def admit(self, inflight: int, priority: int = 0) -> bool:
+        """Check if new call is admitted, inflight - number of executing calls (without new one)."""
+        if self.load(inflight) < 1 + (priority or 0) * self.priority_step:
+            return True
+
+        self.rejected += 1
+        logger.debug(f'{self.__class__.__name__}::admit: msg=request is rejected, {inflight=}, {priority=}, '
+                     f'lag={self.lag_monitor.lag if self.lag_monitor else None}')
+        return False
+
+    def admit_http(self, inflight: int) -> bool:
+        """Early check of http request, before auth and parse."""
+        return self.admit(inflight, self.http_priority)
+
+    def stats(self, inflight: int) -> dict:
+        return dict(
+            inflight=inflight,
+            max_inflight=self.max_inflight,
+            loop_lag=self.lag_monitor.lag if self.lag_monitor else None,
+            max_loop_lag=self.max_loop_lag,
+            load=self.load(inflight),
+            rejected=self.rejected,
+        )
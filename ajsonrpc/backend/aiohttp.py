@@ -1,41 +1,83 @@
+import asyncio
 import inspect
 try:
     import ujson as json
 except Exception:
     import json
-from aiohttp.web import Request, Response
+from aiohttp import WSMsgType
+from aiohttp.web import Request, Response, WebSocketResponse
 
+from ..core import JSONRPC20Response, JSONRPC20ServerOverloaded
+from ..pubsub import PubSub, SUBSCRIBER_KEY
 from .common import CommonBackend
 
+import logging
+logger = logging.getLogger()
+
+
+# pre-encoded response for requests rejected by admission control
+OVERLOADED_BODY = json.dumps(JSONRPC20Response(error=JSONRPC20ServerOverloaded()).body).encode()
+
 
 class JSONRPCAiohttp(CommonBackend):
-    def __init__(self, auth_callback=None, finish_callback=None, **kwargs):
+    def __init__(self, auth_callback=None, finish_callback=None, overload_http_status: int = None,
+                 ws_max_concurrency: int = 32, ws_send_queue_size: int = 64, ws_heartbeat: float = 30.0,
+                 ws_max_msg_size: int = 4 * 1024 * 1024, pubsub: PubSub = None, **kwargs):
         super().__init__(**kwargs)
         # return (int - response.status value, dict - auth_data for handlers)
         # if status != 200 - return empty response with status !200
         self.auth_callback = auth_callback
         self.finish_callback = finish_callback
+        # http status for requests rejected by admission control (e.g. 503),
+        # None - respond with pre-encoded json-rpc "Server overloaded" error
+        self.overload_http_status = overload_http_status
+        # websocket connections (see ws_handler):
+        # max number of executing calls of connection, reading of socket waits for a free slot
+        self.ws_max_concurrency = ws_max_concurrency
+        # max number of responses waiting for sending, calls wait for a free place
+        self.ws_send_queue_size = ws_send_queue_size
+        # seconds between pings, None - no pings
+        self.ws_heartbeat = ws_heartbeat
+        self.ws_max_msg_size = ws_max_msg_size
+        # topics pushed to websocket connections, see ajsonrpc.pubsub
+        self.pubsub = pubsub
+
+    def overloaded_response(self) -> Response:
+        if self.overload_http_status:
+            return Response(status=self.overload_http_status)
+        return Response(body=OVERLOADED_BODY, content_type="application/json")
+
+    async def authenticate(self, request: Request) -> (int, dict):
+        """(http status, extra_data of json-rpc requests) by auth_callback"""
+        if self.auth_callback:
+            auth_result = await self.auth_callback(request) \
+                if inspect.iscoroutinefunction(self.auth_callback) \
+                else self.auth_callback(request)
+            resp_status = int(auth_result[0])
+            extra_data = dict(auth_result[1])
+        else:
+            resp_status = 200
+            extra_data = dict()
+
+        if resp_status == 200:
+            extra_data['_ip'] = request.headers.get('X-Real-IP') or request.remote
+            extra_data['_id'] = id(request)
+        return resp_status, extra_data
 
     @property
     def handler(self):
         async def _handler(request: Request):
             resp = None
+            # -- admission control, before auth and parse
+            admission = self.manager.admission
+            if admission and not admission.admit_http(len(self.manager.inflight)):
+                return self.overloaded_response()
+
             # -- check auth
-            if self.auth_callback:
-                auth_result = await self.auth_callback(request) \
-                    if inspect.iscoroutinefunction(self.auth_callback) \
-                    else self.auth_callback(request)
-                resp_status = int(auth_result[0])
-                extra_data = dict(auth_result[1])
-            else:
-                resp_status = 200
-                extra_data = dict()
+            resp_status, extra_data = await self.authenticate(request)
 
             # -- go to json-rpc methods
             if resp_status == 200:
-                extra_data['_ip'] = request.headers.get('X-Real-IP') or request.remote
-                extra_data['_id'] = id(request)
-
                 txt = await request.text()
 
                 rpc_resp = await self.manager.get_response_for_payload(txt, extra_data, self.finish_callback)
@@ -49,3 +91,90 @@ class JSONRPCAiohttp(CommonBackend):
             return resp
 
         return _handler
+
+    @property
+    def ws_handler(self):
+        """
+        websocket connection: every text message is a json-rpc payload, responses are sent
+        as they are ready, the client matches them by id
+        auth_callback is called once per connection, its extra_data is used for all calls
+        """
+        async def _call(payload: str, extra_data: dict, outbound: asyncio.Queue, slots: asyncio.Semaphore):
+            try:
+                rpc_resp = await self.manager.get_response_for_payload(payload, extra_data, self.finish_callback)
+                if rpc_resp:
+                    # waits while send queue is full, the slot is held and reading is paused
+                    await outbound.put(json.dumps(rpc_resp.body))
+            finally:
+                slots.release()
+
+        async def _send(send, outbound: asyncio.Queue, close):
+            while True:
+                payload = await outbound.get()
+                try:
+                    await send(payload)
+                except ConnectionError:
+                    # closed by peer, calls are cancelled by reader
+                    return
+                except Exception as e:
+                    # e.g. RuntimeError of closing websocket: the connection is unusable,
+                    # closing it stops the reader, calls waiting for the queue are cancelled
+                    logger.error(f'{self.__class__.__name__}::ws_handler: msg=fail sending response, '
+                                 f'websocket is closed, {e=}')
+                    await close()
+                    return
+
+        async def _handler(request: Request):
+            # -- admission control, before auth and upgrade
+            admission = self.manager.admission
+            if admission and not admission.admit_http(len(self.manager.inflight)):
+                return self.overloaded_response()
+
+            # -- check auth, once per connection
+            resp_status, extra_data = await self.authenticate(request)
+            if resp_status != 200:
+                return Response(status=resp_status)
+
+            ws = WebSocketResponse(heartbeat=self.ws_heartbeat, max_msg_size=self.ws_max_msg_size)
+            await ws.prepare(request)
+
+            # responses and pushed notifications are sent by different tasks
+            send_lock = asyncio.Lock()
+
+            async def send(payload: str):
+                async with send_lock:
+                    await ws.send_str(payload)
+
+            subscriber = None
+            if self.pubsub:
+                subscriber = extra_data[SUBSCRIBER_KEY] = self.pubsub.subscriber(
+                    send, close=lambda: asyncio.ensure_future(ws.close()))
+
+            slots = asyncio.Semaphore(self.ws_max_concurrency)
+            outbound = asyncio.Queue(self.ws_send_queue_size)
+            sender = asyncio.ensure_future(_send(send, outbound, ws.close))
+            calls = set()
+            try:
+                async for msg in ws:
+                    if msg.type == WSMsgType.TEXT:
+                        payload = msg.data
+                    elif msg.type == WSMsgType.BINARY:
+                        payload = msg.data.decode('utf-8', 'replace')
+                    else:
+                        continue
+
+                    # backpressure: the next message is read when a call slot is free
+                    await slots.acquire()
+                    call = asyncio.ensure_future(_call(payload, extra_data, outbound, slots))
+                    calls.add(call)
+                    call.add_done_callback(calls.discard)
+            finally:
+                # connection is closed, responses could not be delivered
+                for call in calls:
+                    call.cancel()
+                sender.cancel()
+                if subscriber:
+                    self.pubsub.unsubscribe_all(subscriber)
+            return ws
+
+        return _handler
@@ -2,16 +2,37 @@
     base application for jsonrpc2 api with aiohttp
 
     marshmallow==2.20.* is required library
+
+    Names are imported on first access (PEP 562), importing the package does not
+    pull in aiohttp, marshmallow and swagger_gen.
 """
-from .web_app import Application, WAIT_TASKS
-from .aiohttp_controller import BaseHttpController
-from .jsonrpc2_controller import BaseJSONRPC20Controller
-from .jsonrpc2_model import BaseJSONRPC20Model
-from .jsonrpc2_installer import ApiCfg, install_jsonrpc2_apis
-
-# __all__ = [
-#     'Application', 'run_app',
-#     'BaseHttpController',
-#     'BaseJSONRPC20Controller',
-#     'JSONRPCAiohttp',
-# ]
+import importlib
+
+# name -> submodule
+_LAZY_NAMES = {
+    'Application': 'web_app',
+    'WAIT_TASKS': 'web_app',
+    'BaseHttpController': 'aiohttp_controller',
+    'BaseJSONRPC20Controller': 'jsonrpc2_controller',
+    'BaseJSONRPC20Model': 'jsonrpc2_model',
+    'ApiCfg': 'jsonrpc2_installer',
+    'install_jsonrpc2_apis': 'jsonrpc2_installer',
+    'prepare_fork': 'prefork',
+    'GC_STATS': 'prefork',
+}
+
+__all__ = list(_LAZY_NAMES)
+
+
+def __getattr__(name: str):
+    try:
+        module_name = _LAZY_NAMES[name]
+    except KeyError:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}') from None
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES))
@@ -3,9 +3,23 @@ from ajsonrpc.core import JSONRPC20Request
 
 # jsonrpc2 base controller
 class BaseJSONRPC20Controller:
+    # per-call attributes dropped by reset, e.g. ('user', 'cid')
+    reset_attributes = ()
+
     def __init__(self, request: JSONRPC20Request, *args, **kwargs):
         self._request = request
 
+    def reset(self, request: JSONRPC20Request) -> None:
+        """Prepare controller taken from pool for the next call, see ajsonrpc.pool.
+
+        Request is rebound and attributes listed in reset_attributes are
+        dropped, __init__ is not run again. Override it when attributes set
+        by __init__ depend on request.
+        """
+        self._request = request
+        for name in self.reset_attributes:
+            self.__dict__.pop(name, None)
+
     @property
     def request(self) -> JSONRPC20Request:
         return self._request
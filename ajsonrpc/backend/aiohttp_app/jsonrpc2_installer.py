@@ -2,34 +2,76 @@ try:
     import ujson as json
 except Exception:
     import json
+import asyncio
+import functools
+import inspect
 from typing import Callable
 from time import time
 from dataclasses import dataclass
 
 from aiohttp.hdrs import METH_POST, METH_GET
-from aiohttp.web import json_response, Request
+from aiohttp.web import json_response, Request, Response
 
 from ...core import JSONRPC20Response
-from ...dispatcher import Dispatcher
-from ...swagger_gen import generate_swagger_info
+from ...dispatcher import Dispatcher, MethodSettings
+from ...admission import AdmissionController
+from ...tenancy import TenantRateLimiter, FairScheduler
+from ...pubsub import PubSub
+from ...manager import AsyncJSONRPCResponseManager
 from ..aiohttp import JSONRPCAiohttp
 from .web_app import Application
+from .prefork import GC_STATS
 
 import logging
 logger = logging.getLogger()
 
 
-# storage is for saved swaggers jsons
+# storage is for saved swaggers jsons, or functions generating them on first request
 SWAGGER_CFGS = {}
+# serialized swaggers jsons without servers, see swagger_body
+SWAGGER_BODIES = {}
+# background warm up tasks of apis
+WARM_UP_TASKS = set()
+
+
+def generate_api_swagger(dispatcher: Dispatcher, api_cfg: 'ApiCfg') -> dict:
+    # swagger_gen imports marshmallow and aiohttp internals, import on first use
+    from ...swagger_gen import generate_swagger_info
+
+    for method in dispatcher.values():
+        if isinstance(method, MethodSettings):
+            method.resolve()
+    return generate_swagger_info(
+        routes=dispatcher.values(),
+        path=api_cfg.path,
+        description='',
+        api_version='0.1.0',
+        auth_header_name='X-AccessToken',
+        title=api_cfg.title,
+        hosts=[],
+    )
+
+
+def swagger_body(path: str) -> str:
+    """serialized swagger json of path without servers, it is cached on first call"""
+    body = SWAGGER_BODIES.get(path)
+    if body is None:
+        data = SWAGGER_CFGS[path]
+        if callable(data):
+            data = SWAGGER_CFGS[path] = data()
+        body = SWAGGER_BODIES[path] = json.dumps({key: value for key, value in data.items() if key != 'servers'})
+    return body
 
 
 def swagger_handler(request):
-    data = SWAGGER_CFGS[request.path].copy()
+    body = swagger_body(request.path)
     hosts = [f'https://{request.host}', f'http://{request.host}']
-    data['servers'] = [dict(url=addr) for addr in hosts]
-    return json_response(
-        data=data,
-        dumps=json.dumps,
+    servers = json.dumps([dict(url=addr) for addr in hosts])
+    # servers depend on request host, append them to cached document
+    separator = ',' if len(body) > 2 else ''
+    return Response(
+        text=f'{body[:-1]}{separator}"servers":{servers}}}',
+        content_type='application/json',
     )
 
 
@@ -54,6 +96,71 @@ def add_jsonrpc_json_handler(web_app: Application, api_path: str, dispatcher: Di
     return web_app.router.add_route(METH_GET,  f'{api_path}/jsonrpc/2.0/json', _handler)
 
 
+def add_jsonrpc_inflight_handler(web_app: Application, api_path: str, manager: AsyncJSONRPCResponseManager,
+                                 auth_callback: Callable = None):
+    """
+    admin routes for executing calls and load protection metrics
+    GET  {api_path}/jsonrpc/2.0/inflight?method=...          - list calls, the oldest first
+    POST {api_path}/jsonrpc/2.0/inflight/cancel              - cancel calls, body: {"keys": [...]} or {"method": "..."}
+    GET  {api_path}/jsonrpc/2.0/stats                        - load protection metrics (limiters, circuit breakers), gc pauses
+    auth_callback(request) -> bool: access check, required - routes allow cancelling calls of any tenant
+    """
+    if auth_callback is None:
+        raise ValueError(f'admin routes of {api_path} require auth_callback, '
+                         f'pass lambda request: True to allow them explicitly')
+
+    async def _check_access(request) -> bool:
+        access = auth_callback(request)
+        if inspect.isawaitable(access):
+            access = await access
+        return bool(access)
+
+    async def _list_handler(request):
+        if not await _check_access(request):
+            return Response(status=403)
+
+        calls = manager.inflight.calls(request.query.get('method'))
+        return json_response(
+            data=dict(count=len(calls), calls=[c.as_dict() for c in calls]),
+            dumps=json.dumps,
+        )
+
+    async def _cancel_handler(request):
+        if not await _check_access(request):
+            return Response(status=403)
+
+        try:
+            data = await request.json(loads=json.loads)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or not (data.get('keys') or data.get('method')):
+            return json_response(data=dict(errors=['keys or method is required']), status=400)
+
+        cancelled = 0
+        if method := data.get('method'):
+            cancelled += manager.inflight.cancel_method(method)
+        for key in data.get('keys') or []:
+            cancelled += manager.inflight.cancel(key)
+
+        logger.warning(f'add_jsonrpc_inflight_handler: msg=calls are cancelled, {api_path=}, {cancelled=}, {data=}')
+        return json_response(data=dict(cancelled=cancelled))
+
+    async def _stats_handler(request):
+        if not await _check_access(request):
+            return Response(status=403)
+
+        data = manager.stats()
+        if GC_STATS.installed:
+            data['gc'] = GC_STATS.stats()
+        return json_response(data=data, dumps=json.dumps)
+
+    return [
+        web_app.router.add_route(METH_GET, f'{api_path}/jsonrpc/2.0/inflight', _list_handler),
+        web_app.router.add_route(METH_POST, f'{api_path}/jsonrpc/2.0/inflight/cancel', _cancel_handler),
+        web_app.router.add_route(METH_GET, f'{api_path}/jsonrpc/2.0/stats', _stats_handler),
+    ]
+
+
 @dataclass
 # config for jsonrpc api
 class ApiCfg:
@@ -66,6 +173,34 @@ class ApiCfg:
     api_json: bool = True
     # add route for getting json-config for swagger
     swagger: bool = True
+    # add route for websocket connections: GET {path}/ws, see JSONRPCAiohttp.ws_handler
+    websocket: bool = False
+    # topics pushed to websocket connections, adds subscribe/unsubscribe methods, see ajsonrpc.pubsub
+    pubsub: PubSub = None
+    # add admin routes for executing calls (list, cancel) and metrics
+    inflight: bool = False
+    # access check for admin routes: function(aiohttp.Request) -> bool, required with inflight
+    inflight_auth_callback: Callable = None
+    # load shedding, see AdmissionController
+    admission: AdmissionController = None
+    # http status for rejected requests, None - pre-encoded json-rpc error
+    overload_http_status: int = None
+    # per-tenant rate limits and fair execution slots, see ajsonrpc.tenancy
+    rate_limiter: TenantRateLimiter = None
+    scheduler: FairScheduler = None
+    # generate swagger on first request of docs, not on install
+    lazy_swagger: bool = True
+    # import lazy registered methods (cls as dotted path) in background on application startup
+    warm_up: bool = False
+
+
+def _warm_up_handler(dispatcher: Dispatcher):
+    async def _warm_up(web_app):
+        task = asyncio.ensure_future(dispatcher.warm_up_async())
+        WARM_UP_TASKS.add(task)
+        task.add_done_callback(WARM_UP_TASKS.discard)
+
+    return _warm_up
 
 
 def install_jsonrpc2_apis(web_app: Application, apis: [ApiCfg]) -> list:
@@ -73,28 +208,38 @@ def install_jsonrpc2_apis(web_app: Application, apis: [ApiCfg]) -> list:
 
     for api_cfg in apis:    # type: ApiCfg
         # create jsonrpc api
-        api = JSONRPCAiohttp(auth_callback=api_cfg.auth_callback, finish_callback=api_cfg.finish_callback)
-        [api.manager.dispatcher.add_class_method(**method_data) for method_data in api_cfg.methods]
+        api = JSONRPCAiohttp(auth_callback=api_cfg.auth_callback, finish_callback=api_cfg.finish_callback,
+                             admission=api_cfg.admission, overload_http_status=api_cfg.overload_http_status,
+                             rate_limiter=api_cfg.rate_limiter, scheduler=api_cfg.scheduler,
+                             pubsub=api_cfg.pubsub)
+        # single snapshot swap for all methods
+        with api.manager.dispatcher.bulk_update():
+            [api.manager.dispatcher.add_class_method(**method_data) for method_data in api_cfg.methods]
+            if api_cfg.pubsub:
+                api_cfg.pubsub.add_methods(api.manager.dispatcher)
+
+        if api_cfg.warm_up:
+            web_app.on_startup.append(_warm_up_handler(api.manager.dispatcher))
 
         # register jsonrpc in web-application
         web_app.router.add_route(METH_POST,     api_cfg.path,       api.handler)
+        if api_cfg.websocket:
+            web_app.router.add_route(METH_GET,  f'{api_cfg.path}/ws',   api.ws_handler)
 
         # add handler for getting all methods (json)
         if api_cfg.api_json:
             add_jsonrpc_json_handler(web_app=web_app, api_path=api_cfg.path, dispatcher=api.manager.dispatcher)
 
+        # add admin handlers for executing calls
+        if api_cfg.inflight:
+            add_jsonrpc_inflight_handler(web_app=web_app, api_path=api_cfg.path, manager=api.manager,
+                                         auth_callback=api_cfg.inflight_auth_callback)
+
         # add handler for getting swagger config
         if api_cfg.swagger:
             path = f'/docs{api_cfg.path}/json'
-            SWAGGER_CFGS[path] = generate_swagger_info(
-                routes=api.manager.dispatcher.values(),
-                path=api_cfg.path,
-                description='',
-                api_version='0.1.0',
-                auth_header_name='X-AccessToken',
-                title=api_cfg.title,
-                hosts=[],
-            )
+            generate = functools.partial(generate_api_swagger, api.manager.dispatcher, api_cfg)
+            SWAGGER_CFGS[path] = generate if api_cfg.lazy_swagger else generate()
 
             web_app.router.add_route(
                 METH_GET,
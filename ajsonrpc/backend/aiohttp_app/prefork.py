@@ -0,0 +1,132 @@
+"""Pre-fork warm-up of jsonrpc2 apis for multi-worker deployments.
+
+Forked workers share memory pages of the parent copy-on-write, but collections
+of the GC write headers of every tracked object they visit, so pages of
+dispatchers, compiled schemas and swagger documents are copied into every
+worker. prepare_fork() builds all of them in the parent and moves the heap into the
+permanent generation (gc.freeze), collections of workers skip frozen objects.
+
+Usage::
+
+    gc.disable()    # as early as possible, collections leave holes in pages of parent
+    web_app = Application()
+    apis = install_jsonrpc2_apis(web_app, [...])
+    prepare_fork(apis)
+    # fork workers, gc.enable() in every worker
+
+GC_STATS collects pause times and numbers of collections per generation
+(gc.callbacks), they are reported by {api_path}/jsonrpc/2.0/stats route.
+
+"""
+import gc
+import os
+from time import perf_counter
+
+import logging
+logger = logging.getLogger()
+
+
+class GCStats:
+
+    """Pause times and counts of GC collections per generation."""
+
+    def __init__(self):
+        self.installed = False
+        self._fork_registered = False
+        self._started = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.generations = [
+            dict(count=0, pause_total=0.0, pause_max=0.0, collected=0, uncollectable=0)
+            for _ in range(3)
+        ]
+        self.last_pause = 0.0
+
+    def callback(self, phase: str, info: dict) -> None:
+        if phase == 'start':
+            self._started = perf_counter()
+            return
+        if self._started is None:
+            # installed during collection
+            return
+
+        pause = perf_counter() - self._started
+        self._started = None
+        generation = self.generations[info['generation']]
+        generation['count'] += 1
+        generation['pause_total'] += pause
+        generation['pause_max'] = max(generation['pause_max'], pause)
+        generation['collected'] += info['collected']
+        generation['uncollectable'] += info['uncollectable']
+        self.last_pause = pause
+
+    def install(self) -> None:
+        if self.installed:
+            return
+        gc.callbacks.append(self.callback)
+        self.installed = True
+        if not self._fork_registered and hasattr(os, 'register_at_fork'):
+            # every worker reports its own collections
+            os.register_at_fork(after_in_child=self.reset)
+            self._fork_registered = True
+
+    def uninstall(self) -> None:
+        if not self.installed:
+            return
+        gc.callbacks.remove(self.callback)
+        self.installed = False
+        self._started = None
+
+    def stats(self) -> dict:
+        generations = {}
+        for number, generation in enumerate(self.generations):
+            count = generation['count']
+            generations[str(number)] = dict(
+                generation,
+                pause_avg=generation['pause_total'] / count if count else 0.0,
+            )
+        return dict(
+            generations=generations,
+            last_pause=self.last_pause,
+            counts=gc.get_count(),
+            thresholds=gc.get_threshold(),
+            frozen=gc.get_freeze_count(),
+        )
+
+
+GC_STATS = GCStats()
+
+
+def prepare_fork(apis: list, freeze: bool = True, gc_stats: bool = True) -> dict:
+    """
+    build everything workers share before forking them
+    apis: result of install_jsonrpc2_apis
+    freeze: collect garbage and move all objects into the permanent generation
+    gc_stats: collect pause times of the GC, see GC_STATS
+    Return numbers of resolved methods, built swagger documents and frozen objects.
+    """
+    from .jsonrpc2_installer import SWAGGER_CFGS, swagger_body
+
+    started = perf_counter()
+
+    # import classes and schemas of lazy registered methods, compile schemas
+    methods = sum(api.manager.dispatcher.warm_up() for api in apis)
+    # generate and serialize swagger documents
+    for path in list(SWAGGER_CFGS):
+        swagger_body(path)
+
+    if freeze:
+        gc.collect()
+        gc.freeze()
+    if gc_stats:
+        GC_STATS.install()
+
+    result = dict(
+        methods=methods,
+        swaggers=len(SWAGGER_CFGS),
+        frozen=gc.get_freeze_count(),
+        elapsed=perf_counter() - started,
+    )
+    logger.info(f'{__name__}::prepare_fork: msg=application is prepared for fork, {result=}')
+    return result
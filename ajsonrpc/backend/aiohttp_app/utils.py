@@ -5,6 +5,8 @@ except Exception:
 from marshmallow import UnmarshalResult, Schema, fields as m_fields
 from aiohttp.web_request import Request
 
+from ...utils import load_by_schema
+
 
 def calc_errors_from_vd(errors: dict, data_on_validate: dict = {}) -> list:
     """ calc errors from validate-data (errors) by UnmarshalResult """
@@ -44,14 +46,10 @@ def validate_by_schema(schema: Schema, data: dict) -> {dict, list}:
     """ validate dict by marshmallow.Schema """
     # validate-data, errors
     v_data, errors = {}, []
-    # validate
-    v_errors = schema.validate(data)
+    # validate and dump, single pass if possible
+    v_data, v_errors = load_by_schema(schema, data)
     if v_errors:
         errors.extend(calc_errors_from_vd(errors=v_errors, data_on_validate=data))
-    else:
-        v_data, v_errors = schema.dump(data)
-        if v_errors:
-            errors.extend(calc_errors_from_vd(errors=v_errors, data_on_validate=data))
     return v_data, errors
 
 
@@ -3,11 +3,13 @@ from ..dispatcher import Dispatcher
 from ..manager import AsyncJSONRPCResponseManager
 
 class CommonBackend:
-    def __init__(self, serialize=json.dumps, deserialize=json.loads):
+    def __init__(self, serialize=json.dumps, deserialize=json.loads, **manager_kwargs):
+        # manager_kwargs: admission, rate_limiter, scheduler, see AsyncJSONRPCResponseManager
         self.manager = AsyncJSONRPCResponseManager(
             Dispatcher(),
             serialize=serialize,
-            deserialize=deserialize
+            deserialize=deserialize,
+            **manager_kwargs
         )
 
     def add_class(self, *args, **kwargs):
@@ -0,0 +1,186 @@
+"""Per-method circuit breaker.
+
+When an upstream dependency of a method fails, every call still runs fully,
+times out and logs a traceback, which amplifies the outage. Circuit breaker
+opens after error rate (or slow calls rate) in a rolling window exceeds the
+threshold and fails fast with a pre-built server error. After open_timeout
+a few half-open probe calls are let through, their success closes circuit.
+Outcome of a call counts only for the state period it was admitted in,
+cancelled calls are not counted.
+
+Usage::
+
+    dispatcher.add_class_method(Controller, 'search', circuit_breaker=CircuitBreaker(error_rate=0.5))
+
+"""
+import asyncio
+from collections import deque
+from time import monotonic
+from typing import Optional
+
+from .core import JSONRPC20Exception, JSONRPC20CircuitOpenException, JSONRPC20ServerError
+
+import logging
+logger = logging.getLogger()
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class _CircuitSlot:
+    __slots__ = ('breaker', 'started', 'ticket')
+
+    def __init__(self, breaker: 'CircuitBreaker'):
+        self.breaker = breaker
+        self.started = None
+        self.ticket = None
+
+    async def __aenter__(self):
+        self.ticket = self.breaker.before_call()
+        self.started = monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None and issubclass(exc_type, asyncio.CancelledError):
+            # client is gone or timeout, not an outcome of the method
+            self.breaker.cancel_call(self.ticket)
+            return False
+        # controlled json-rpc errors are results of the method, not failures
+        failed = exc_type is not None and not issubclass(exc_type, JSONRPC20Exception)
+        self.breaker.after_call(monotonic() - self.started, ok=not failed, ticket=self.ticket)
+        return False
+
+
+class CircuitBreaker:
+
+    """Circuit breaker with a rolling time window."""
+
+    def __init__(self,
+                 error_rate: float = 0.5,
+                 slow_call_duration: Optional[float] = None,
+                 min_calls: int = 20,
+                 window: float = 10.0,
+                 open_timeout: float = 30.0,
+                 half_open_calls: int = 1,
+                 name: str = None):
+        """
+        error_rate: rate of failed (or slow) calls in window to open circuit
+        slow_call_duration: call longer than duration (seconds) is counted as failed, None - do not count
+        min_calls: min number of calls in window to calculate rate
+        window: rolling window in seconds
+        open_timeout: time in seconds before half-open probes
+        half_open_calls: number of successful probes to close circuit
+        name: name for logs, method name by default
+        """
+        self.error_rate = error_rate
+        self.slow_call_duration = slow_call_duration
+        self.min_calls = min_calls
+        self.window = window
+        self.open_timeout = open_timeout
+        self.half_open_calls = half_open_calls
+        self.name = name
+
+        self.state = CLOSED
+        # number of times circuit was opened
+        self.opened = 0
+        # number of calls rejected by open circuit
+        self.rejected = 0
+        self._opened_at = None
+        # incremented on every state change, calls of previous periods are not counted
+        self._generation = 0
+        self._probes = 0
+        self._probe_successes = 0
+        # (time, failed)
+        self._calls = deque()
+        self._failures = 0
+        self._error = JSONRPC20ServerError(data=[{
+            "selector": 'circuit',
+            "reason": 'Circuit breaker is open',
+        }])
+
+    def slot(self) -> _CircuitSlot:
+        """Async context manager: check circuit, record outcome of the call."""
+        return _CircuitSlot(self)
+
+    def _set_state(self, state: str) -> None:
+        logger.warning(f'{self.__class__.__name__}::_set_state: msg=circuit state is changed, name={self.name}, '
+                       f'from={self.state}, to={state}, calls={len(self._calls)}, failures={self._failures}')
+        self.state = state
+        self._generation += 1
+        if state == OPEN:
+            self.opened += 1
+            self._opened_at = monotonic()
+        elif state == HALF_OPEN:
+            self._probes = 0
+            self._probe_successes = 0
+        elif state == CLOSED:
+            self._calls.clear()
+            self._failures = 0
+
+    def _trim(self, now: float) -> None:
+        border = now - self.window
+        while self._calls and self._calls[0][0] < border:
+            if self._calls.popleft()[1]:
+                self._failures -= 1
+
+    def before_call(self) -> tuple:
+        """Raise JSONRPC20CircuitOpenException or return ticket of the call: (state, generation)."""
+        if self.state == OPEN:
+            if monotonic() - self._opened_at < self.open_timeout:
+                self.rejected += 1
+                raise JSONRPC20CircuitOpenException(self._error)
+            self._set_state(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                self.rejected += 1
+                raise JSONRPC20CircuitOpenException(self._error)
+            self._probes += 1
+        return self.state, self._generation
+
+    def cancel_call(self, ticket: tuple) -> None:
+        """Call is cancelled, its probe slot is freed."""
+        state, generation = ticket
+        if state == HALF_OPEN and generation == self._generation:
+            self._probes -= 1
+
+    def after_call(self, latency: float, ok: bool = True, ticket: tuple = None) -> None:
+        """ticket: result of before_call, None - call admitted in the current state"""
+        if ticket is not None and ticket[1] != self._generation:
+            # admitted in a previous state period, e.g. closed call finishing while half-open is not a probe
+            return
+        failed = not ok or (self.slow_call_duration is not None and latency > self.slow_call_duration)
+
+        if self.state == HALF_OPEN:
+            if failed:
+                self._set_state(OPEN)
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._set_state(CLOSED)
+            return
+
+        if self.state == OPEN:
+            # call was started before circuit is opened
+            return
+
+        now = monotonic()
+        self._calls.append((now, failed))
+        if failed:
+            self._failures += 1
+        self._trim(now)
+
+        if failed and len(self._calls) >= self.min_calls and self._failures / len(self._calls) >= self.error_rate:
+            self._set_state(OPEN)
+
+    def stats(self) -> dict:
+        self._trim(monotonic())
+        return dict(
+            state=self.state,
+            calls=len(self._calls),
+            failures=self._failures,
+            opened=self.opened,
+            rejected=self.rejected,
+        )
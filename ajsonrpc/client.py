@@ -0,0 +1,504 @@
+"""Async JSON-RPC 2.0 client.
+
+Requests and responses are JSONRPC20Request / JSONRPC20Response of
+ajsonrpc.core, encoded by the same pluggable codec as
+AsyncJSONRPCResponseManager (serialize, deserialize).
+
+Transport is chosen by url:
+
+* ``http://host:port/path``, ``https://...`` - pool of keep-alive HTTP/1.1 connections
+* ``tcp://host:port`` - persistent connection of ajsonrpc.transport, calls are
+  multiplexed (pipelined) over it and matched by id
+* ``unix:///run/api.sock`` - the same over Unix domain socket
+
+Usage::
+
+    async with Client('http://127.0.0.1:8888', timeout=5, retries=2) as client:
+        pong = await client.call('echo', ['pong'])
+        await client.notify('log', dict(message='started'))
+        # retried on connection errors and timeouts
+        status = await client.call('status', idempotent=True)
+
+Auto-batching: concurrent calls made within batch_window are sent as one
+JSONRPC20BatchRequest, every caller gets its response by id::
+
+    client = Client('http://127.0.0.1:8888', batch_window=0.002, max_batch_size=50)
+    results = await asyncio.gather(*(client.call('get', [key]) for key in keys))
+
+"""
+import asyncio
+import itertools
+import json
+import urllib.parse
+from collections import deque
+from typing import Any, Callable, Iterable, Optional, Union
+
+from .core import JSONRPC20Request, JSONRPC20BatchRequest, JSONRPC20Response, JSONRPC20Error
+from .transport import MAX_FRAME_SIZE, make_framing
+
+import logging
+logger = logging.getLogger()
+
+
+# statuses of overloaded or restarting servers, calls are retried
+RETRY_HTTP_STATUSES = frozenset((502, 503, 504))
+
+
+class ClientError(Exception):
+
+    """Base exception of client."""
+
+
+class TransportError(ClientError):
+
+    """Connection failed or response could not be read, idempotent calls are retried."""
+
+
+class HTTPStatusError(ClientError):
+
+    """HTTP response status is not 200 or 204."""
+
+    def __init__(self, status: int):
+        super().__init__(f'HTTP status {status}')
+        self.status = status
+
+
+class JSONRPCError(ClientError):
+
+    """Error response of server."""
+
+    def __init__(self, error: JSONRPC20Error):
+        super().__init__(error.code, error.message, error.data)
+        self.error = error
+        self.code = error.code
+        self.message = error.message
+        self.data = error.data
+
+
+async def read_http_response(reader: asyncio.StreamReader) -> (int, dict, bytes, bool):
+    """(status, headers with lowercase names, body, body is delimited - connection could be reused)"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    status_line, *lines = head[:-4].decode('latin-1').split('\r\n')
+    try:
+        status = int(status_line.split(' ', 2)[1])
+    except (IndexError, ValueError):
+        raise TransportError(f'bad status line {status_line!r}') from None
+    headers = {}
+    for line in lines:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if status == 204 or status == 304 or 100 <= status < 200:
+        return status, headers, b'', True
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        parts = []
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # trailers
+                while await reader.readuntil(b'\r\n') != b'\r\n':
+                    pass
+                return status, headers, b''.join(parts), True
+            parts.append((await reader.readexactly(size + 2))[:-2])
+    if 'content-length' in headers:
+        return status, headers, await reader.readexactly(int(headers['content-length'])), True
+    # body is delimited by closing of connection
+    return status, headers, await reader.read(), False
+
+
+class HTTPTransport:
+
+    """Pool of keep-alive HTTP/1.1 connections."""
+
+    def __init__(self, url: str, pool_size: int = 10, headers: dict = None, ssl=None,
+                 keep_alive_timeout: float = 15.0):
+        """
+        pool_size: max number of connections
+        headers: extra headers of requests, e.g. X-AccessToken
+        ssl: ssl.SSLContext for https, None - default context
+        keep_alive_timeout: idle connections older than it are not reused
+        """
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        self.ssl = (ssl or True) if parsed.scheme == 'https' else None
+        self.keep_alive_timeout = keep_alive_timeout
+        path = parsed.path or '/'
+        if parsed.query:
+            path = f'{path}?{parsed.query}'
+        host = parsed.netloc.rsplit('@', 1)[-1]
+        lines = [f'POST {path} HTTP/1.1', f'Host: {host}', 'Content-Type: application/json', 'Connection: keep-alive']
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        self._head = ('\r\n'.join(lines) + '\r\n').encode('latin-1')
+        self._slots = asyncio.Semaphore(pool_size)
+        # (reader, writer, idle since), the most recently used last
+        self._idle = deque()
+
+    async def _connection(self) -> (asyncio.StreamReader, asyncio.StreamWriter):
+        now = asyncio.get_event_loop().time()
+        while self._idle:
+            reader, writer, since = self._idle.pop()
+            if now - since < self.keep_alive_timeout and not reader.at_eof() and not writer.is_closing():
+                return reader, writer
+            writer.close()
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    async def request(self, data: bytes) -> bytes:
+        """Body of response, b'' for notifications."""
+        async with self._slots:
+            try:
+                reader, writer = await self._connection()
+            except OSError as e:
+                raise TransportError(f'connection failed: {e}') from e
+            try:
+                writer.write(self._head + f'Content-Length: {len(data)}\r\n\r\n'.encode('latin-1') + data)
+                status, headers, body, reusable = await read_http_response(reader)
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+                writer.close()
+                raise TransportError(f'request failed: {e!r}') from e
+            except BaseException:
+                # cancelled (timeout), response of the connection is not read
+                writer.close()
+                raise
+
+            if reusable and headers.get('connection', '').lower() != 'close':
+                self._idle.append((reader, writer, asyncio.get_event_loop().time()))
+            else:
+                writer.close()
+
+        if status == 204:
+            return b''
+        if status != 200:
+            raise HTTPStatusError(status)
+        return body
+
+    async def close(self) -> None:
+        while self._idle:
+            _, writer, _ = self._idle.pop()
+            writer.close()
+
+
+class StreamTransport:
+
+    """One persistent connection of ajsonrpc.transport, received frames are passed to on_message."""
+
+    def __init__(self, on_message: Callable[[bytes], None], on_lost: Callable[[Exception], None],
+                 host: str = None, port: int = None, path: str = None,
+                 framing: str = 'newline', max_frame_size: int = MAX_FRAME_SIZE):
+        """
+        on_message: function(frame) of every received frame
+        on_lost: function(exc) called when connection is lost
+        host, port: tcp address, path: Unix domain socket path
+        """
+        self.on_message = on_message
+        self.on_lost = on_lost
+        self.host = host
+        self.port = port
+        self.path = path
+        self.framing_name = framing
+        self.max_frame_size = max_frame_size
+        # raise ValueError for unknown framing
+        self._framing = make_framing(framing, max_frame_size)
+        self._writer = None
+        self._reader_task = None
+        self._connecting = asyncio.Lock()
+
+    async def _connect(self) -> asyncio.StreamWriter:
+        async with self._connecting:
+            if self._writer is not None and not self._writer.is_closing():
+                return self._writer
+            try:
+                if self.path:
+                    reader, writer = await asyncio.open_unix_connection(self.path)
+                else:
+                    reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                raise TransportError(f'connection failed: {e}') from e
+            framing = make_framing(self.framing_name, self.max_frame_size)
+            self._writer = writer
+            self._reader_task = asyncio.ensure_future(self._read(reader, writer, framing))
+            return writer
+
+    async def _read(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, framing) -> None:
+        error = TransportError('connection is closed by server')
+        try:
+            while True:
+                data = await reader.read(64 * 1024)
+                if not data:
+                    break
+                for frame in framing.feed(data):
+                    self.on_message(frame)
+        except asyncio.CancelledError:
+            error = TransportError('connection is closed')
+            raise
+        except Exception as e:
+            error = TransportError(f'connection failed: {e!r}')
+        finally:
+            writer.close()
+            if self._writer is writer:
+                self._writer = None
+            self.on_lost(error)
+
+    async def send(self, data: bytes) -> None:
+        writer = await self._connect()
+        try:
+            writer.write(self._framing.encode(data))
+            # backpressure of the connection
+            await writer.drain()
+        except OSError as e:
+            raise TransportError(f'send failed: {e!r}') from e
+
+    async def close(self) -> None:
+        if self._reader_task:
+            self._reader_task.cancel()
+            self._reader_task = None
+
+
+class Client:
+
+    """JSON-RPC 2.0 client, calls in flight are tracked by id."""
+
+    def __init__(self, url: str, serialize: Callable = json.dumps, deserialize: Callable = json.loads,
+                 timeout: Optional[float] = 10.0, retries: int = 2, retry_backoff: float = 0.1,
+                 idempotent_methods: Iterable[str] = (), pool_size: int = 10, headers: dict = None, ssl=None,
+                 framing: str = 'newline', on_notification: Callable[[JSONRPC20Request], Any] = None,
+                 batch_window: Optional[float] = None, max_batch_size: int = 100):
+        """
+        url: http(s)://host:port/path, tcp://host:port or unix:///path
+        serialize, deserialize: codec, as of AsyncJSONRPCResponseManager
+        timeout: default timeout of calls, seconds
+        retries: number of retries of idempotent calls on connection errors, timeouts and 502/503/504
+        retry_backoff: delay before the first retry, doubled for next ones
+        idempotent_methods: names of methods retried by default
+        pool_size, headers, ssl: HTTP connections, see HTTPTransport
+        framing: 'newline' or 'length' for tcp and unix transports
+        on_notification: function(request) for notifications pushed by server (tcp, unix)
+        batch_window: auto-batching, requests sent within it (seconds, 0 - the same loop iteration)
+            are sent as one batch request, None - disabled
+        max_batch_size: batch is sent without waiting for the window when it has that many requests
+        """
+        self.serialize = serialize
+        self.deserialize = deserialize
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.idempotent_methods = frozenset(idempotent_methods)
+        self.on_notification = on_notification
+        # id -> future of response
+        self.inflight = {}
+        self._ids = itertools.count(1)
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        # requests waiting for the batch window
+        self._batch = []
+        # resolved when the waiting batch is sent
+        self._batch_sent = None
+        self._batch_timer = None
+        self._batch_tasks = set()
+
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme in ('http', 'https'):
+            self.transport = HTTPTransport(url, pool_size=pool_size, headers=headers, ssl=ssl)
+        elif parsed.scheme == 'tcp':
+            self.transport = StreamTransport(self._receive, self._lost, host=parsed.hostname, port=parsed.port,
+                                             framing=framing)
+        elif parsed.scheme == 'unix':
+            self.transport = StreamTransport(self._receive, self._lost, path=parsed.path, framing=framing)
+        else:
+            raise ValueError(f'unsupported url scheme {parsed.scheme!r}')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self) -> None:
+        if self._batch:
+            self._flush()
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+        await self.transport.close()
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    async def call(self, method: str, params: Union[list, dict] = None, *,
+                   timeout: Optional[float] = None, idempotent: bool = None) -> Any:
+        """Result of method, raise JSONRPCError for error response.
+
+        timeout: seconds, default - timeout of client
+        idempotent: retry call on connection errors and timeouts, default - method is in idempotent_methods
+        """
+        if idempotent is None:
+            idempotent = method in self.idempotent_methods
+        attempts = 1 + (self.retries if idempotent else 0)
+
+        for attempt in range(attempts):
+            # new id, late response of failed attempt is ignored
+            request = JSONRPC20Request(method, params=params, id=self.next_id())
+            try:
+                response = await self.send(request, timeout=timeout)
+            except (TransportError, asyncio.TimeoutError, HTTPStatusError) as e:
+                retryable = not isinstance(e, HTTPStatusError) or e.status in RETRY_HTTP_STATUSES
+                if not retryable or attempt + 1 >= attempts:
+                    raise
+                logger.warning(f'{self.__class__.__name__}::call: msg=call is retried, {method=}, {attempt=}, {e=}')
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+                continue
+
+            if response.error:
+                raise JSONRPCError(response.error)
+            return response.result
+
+    async def notify(self, method: str, params: Union[list, dict] = None, *, timeout: Optional[float] = None) -> None:
+        await self.send(JSONRPC20Request(method, params=params, is_notification=True), timeout=timeout)
+
+    async def send(self, request: Union[JSONRPC20Request, JSONRPC20BatchRequest], timeout: Optional[float] = None) \
+            -> Union[Optional[JSONRPC20Response], list]:
+        """Response of request, list of responses in order of requests (without notifications) for batch.
+
+        With auto-batching single requests are collected into batch requests.
+        """
+        is_batch = isinstance(request, JSONRPC20BatchRequest)
+        requests = list(request) if is_batch else [request]
+        ids = [r.id for r in requests if not r.is_notification]
+        if len(set(ids)) != len(ids) or any(i in self.inflight for i in ids):
+            raise ValueError('ids of requests in flight should be unique')
+
+        loop = asyncio.get_event_loop()
+        futures = []
+        for request_id in ids:
+            future = self.inflight[request_id] = loop.create_future()
+            futures.append(future)
+
+        if self.batch_window is not None and not is_batch:
+            exchange = self._batched(request, futures)
+        else:
+            exchange = self._exchange(self._encode(request.body), futures)
+        try:
+            responses = await asyncio.wait_for(exchange, timeout or self.timeout)
+        finally:
+            for request_id, future in zip(ids, futures):
+                self.inflight.pop(request_id, None)
+                if not future.done():
+                    future.cancel()
+
+        if is_batch:
+            return responses
+        return responses[0] if responses else None
+
+    def _encode(self, body) -> bytes:
+        data = self.serialize(body)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        return data
+
+    async def _exchange(self, data: bytes, futures: list) -> list:
+        await self._transmit(data, futures)
+        return [await future for future in futures]
+
+    async def _transmit(self, data: bytes, futures: list) -> None:
+        """Send request, for HTTP resolve futures by its response."""
+        if isinstance(self.transport, HTTPTransport):
+            payload = await self.transport.request(data)
+            errors = self._receive(payload) if payload else []
+            for future in futures:
+                if not future.done():
+                    # parse error or invalid request has no id
+                    future.set_exception(JSONRPCError(errors[0].error) if errors else
+                                         ClientError('response has no result of request'))
+        else:
+            await self.transport.send(data)
+
+    async def _batched(self, request: JSONRPC20Request, futures: list) -> list:
+        sent = self._enqueue(request)
+        if not futures:
+            # notification, wait for the batch to be sent, timeout of caller does not cancel it
+            await asyncio.shield(sent)
+        return [await future for future in futures]
+
+    def _enqueue(self, request: JSONRPC20Request) -> asyncio.Future:
+        if not self._batch:
+            loop = asyncio.get_event_loop()
+            self._batch_sent = loop.create_future()
+            # exception is delivered to callers by their futures
+            self._batch_sent.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._batch_timer = loop.call_later(self.batch_window, self._flush)
+        self._batch.append(request)
+        sent = self._batch_sent
+        if len(self._batch) >= self.max_batch_size:
+            self._flush()
+        return sent
+
+    def _flush(self) -> None:
+        self._batch_timer.cancel()
+        requests, sent = self._batch, self._batch_sent
+        self._batch, self._batch_sent, self._batch_timer = [], None, None
+        task = asyncio.ensure_future(self._send_batch(requests, sent))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _send_batch(self, requests: list, sent: asyncio.Future) -> None:
+        futures = []
+        alive = []
+        for request in requests:
+            if request.is_notification:
+                alive.append(request)
+                continue
+            future = self.inflight.get(request.id)
+            # caller timed out while the request was waiting
+            if future is not None and not future.done():
+                alive.append(request)
+                futures.append(future)
+
+        try:
+            if alive:
+                body = alive[0].body if len(alive) == 1 else JSONRPC20BatchRequest(alive).body
+                await self._transmit(self._encode(body), futures)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            sent.set_exception(e)
+        else:
+            sent.set_result(None)
+
+    def _receive(self, payload: bytes) -> list:
+        """Resolve futures by responses of payload, return error responses without id."""
+        try:
+            body = self.deserialize(payload)
+        except (TypeError, ValueError) as e:
+            raise TransportError(f'invalid response: {e!r}') from e
+
+        errors = []
+        for item in body if isinstance(body, list) else [body]:
+            if isinstance(item, dict) and 'method' in item:
+                self._notification(item)
+                continue
+            try:
+                response = JSONRPC20Response.from_body(item)
+            except (TypeError, ValueError, KeyError) as e:
+                logger.error(f'{self.__class__.__name__}::_receive: msg=invalid response, {item=}, {e=}')
+                continue
+            if response.id is None:
+                errors.append(response)
+                continue
+            future = self.inflight.get(response.id)
+            if future is not None and not future.done():
+                future.set_result(response)
+        return errors
+
+    def _notification(self, body: dict) -> None:
+        if not self.on_notification:
+            return
+        try:
+            self.on_notification(JSONRPC20Request.from_body(body))
+        except Exception as e:
+            logger.error(f'{self.__class__.__name__}::_notification: msg=fail handling notification, {e=}')
+
+    def _lost(self, error: Exception) -> None:
+        # calls of the lost connection would never get responses
+        for future in self.inflight.values():
+            if not future.done():
+                future.set_exception(error)
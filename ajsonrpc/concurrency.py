@@ -0,0 +1,225 @@
+"""Adaptive concurrency limits.
+
+Fixed concurrency caps are always wrong for some method. Limiters here adjust
+the limit by observed latency and find the concurrency at which latency of
+the method starts to degrade. Calls beyond the limit wait in a short queue or
+are rejected with "Server overloaded" error, so one hot method could not
+overwhelm shared upstreams.
+
+Usage::
+
+    dispatcher.add_class_method(Controller, 'search', limiter=GradientLimiter(max_limit=50))
+
+"""
+import asyncio
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from time import monotonic
+from typing import Optional
+
+from .core import JSONRPC20ServerOverloadedException
+
+import logging
+logger = logging.getLogger()
+
+
+class _Slot:
+
+    """Acquired slot of limiter, measures latency of the call."""
+
+    __slots__ = ('limiter', 'started')
+
+    def __init__(self, limiter: 'ConcurrencyLimiter'):
+        self.limiter = limiter
+        self.started = None
+
+    async def __aenter__(self):
+        await self.limiter.acquire()
+        self.started = monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.limiter.release(monotonic() - self.started, ok=exc_type is None)
+        return False
+
+
+class ConcurrencyLimiter(ABC):
+
+    """Base concurrency limiter with a bounded wait queue.
+
+    Subclasses implement update(latency, ok) which sets new self.limit,
+    the base class could not be instantiated.
+
+    """
+
+    def __init__(self,
+                 initial_limit: int = 10,
+                 min_limit: int = 1,
+                 max_limit: int = 200,
+                 max_wait: float = 0.05,
+                 max_queue: Optional[int] = None):
+        """
+        initial_limit, min_limit, max_limit: concurrency limits
+        max_wait: max time in seconds a call waits for a free slot, 0 - reject immediately
+        max_queue: max number of waiting calls, None - limit by current limit
+        """
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        # number of executing calls
+        self.inflight = 0
+        # number of rejected calls
+        self.rejected = 0
+        self._waiters = deque()
+
+    def slot(self) -> _Slot:
+        """Async context manager: acquire slot, release it with measured latency."""
+        return _Slot(self)
+
+    def _reject(self):
+        self.rejected += 1
+        raise JSONRPC20ServerOverloadedException(data=[{
+            "selector": 'concurrency',
+            "reason": f'Concurrency limit {int(self.limit)} is reached',
+        }])
+
+    async def acquire(self) -> None:
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            return
+
+        max_queue = self.max_queue if self.max_queue is not None else int(self.limit)
+        if not self.max_wait or len(self._waiters) >= max_queue:
+            self._reject()
+
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except asyncio.TimeoutError:
+            # slot could be granted right at timeout
+            if waiter.done():
+                return
+            waiter.cancel()
+            self._reject()
+        except BaseException:
+            # slot is granted, but the call is cancelled
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def release(self, latency: float, ok: bool = True) -> None:
+        self.update(latency, ok)
+        self.limit = min(max(self.limit, self.min_limit), self.max_limit)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        self.inflight -= 1
+        # wake up waiters, slot is transferred to waiter
+        while self._waiters and self.inflight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(None)
+
+    @abstractmethod
+    def update(self, latency: float, ok: bool) -> None:
+        """Adjust self.limit by latency of the finished call, ok - call did not fail."""
+
+    def stats(self) -> dict:
+        return dict(
+            limit=int(self.limit),
+            inflight=self.inflight,
+            queued=len(self._waiters),
+            rejected=self.rejected,
+        )
+
+
+class AIMDLimiter(ConcurrencyLimiter):
+
+    """Additive increase, multiplicative decrease.
+
+    Limit grows by one per "limit" successful calls, and is multiplied by
+    backoff_ratio when a call fails or its latency exceeds latency_threshold.
+
+    """
+
+    def __init__(self, latency_threshold: float = 1.0, backoff_ratio: float = 0.9, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_threshold = latency_threshold
+        self.backoff_ratio = backoff_ratio
+
+    def update(self, latency: float, ok: bool) -> None:
+        if not ok or latency > self.latency_threshold:
+            self.limit *= self.backoff_ratio
+        # grow only if the limit is used
+        elif self.inflight * 2 >= self.limit:
+            self.limit += 1 / self.limit
+
+
+class GradientLimiter(ConcurrencyLimiter):
+
+    """Gradient limiter.
+
+    Compares smoothed latency with the minimal (no load) latency:
+    gradient = tolerance * min_latency / latency, limited to [0.5, 1].
+    new_limit = limit * gradient + sqrt(limit), then smoothed.
+    Minimal latency is reset every min_latency_window seconds to follow
+    changes of upstreams.
+
+    """
+
+    def __init__(self,
+                 tolerance: float = 1.5,
+                 smoothing: float = 0.2,
+                 latency_smoothing: float = 0.1,
+                 min_latency_window: float = 60.0,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.latency_smoothing = latency_smoothing
+        self.min_latency_window = min_latency_window
+        self.min_latency = None
+        self.latency = None
+        self._min_latency_reset = monotonic() + min_latency_window
+
+    def update(self, latency: float, ok: bool) -> None:
+        now = monotonic()
+        if now >= self._min_latency_reset:
+            self.min_latency = None
+            self._min_latency_reset = now + self.min_latency_window
+
+        if ok and (self.min_latency is None or latency < self.min_latency):
+            self.min_latency = latency
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += (latency - self.latency) * self.latency_smoothing
+
+        if not ok:
+            gradient = 0.5
+        elif not self.latency or not self.min_latency:
+            gradient = 1.0
+        else:
+            gradient = max(0.5, min(1.0, self.tolerance * self.min_latency / self.latency))
+
+        new_limit = self.limit * gradient + math.sqrt(self.limit)
+        self.limit = self.limit * (1 - self.smoothing) + new_limit * self.smoothing
+
+    def stats(self) -> dict:
+        return dict(
+            super().stats(),
+            min_latency=self.min_latency,
+            latency=self.latency,
+        )
@@ -181,13 +181,14 @@ class JSONRPC20Request:
         self.validate_method(value)
         self._body["method"] = value
 
-    def validate_params(self, schema) -> list:
+    def validate_params(self, schema, validator=None) -> list:
         """
         validate params and set to val-property
         schema: marshmallow.Schema for validation params
+        validator: compiled schema, see ajsonrpc.schema_compiler
         return list errors
         """
-        self.params, errors = validate_by_schema(schema, self.params)
+        self.params, errors = validate_by_schema(schema, self.params, validator)
         return errors
 
     @property
@@ -507,6 +508,26 @@ class JSONRPC20ServerError(JSONRPC20SpecificError):
     MESSAGE = "Server error"
 
 
+class JSONRPC20ServerOverloaded(JSONRPC20SpecificError):
+
+    """Server overloaded.
+    Request is rejected by admission control, the server is saturated.
+    """
+
+    CODE = -32001
+    MESSAGE = "Server overloaded"
+
+
+class JSONRPC20RateLimited(JSONRPC20SpecificError):
+
+    """Rate limit exceeded.
+    Request is rejected, the client exceeded its rate limit.
+    """
+
+    CODE = -32002
+    MESSAGE = "Rate limit exceeded"
+
+
 class JSONRPC20Response:
     def __init__(self,
                 result: Optional[Any] = None,
@@ -602,6 +623,12 @@ class JSONRPC20Response:
         self.validate_id(value)
         self._body["id"] = value
 
+    @staticmethod
+    def from_body(body: Mapping):
+        response = JSONRPC20Response(result=0)
+        response.body = body
+        return response
+
 
 class JSONRPC20BatchResponse(collections.abc.MutableSequence):
     def __init__(self, requests: List[JSONRPC20Response] = None):
@@ -656,8 +683,40 @@ class JSONRPC20InvalidResultException(JSONRPC20Exception):
 
     """JSON-RPC Invalid result Exception for dispatcher methods."""
 
-    def __init__(self, data=None, method=None, invalid_data=None, *args, **kwargs):
+    def __init__(self, data=None, method=None, invalid_data=None, index=None, *args, **kwargs):
         super().__init__(args, kwargs)
         self.method = method
         self.invalid_data = invalid_data
+        # index of invalid item of list result
+        self.index = index
         self.error = JSONRPC20InvalidParams(data=data)
+
+
+class JSONRPC20ServerOverloadedException(JSONRPC20DispatchException):
+
+    """JSON-RPC Server overloaded Exception, request is rejected before execution."""
+
+    def __init__(self, data=None, *args, **kwargs):
+        JSONRPC20Exception.__init__(self, args, kwargs)
+        self.error = JSONRPC20ServerOverloaded(data=data)
+
+
+class JSONRPC20RateLimitedException(JSONRPC20DispatchException):
+
+    """JSON-RPC Rate limited Exception, request is rejected before execution."""
+
+    def __init__(self, data=None, *args, **kwargs):
+        JSONRPC20Exception.__init__(self, args, kwargs)
+        self.error = JSONRPC20RateLimited(data=data)
+
+
+class JSONRPC20CircuitOpenException(JSONRPC20DispatchException):
+
+    """JSON-RPC Circuit open Exception, method fails fast with pre-built error."""
+
+    def __init__(self, error: JSONRPC20Error = None, *args, **kwargs):
+        JSONRPC20Exception.__init__(self, args, kwargs)
+        self.error = error or JSONRPC20ServerError(data=[{
+            "selector": 'circuit',
+            "reason": 'Circuit breaker is open',
+        }])
@@ -3,29 +3,59 @@
 Dispatcher is a dict-like object which maps method_name to method.
 For usage examples see :meth:`~Dispatcher.add_function`
 
+Methods are published as immutable snapshots: calls use the snapshot they
+started with, writes change live methods in place and the next snapshot is
+copied from them once. Use :meth:`~Dispatcher.bulk_update` to publish many
+changes at once.
+
+Functions are called with request and return (result, error). Functions
+registered with pass_params=True are called with request params as upstream
+json-rpc does: func(*request.args, **request.kwargs), their signatures are
+resolved on registration, see binders.
+
 """
+import contextlib
 import functools
 import inspect
+import itertools
+import sys
+import threading
 import types
+from types import MappingProxyType
 from typing import Any, Optional, Mapping
 from collections.abc import Mapping as CollectionsMapping, MutableMapping, Callable
 from dataclasses import dataclass, field
 
+from .acl import CompiledACL
+from .pool import ControllerPool, INSTANCE_MODE_REQUEST, INSTANCE_MODE_STATELESS, INSTANCE_MODE_POOL, INSTANCE_MODES
+from .schema_compiler import compile_schema
+from .utils import ParamsBinder, params_binder, import_string
+
 import logging
 logger = logging.getLogger()
 
 
+# response validation modes
+# validate every response, invalid result fails the request
+RESPONSE_VALIDATION_FULL = 'full'
+# validate a sample of responses, invalid sampled result fails the request
+RESPONSE_VALIDATION_SAMPLE = 'sample'
+# validate a sample of responses after the response, invalid result is only logged
+RESPONSE_VALIDATION_SHADOW = 'shadow'
+RESPONSE_VALIDATION_MODES = (RESPONSE_VALIDATION_FULL, RESPONSE_VALIDATION_SAMPLE, RESPONSE_VALIDATION_SHADOW)
+
+
 @dataclass
 class MethodSettings:
-    # class
+    # class, or dotted path to class imported on first call, e.g. 'app.controllers.users:Users'
     cls: object
     # name function for running
     func_name: str
     # name command
     name: str
-    # marshmallow schema for validation params
+    # marshmallow schema for validation params, or dotted path to schema (class or instance)
     schema: object = field(default=None)
-    # marshmallow schema for validation response
+    # marshmallow schema for validation response, or dotted path to schema
     response_schema: object = field(default=None)
     # is deprecated method
     deprecated: bool = field(default=None)
@@ -34,19 +64,131 @@ class MethodSettings:
     acl: dict = field(default=None)
     # function that get user_acl and return true or false
     acl_func: types.FunctionType = field(default=None)
+    # admission priority, methods with higher priority are shed last
+    priority: int = field(default=0)
+    # concurrency limiter of method, see ajsonrpc.concurrency
+    limiter: object = field(default=None)
+    # circuit breaker of method, see ajsonrpc.circuit
+    circuit_breaker: object = field(default=None)
+    # response validation mode, see RESPONSE_VALIDATION_MODES, None - default of manager
+    response_validation: str = field(default=None)
+    # rate of validated responses in sample and shadow modes, None - default of manager
+    response_sample_rate: float = field(default=None)
+    # controller instance mode, see ajsonrpc.pool: 'request', 'stateless' or 'pool'
+    instance_mode: str = field(default=INSTANCE_MODE_REQUEST)
+    # max number of free controllers in pool instance mode
+    pool_size: int = field(default=64)
+    # controllers pool in pool instance mode
+    controller_pool: ControllerPool = field(default=None)
+    # compiled acl check, see ajsonrpc.acl
+    compiled_acl: CompiledACL = field(default=None)
+    # compiled validator of params, see ajsonrpc.schema_compiler
+    params_validator: Callable = field(default=None)
+    # compiled validator of response
+    response_validator: Callable = field(default=None)
+    # compiled validator of list response
+    response_many_validator: Callable = field(default=None)
+
+    def __post_init__(self):
+        if self.response_validation is not None and self.response_validation not in RESPONSE_VALIDATION_MODES:
+            raise ValueError(f'unknown response validation mode: {self.response_validation}')
+        if self.instance_mode not in INSTANCE_MODES:
+            raise ValueError(f'unknown instance mode: {self.instance_mode}')
+        self._stateless_method = None
+        if self.acl and self.compiled_acl is None:
+            self.compiled_acl = CompiledACL(self.acl)
+
+        # dotted path references are imported on first call or warm up
+        self._resolved = not any(isinstance(ref, str) for ref in (self.cls, self.schema, self.response_schema))
+        if self._resolved:
+            self._prepare()
+
+    @property
+    def resolved(self) -> bool:
+        return self._resolved
+
+    def resolve(self) -> 'MethodSettings':
+        """Import dotted path references of lazy registered method, compile its schemas."""
+        if self._resolved:
+            return self
+        if isinstance(self.cls, str):
+            self.cls = import_string(self.cls)
+        if isinstance(self.schema, str):
+            self.schema = self._import_schema(self.schema)
+        if isinstance(self.response_schema, str):
+            self.response_schema = self._import_schema(self.response_schema)
+        self._prepare()
+        self._resolved = True
+        logger.debug(f'{self.__class__.__name__}::resolve: msg=method is resolved, name={self.name}')
+        return self
+
+    @staticmethod
+    def _import_schema(path: str):
+        schema = import_string(path)
+        return schema() if isinstance(schema, type) else schema
+
+    def _prepare(self) -> None:
+        if self.instance_mode == INSTANCE_MODE_POOL and self.controller_pool is None:
+            self.controller_pool = ControllerPool(self.cls, self.pool_size)
+        if self.params_validator is None:
+            self.params_validator = compile_schema(self.schema)
+        if self.response_validator is None:
+            self.response_validator = compile_schema(self.response_schema)
+        if self.response_many_validator is None:
+            self.response_many_validator = compile_schema(self.response_schema, many=True)
+
+    @property
+    def stateless_method(self) -> Callable:
+        """Bound method of the single controller in stateless instance mode, created on first call."""
+        if self._stateless_method is None:
+            self._stateless_method = getattr(self.cls(None), self.func_name)
+        return self._stateless_method
+
+
+class DispatcherSnapshot(CollectionsMapping):
+
+    """Immutable methods mapping of Dispatcher at some point in time."""
+
+    __slots__ = ('methods', 'binders', 'version')
+
+    def __init__(self, methods: dict, binders: dict, version: int = 0):
+        self.methods: Mapping[str, Callable] = MappingProxyType(methods)
+        # signatures of functions registered with pass_params, resolved on registration
+        self.binders: Mapping[str, Optional[ParamsBinder]] = MappingProxyType(binders)
+        self.version = version
+
+    def __getitem__(self, key: str) -> Callable:
+        return self.methods[key]
+
+    def __len__(self):
+        return len(self.methods)
+
+    def __iter__(self):
+        return iter(self.methods)
+
+
+@dataclass
+class BulkUpdate:
+    # changes of open bulk_update block, applied to live methods at its end
+    changed: dict = field(default_factory=dict)
+    # binders of changed functions registered with pass_params
+    binders: dict = field(default_factory=dict)
+    deleted: set = field(default_factory=set)
 
 
 class Dispatcher(MutableMapping):
 
     """Dictionary-like object which maps method_name to method."""
 
-    def __init__(self, prototype: Any = None, prefix: Optional[str] = None) -> None:
+    def __init__(self, prototype: Any = None, prefix: Optional[str] = None, pass_params: bool = False) -> None:
         """ Build method dispatcher.
 
         Parameters
         ----------
         prototype : object or dict, optional
             Initial method mapping.
+        pass_params : bool, optional
+            Call methods of prototype with request params instead of request.
 
         Examples
         --------
@@ -57,28 +199,170 @@ class Dispatcher(MutableMapping):
         None
 
         """
-        self.method_map: Mapping[str, Callable] = dict()
+        # live methods, changed in place
+        self._methods = {}
+        self._binders = {}
+        self._version = 0
+        # published snapshot of live methods, None - stale, copied on next snapshot()
+        self._snapshot = DispatcherSnapshot({}, {})
+        # guards live methods and publishing, never held while user code runs
+        self._lock = threading.Lock()
+        # owner (thread, asyncio task) -> BulkUpdate of open bulk_update block
+        self._bulk = {}
 
         if prototype is not None:
-            self.add_prototype(prototype, prefix=prefix)
+            self.add_prototype(prototype, prefix=prefix, pass_params=pass_params)
+
+    @property
+    def method_map(self) -> Mapping[str, Callable]:
+        return self.snapshot().methods
+
+    @property
+    def binders(self) -> Mapping[str, Optional[ParamsBinder]]:
+        return self.snapshot().binders
+
+    def snapshot(self) -> DispatcherSnapshot:
+        """Current immutable methods mapping, calls keep the snapshot they started with."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = DispatcherSnapshot(dict(self._methods), dict(self._binders), self._version)
+                snapshot = self._snapshot
+        return snapshot
+
+    @staticmethod
+    def _owner() -> tuple:
+        """Writer identity: bulk updates of other threads and other asyncio tasks are isolated."""
+        # asyncio is not imported by dispatcher, without it there are no tasks
+        asyncio = sys.modules.get('asyncio')
+        try:
+            task = asyncio.current_task() if asyncio else None
+        except RuntimeError:
+            task = None
+        return threading.get_ident(), task
+
+    @contextlib.contextmanager
+    def bulk_update(self):
+        """Publish all changes made inside the block at once.
+
+        >>> with dispatcher.bulk_update():
+        ...     for name in names:
+        ...         dispatcher.add_class_method(Controller, name)
+
+        Inside the block the writer reads its own changes, other threads and
+        tasks see the dispatcher without them. Changes are discarded if the
+        block raises.
+        """
+        owner = self._owner()
+        if owner in self._bulk:
+            # nested bulk update
+            yield self
+            return
+
+        bulk = self._bulk[owner] = BulkUpdate()
+        try:
+            yield self
+        finally:
+            del self._bulk[owner]
+        if bulk.changed or bulk.deleted:
+            with self._lock:
+                for key in bulk.deleted:
+                    self._methods.pop(key, None)
+                    self._binders.pop(key, None)
+                self._methods.update(bulk.changed)
+                for key in bulk.changed:
+                    if key in bulk.binders:
+                        self._binders[key] = bulk.binders[key]
+                    else:
+                        self._binders.pop(key, None)
+                self._published()
+
+    def update(self, other=(), /, **kwargs) -> None:
+        with self.bulk_update():
+            super().update(other, **kwargs)
+
+    def _published(self) -> None:
+        """Live methods are changed, the next snapshot() copies them."""
+        self._version += 1
+        self._snapshot = None
 
     def __getitem__(self, key: str) -> Callable:
-        return self.method_map[key]
+        bulk = self._bulk.get(self._owner()) if self._bulk else None
+        if bulk is not None:
+            if key in bulk.changed:
+                return bulk.changed[key]
+            if key in bulk.deleted:
+                raise KeyError(key)
+        return self._methods[key]
 
     def __setitem__(self, key: str, value: Callable) -> None:
-        self.method_map[key] = value
+        self._set_method(key, value)
+
+    def _set_method(self, key: str, value: Callable, pass_params: bool = False) -> None:
+        pass_params = pass_params and not isinstance(value, MethodSettings)
+        # resolve signature out of lock
+        binder = params_binder(value) if pass_params else None
+        bulk = self._bulk.get(self._owner()) if self._bulk else None
+        if bulk is not None:
+            bulk.deleted.discard(key)
+            bulk.changed[key] = value
+            if pass_params:
+                bulk.binders[key] = binder
+            else:
+                bulk.binders.pop(key, None)
+            return
+        with self._lock:
+            self._methods[key] = value
+            if pass_params:
+                self._binders[key] = binder
+            else:
+                self._binders.pop(key, None)
+            self._published()
+
+    def _add_methods(self, methods: Mapping[str, Callable], pass_params: bool = False) -> None:
+        with self.bulk_update():
+            for key, value in methods.items():
+                self._set_method(key, value, pass_params)
 
     def __delitem__(self, key: str) -> None:
-        del self.method_map[key]
+        bulk = self._bulk.get(self._owner()) if self._bulk else None
+        if bulk is not None:
+            if key not in self:
+                raise KeyError(key)
+            bulk.changed.pop(key, None)
+            bulk.binders.pop(key, None)
+            bulk.deleted.add(key)
+            return
+        with self._lock:
+            del self._methods[key]
+            self._binders.pop(key, None)
+            self._published()
+
+    def __contains__(self, key) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
 
     def __len__(self):
-        return len(self.method_map)
+        if not self._bulk or self._owner() not in self._bulk:
+            return len(self._methods)
+        return sum(1 for _ in self)
 
     def __iter__(self):
-        return iter(self.method_map)
+        bulk = self._bulk.get(self._owner()) if self._bulk else None
+        methods = list(self._methods)
+        if bulk is None:
+            return iter(methods)
+        return itertools.chain(
+            (key for key in methods if key not in bulk.deleted and key not in bulk.changed),
+            list(bulk.changed),
+        )
 
     def __repr__(self):
-        return repr(self.method_map)
+        return repr(dict(self.method_map))
 
     @staticmethod
     def _getattr_function(prototype: Any, attr: str) -> Callable:
@@ -103,7 +387,19 @@ class Dispatcher(MutableMapping):
             if not attr.startswith("_")
         }
 
-    def add_class(self, cls: Any, prefix: Optional[str] = None) -> None:
+    @staticmethod
+    def _public_attributes(cls: type) -> Mapping[str, Any]:
+        """Public attributes of class and its bases, subclass attributes override base ones."""
+        attributes = {}
+        for klass in reversed(cls.__mro__):
+            if klass is object:
+                continue
+            for attr, value in vars(klass).items():
+                if not attr.startswith("_"):
+                    attributes[attr] = value
+        return attributes
+
+    def add_class(self, cls: Any, prefix: Optional[str] = None, pass_params: bool = False) -> None:
         """Add class to dispatcher.
 
         Adds all of the public methods to dispatcher.
@@ -112,8 +408,8 @@ class Dispatcher(MutableMapping):
         -----
             If class has instance methods (e.g. no @classmethod decorator),
             they likely would not work. Use :meth:`~add_object` instead.
-            At the moment, dispatcher creates an object with empty constructor
-            for instance methods.
+            At the moment, dispatcher creates one object with empty constructor
+            shared by all instance methods.
 
         Parameters
         ----------
@@ -121,27 +417,83 @@ class Dispatcher(MutableMapping):
             class with methods to be added to dispatcher
         prefix : str, optional
             Method prefix. If not present, lowercased class name is used.
+        pass_params : bool, optional
+            Call methods with request params instead of request.
 
         """
         if prefix is None:
             prefix = cls.__name__.lower() + '.'
 
-        self.update(Dispatcher._extract_methods(cls, prefix=prefix))
+        instance = None
+        methods = {}
+        for attr, value in Dispatcher._public_attributes(cls).items():
+            if isinstance(value, types.FunctionType):
+                if instance is None:
+                    instance = cls()
+                methods[prefix + attr] = value.__get__(instance, cls)
+            else:
+                # classmethod, staticmethod and other descriptors
+                methods[prefix + attr] = getattr(cls, attr)
+        self._add_methods(methods, pass_params)
+
+    def warm_up(self) -> int:
+        """Resolve all lazy registered methods, return number of resolved methods."""
+        resolved = 0
+        for method in self.snapshot().values():
+            if isinstance(method, MethodSettings) and not method.resolved:
+                method.resolve()
+                resolved += 1
+        return resolved
+
+    async def warm_up_async(self) -> int:
+        """Resolve lazy registered methods one by one, giving way to requests handling between them."""
+        import asyncio
+
+        resolved = 0
+        for name, method in self.snapshot().items():
+            if isinstance(method, MethodSettings) and not method.resolved:
+                try:
+                    method.resolve()
+                except Exception as e:
+                    logger.error(f'{self.__class__.__name__}::warm_up_async: msg=fail resolving method, {name=}, {e=}')
+                else:
+                    resolved += 1
+                await asyncio.sleep(0)
+        return resolved
 
     def add_class_method(self, cls: Any, func_name: str, prefix: Optional[str] = None,
                          schema = None,
                          acl: dict = None,
                          acl_func: types.FunctionType = None,
                          deprecated: bool = None,
-                         response_schema = None) -> None:
+                         response_schema = None,
+                         priority: int = 0,
+                         limiter = None,
+                         circuit_breaker = None,
+                         response_validation: str = None,
+                         response_sample_rate: float = None,
+                         instance_mode: str = INSTANCE_MODE_REQUEST,
+                         pool_size: int = 64) -> None:
         """
-        schema: marshmallow.Schema for validation params
+        cls: controller class, or dotted path to class ('package.module:Class'), imported on first call
+        schema: marshmallow.Schema for validation params, or dotted path to schema
+        priority: admission priority, methods with higher priority are shed last
+        limiter: concurrency limiter, e.g. ajsonrpc.concurrency.GradientLimiter()
+        circuit_breaker: ajsonrpc.circuit.CircuitBreaker, fails fast when method is failing
+        response_validation: 'full', 'sample' or 'shadow' validation of response_schema, None - default of manager
+        response_sample_rate: rate of validated responses in sample and shadow modes
+        instance_mode: 'request' - cls(request) per call, 'stateless' - method(request) of single controller,
+            'pool' - controllers are reused, see ajsonrpc.pool
+        pool_size: max number of free controllers in pool instance mode
         """
         # check function in class
         if prefix is None:
-            prefix = cls.__name__.lower() + '.'
+            cls_name = cls.replace(':', '.').rsplit('.', 1)[-1] if isinstance(cls, str) else cls.__name__
+            prefix = cls_name.lower() + '.'
 
         method = f'{prefix}{func_name}'
+        if circuit_breaker is not None and circuit_breaker.name is None:
+            circuit_breaker.name = method
         logger.debug(f'{self.__class__.__name__}::add_class_method: msg=add method, name={method}')
 
         self[method] = MethodSettings(
@@ -153,26 +505,33 @@ class Dispatcher(MutableMapping):
             name=method,
             deprecated=deprecated,
             response_schema=response_schema,
+            priority=priority,
+            limiter=limiter,
+            circuit_breaker=circuit_breaker,
+            response_validation=response_validation,
+            response_sample_rate=response_sample_rate,
+            instance_mode=instance_mode,
+            pool_size=pool_size,
         )
 
-    def add_object(self, obj: Any, prefix: Optional[str] = None) -> None:
+    def add_object(self, obj: Any, prefix: Optional[str] = None, pass_params: bool = False) -> None:
         if prefix is None:
             prefix = obj.__class__.__name__.lower() + '.'
 
-        self.update(Dispatcher._extract_methods(obj, prefix=prefix))
+        self._add_methods(Dispatcher._extract_methods(obj, prefix=prefix), pass_params)
 
-    def add_prototype(self, prototype: Any, prefix: Optional[str] = None) -> None:
+    def add_prototype(self, prototype: Any, prefix: Optional[str] = None, pass_params: bool = False) -> None:
         if isinstance(prototype, CollectionsMapping):
-            self.update({
+            self._add_methods({
                 (prefix or "") + key: value
                 for key, value in prototype.items()
-            })
+            }, pass_params)
         elif inspect.isclass(prototype):
-            self.add_class(prototype, prefix=prefix)
+            self.add_class(prototype, prefix=prefix, pass_params=pass_params)
         else:
-            self.add_object(prototype, prefix=prefix)
+            self.add_object(prototype, prefix=prefix, pass_params=pass_params)
 
-    def add_function(self, f: Callable = None, name: Optional[str] = None) -> Callable:
+    def add_function(self, f: Callable = None, name: Optional[str] = None, pass_params: bool = False) -> Callable:
         """ Add a method to the dispatcher.
 
         Parameters
@@ -181,6 +540,9 @@ class Dispatcher(MutableMapping):
             Callable to be added.
         name : str, optional
             Name to register (the default is function **f** name)
+        pass_params : bool, optional
+            Call f(*request.args, **request.kwargs), f returns result.
+            By default f(request) is called and returns (result, error).
 
         Notes
         -----
@@ -208,9 +570,15 @@ class Dispatcher(MutableMapping):
             def mymethod(*args, **kwargs):
                 print(args, kwargs)
 
+        Or call it with request params
+        >>> d = Dispatcher()
+        >>> @d.add_function(pass_params=True)
+            def sum(a, b):
+                return a + b
+
         """
-        if name and not f:
-            return functools.partial(self.add_function, name=name)
+        if not f:
+            return functools.partial(self.add_function, name=name, pass_params=pass_params)
 
-        self[name or f.__name__] = f
+        self._set_method(name or f.__name__, f, pass_params)
         return f
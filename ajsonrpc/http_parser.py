@@ -0,0 +1,310 @@
+"""Incremental HTTP/1.1 request parser of raw asyncio servers.
+
+Parser is fed with bytes of a connection as they arrive and returns complete
+requests, so requests split between reads, several pipelined requests in one
+read, Content-Length and chunked bodies are handled.
+
+make_parser() returns parser based on httptools if it is installed, pure python
+HTTPParser otherwise, both have the same interface::
+
+    parser = make_parser(max_body_size=1024 * 1024)
+    for request in parser.feed(data):
+        ...
+
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+try:
+    import httptools
+except ImportError:
+    httptools = None
+
+
+MAX_HEADERS_SIZE = 64 * 1024
+MAX_BODY_SIZE = 16 * 1024 * 1024
+# max size of chunk size line and of trailer line
+MAX_LINE_SIZE = 8 * 1024
+
+CHUNK_SIZE_RE = re.compile(rb'[0-9a-fA-F]+')
+
+
+class HTTPError(Exception):
+
+    """Malformed or too large request, connection is closed after response with status."""
+
+    def __init__(self, status: int, reason: str):
+        super().__init__(status, reason)
+        self.status = status
+        self.reason = reason
+        # complete requests parsed before the error in the same feed, answered before the error
+        self.requests = []
+
+
+@dataclass
+class HTTPRequest:
+    method: str
+    path: str
+    # 'HTTP/1.1'
+    version: str
+    # lowercase names
+    headers: dict = field(default_factory=dict)
+    body: bytes = b''
+    # None - by version and Connection header
+    keep_alive: Optional[bool] = None
+
+    def __post_init__(self):
+        if self.keep_alive is None:
+            connection = self.headers.get('connection', '').lower()
+            if self.version == 'HTTP/1.0':
+                self.keep_alive = 'keep-alive' in connection
+            else:
+                self.keep_alive = 'close' not in connection
+
+    @property
+    def expect_continue(self) -> bool:
+        return self.headers.get('expect', '').lower() == '100-continue'
+
+
+class HTTPParser:
+
+    """Pure python incremental parser of HTTP/1.x requests."""
+
+    def __init__(self, max_body_size: int = MAX_BODY_SIZE, max_headers_size: int = MAX_HEADERS_SIZE):
+        self.max_body_size = max_body_size
+        self.max_headers_size = max_headers_size
+        # client waits for "100 Continue" before sending body of current request
+        self.continue_pending = False
+        self._buffer = bytearray()
+        # request with parsed head, waiting for body
+        self._request = None
+        # length of body, None for chunked body
+        self._length = 0
+        # chunked body: parts, size of current chunk (None - size line is expected), trailers are parsed
+        self._parts = []
+        self._size = 0
+        self._chunk = None
+        self._trailers = False
+
+    def feed(self, data: bytes) -> list:
+        self._buffer += data
+        requests = []
+        while True:
+            try:
+                request = self._parse()
+            except HTTPError as e:
+                e.requests = requests
+                raise
+            if request is None:
+                return requests
+            requests.append(request)
+
+    def _parse(self) -> Optional[HTTPRequest]:
+        if self._request is None:
+            # empty lines before request line are ignored (RFC 9112, 2.2)
+            while self._buffer[:2] == b'\r\n':
+                del self._buffer[:2]
+            end = self._buffer.find(b'\r\n\r\n')
+            if end < 0:
+                if len(self._buffer) > self.max_headers_size:
+                    raise HTTPError(431, 'Request Header Fields Too Large')
+                return None
+            if end > self.max_headers_size:
+                raise HTTPError(431, 'Request Header Fields Too Large')
+
+            head = bytes(self._buffer[:end]).decode('latin-1')
+            del self._buffer[:end + 4]
+            self._request = self._parse_head(head)
+            self.continue_pending = self._request.expect_continue
+
+        if self._length is None:
+            body = self._parse_chunked()
+            if body is None:
+                return None
+        else:
+            if len(self._buffer) < self._length:
+                return None
+            body = bytes(self._buffer[:self._length])
+            del self._buffer[:self._length]
+
+        request, self._request = self._request, None
+        request.body = body
+        self.continue_pending = False
+        return request
+
+    def _parse_head(self, head: str) -> HTTPRequest:
+        request_line, *lines = head.split('\r\n')
+        try:
+            method, path, version = request_line.split(' ')
+        except ValueError:
+            raise HTTPError(400, 'Bad Request Line') from None
+        if not version.startswith('HTTP/1.'):
+            raise HTTPError(505, 'HTTP Version Not Supported')
+
+        headers = {}
+        for line in lines:
+            name, sep, value = line.partition(':')
+            if not sep or not name or name != name.strip() or line[0] in ' \t':
+                raise HTTPError(400, 'Bad Header')
+            name = name.lower()
+            value = value.strip()
+            if name in headers and name in ('content-length', 'transfer-encoding'):
+                if name == 'content-length' and headers[name] == value:
+                    continue
+                raise HTTPError(400, f'Duplicated {name}')
+            headers[name] = value
+
+        if 'transfer-encoding' in headers:
+            if 'content-length' in headers:
+                raise HTTPError(400, 'Content-Length With Transfer-Encoding')
+            if headers['transfer-encoding'].lower() != 'chunked':
+                raise HTTPError(501, 'Transfer-Encoding Not Implemented')
+            self._length = None
+            self._parts = []
+            self._size = 0
+            self._chunk = None
+            self._trailers = False
+        else:
+            length = headers.get('content-length', '0')
+            # isdigit() alone accepts non-ascii digits, e.g. '\xb2'
+            if not (length.isascii() and length.isdigit()):
+                raise HTTPError(400, 'Bad Content-Length')
+            self._length = int(length)
+            if self._length > self.max_body_size:
+                raise HTTPError(413, 'Payload Too Large')
+
+        return HTTPRequest(method=method, path=path, version=version, headers=headers)
+
+    def _line(self) -> Optional[bytes]:
+        end = self._buffer.find(b'\r\n')
+        if end < 0:
+            if len(self._buffer) > MAX_LINE_SIZE:
+                raise HTTPError(400, 'Line Too Long')
+            return None
+        line = bytes(self._buffer[:end])
+        del self._buffer[:end + 2]
+        return line
+
+    def _parse_chunked(self) -> Optional[bytes]:
+        while True:
+            if self._trailers:
+                line = self._line()
+                if line is None:
+                    return None
+                if not line:
+                    return b''.join(self._parts)
+                # trailer fields are ignored
+                continue
+
+            if self._chunk is None:
+                line = self._line()
+                if line is None:
+                    return None
+                size = line.split(b';', 1)[0].strip()
+                # int(size, 16) alone accepts '+5', '0x5' and '5_0'
+                if not CHUNK_SIZE_RE.fullmatch(size):
+                    raise HTTPError(400, 'Bad Chunk Size')
+                self._chunk = int(size, 16)
+                if self._chunk == 0:
+                    self._trailers = True
+                    continue
+                self._size += self._chunk
+                if self._size > self.max_body_size:
+                    raise HTTPError(413, 'Payload Too Large')
+
+            if len(self._buffer) < self._chunk + 2:
+                return None
+            if self._buffer[self._chunk:self._chunk + 2] != b'\r\n':
+                raise HTTPError(400, 'Bad Chunk')
+            self._parts.append(bytes(self._buffer[:self._chunk]))
+            del self._buffer[:self._chunk + 2]
+            self._chunk = None
+
+
+class HttpToolsParser:
+
+    """HTTPParser interface over httptools.HttpRequestParser."""
+
+    def __init__(self, max_body_size: int = MAX_BODY_SIZE, max_headers_size: int = MAX_HEADERS_SIZE):
+        self.max_body_size = max_body_size
+        self.max_headers_size = max_headers_size
+        self.continue_pending = False
+        self._parser = httptools.HttpRequestParser(self)
+        self._requests = []
+        self._reset()
+
+    def _reset(self) -> None:
+        self._url = bytearray()
+        self._headers = {}
+        self._headers_size = 0
+        self._parts = []
+        self._size = 0
+
+    def feed(self, data: bytes) -> list:
+        try:
+            self._parser.feed_data(data)
+        except httptools.HttpParserCallbackError as e:
+            if isinstance(e.__context__, HTTPError):
+                raise self._error(e.__context__) from None
+            raise self._error(HTTPError(400, 'Bad Request')) from None
+        except httptools.HttpParserUpgrade:
+            raise self._error(HTTPError(400, 'Upgrade Not Supported')) from None
+        except httptools.HttpParserError:
+            raise self._error(HTTPError(400, 'Bad Request')) from None
+
+        requests, self._requests = self._requests, []
+        return requests
+
+    def _error(self, error: HTTPError) -> HTTPError:
+        error.requests, self._requests = self._requests, []
+        return error
+
+    def _count(self, size: int) -> None:
+        self._headers_size += size
+        if self._headers_size > self.max_headers_size:
+            raise HTTPError(431, 'Request Header Fields Too Large')
+
+    # httptools callbacks
+    def on_message_begin(self) -> None:
+        self._reset()
+
+    def on_url(self, url: bytes) -> None:
+        self._count(len(url))
+        self._url += url
+
+    def on_header(self, name: bytes, value: bytes) -> None:
+        self._count(len(name) + len(value))
+        name = name.decode('latin-1').lower()
+        value = value.decode('latin-1').strip()
+        if name == 'content-length' and value.isdigit() and int(value) > self.max_body_size:
+            raise HTTPError(413, 'Payload Too Large')
+        self._headers[name] = value
+
+    def on_headers_complete(self) -> None:
+        self.continue_pending = self._headers.get('expect', '').lower() == '100-continue'
+
+    def on_body(self, body: bytes) -> None:
+        self._size += len(body)
+        if self._size > self.max_body_size:
+            raise HTTPError(413, 'Payload Too Large')
+        self._parts.append(body)
+
+    def on_message_complete(self) -> None:
+        self.continue_pending = False
+        self._requests.append(HTTPRequest(
+            method=self._parser.get_method().decode('latin-1'),
+            path=self._url.decode('latin-1'),
+            version=f'HTTP/{self._parser.get_http_version()}',
+            headers=self._headers,
+            body=b''.join(self._parts),
+            keep_alive=self._parser.should_keep_alive(),
+        ))
+
+
+def make_parser(max_body_size: int = MAX_BODY_SIZE, max_headers_size: int = MAX_HEADERS_SIZE,
+                use_httptools: bool = True):
+    """httptools based parser if it is installed and use_httptools, HTTPParser otherwise"""
+    if use_httptools and httptools is not None:
+        return HttpToolsParser(max_body_size, max_headers_size)
+    return HTTPParser(max_body_size, max_headers_size)
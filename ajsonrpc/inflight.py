@@ -0,0 +1,121 @@
+"""In-flight calls registry.
+
+Manager registers every executing call in the registry, so a worker could be
+introspected at any moment (which methods are running, for how long and in
+which phase) and particular calls could be cancelled.
+
+"""
+import asyncio
+import itertools
+from time import time, monotonic
+from typing import Any, Optional, List, Iterator
+from dataclasses import dataclass, field
+
+
+# call phases, see AsyncJSONRPCResponseManager.get_response_for_request
+PHASE_START = 'start'
+PHASE_ACL = 'acl'
+PHASE_VALIDATE = 'validate'
+PHASE_RUN = 'run'
+PHASE_VALIDATE_RESULT = 'validate_result'
+
+
+@dataclass
+class InFlightCall:
+    # registry key
+    key: int
+    # method name
+    method: str
+    # request id
+    id: Any
+    # client id, request.extra_data['cid']
+    cid: Any
+    # owning http request id, request.extra_data['_id']
+    http_id: Any
+    # wall clock start time
+    started_at: float
+    # monotonic start time, used for age
+    started: float
+    # current phase of call
+    phase: str = field(default=PHASE_START)
+    # task executing call
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+    # call is cancelled via registry
+    cancelled: bool = field(default=False)
+
+    @property
+    def age(self) -> float:
+        return monotonic() - self.started
+
+    def as_dict(self) -> dict:
+        return dict(
+            key=self.key,
+            method=self.method,
+            id=self.id,
+            cid=self.cid,
+            http_id=self.http_id,
+            started_at=self.started_at,
+            age=self.age,
+            phase=self.phase,
+            cancelled=self.cancelled,
+        )
+
+
+class InFlightRegistry:
+
+    """Registry of executing calls."""
+
+    def __init__(self):
+        self._calls = {}
+        self._keys = itertools.count(1)
+
+    def __len__(self):
+        return len(self._calls)
+
+    def __iter__(self) -> Iterator[InFlightCall]:
+        return iter(list(self._calls.values()))
+
+    def register(self, request) -> InFlightCall:
+        """Register call of request, executed by the current task."""
+        extra_data = request.extra_data or {}
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+
+        call = InFlightCall(
+            key=next(self._keys),
+            method=request.method,
+            id=request.body.get('id'),
+            cid=extra_data.get('cid'),
+            http_id=extra_data.get('_id'),
+            started_at=time(),
+            started=monotonic(),
+            task=task,
+        )
+        self._calls[call.key] = call
+        return call
+
+    def unregister(self, call: InFlightCall) -> None:
+        self._calls.pop(call.key, None)
+
+    def calls(self, method: str = None) -> List[InFlightCall]:
+        """Executing calls sorted by age, the oldest first."""
+        calls = [c for c in self._calls.values() if method is None or c.method == method]
+        calls.sort(key=lambda c: c.started)
+        return calls
+
+    def cancel(self, key: int) -> bool:
+        """Cancel call by registry key. Return True if call was found."""
+        call = self._calls.get(key)
+        if call is None or call.cancelled:
+            return False
+
+        call.cancelled = True
+        if call.task is not None:
+            call.task.cancel()
+        return True
+
+    def cancel_method(self, method: str) -> int:
+        """Cancel all calls of method. Return number of cancelled calls."""
+        return sum(self.cancel(call.key) for call in self.calls(method))
@@ -1,7 +1,9 @@
 import copy
+import functools
 import json
 import inspect
 import asyncio
+import random
 from typing import Optional, Union, Iterable, Mapping
 
 from .core import (
@@ -9,10 +11,18 @@ from .core import (
     JSONRPC20BatchResponse, JSONRPC20MethodNotFound, JSONRPC20InvalidParams,
     JSONRPC20ServerError, JSONRPC20ParseError, JSONRPC20InvalidRequest,
     JSONRPC20DispatchException, JSONRPC20InvalidParamsException,
-    JSONRPC20InvalidResultException,
+    JSONRPC20InvalidResultException, JSONRPC20ServerOverloadedException,
 )
-from .dispatcher import Dispatcher, MethodSettings
-from .utils import is_invalid_params, validate_by_schema
+from .admission import AdmissionController
+from .tenancy import TenantRateLimiter, FairScheduler
+from .reporting import ErrorReporter
+from .dispatcher import (
+    Dispatcher, DispatcherSnapshot, MethodSettings,
+    RESPONSE_VALIDATION_FULL, RESPONSE_VALIDATION_SHADOW, RESPONSE_VALIDATION_MODES,
+)
+from .pool import INSTANCE_MODE_STATELESS, INSTANCE_MODE_POOL
+from .inflight import InFlightRegistry, PHASE_ACL, PHASE_VALIDATE, PHASE_RUN, PHASE_VALIDATE_RESULT
+from .utils import validate_by_schema, validate_many_by_schema
 
 import logging
 logger = logging.getLogger()
@@ -22,18 +32,94 @@ class AsyncJSONRPCResponseManager:
 
     """Async JSON-RPC Response manager."""
 
-    def __init__(self, dispatcher: Dispatcher, serialize=json.dumps, deserialize=json.loads):
+    def __init__(self, dispatcher: Dispatcher, serialize=json.dumps, deserialize=json.loads,
+                 admission: AdmissionController = None,
+                 rate_limiter: TenantRateLimiter = None,
+                 scheduler: FairScheduler = None,
+                 error_reporter: ErrorReporter = None,
+                 response_validation: str = RESPONSE_VALIDATION_FULL,
+                 response_sample_rate: float = 1.0):
+        """
+        response_validation: default response validation mode of methods: 'full', 'sample' or 'shadow'
+        response_sample_rate: default rate of validated responses in sample and shadow modes
+        """
+        if response_validation not in RESPONSE_VALIDATION_MODES:
+            raise ValueError(f'unknown response validation mode: {response_validation}')
         self.dispatcher = dispatcher
         self.serialize = serialize
         self.deserialize = deserialize
+        # executing calls, for introspection and cancellation
+        self.inflight = InFlightRegistry()
+        # load shedding, reject calls before execution
+        self.admission = admission
+        # per-tenant rate limits, checked before execution
+        self.rate_limiter = rate_limiter
+        # weighted-fair execution slots across tenants
+        self.scheduler = scheduler
+        # errors logging, ErrorReporter(interval=60) deduplicates repeats into periodic summaries
+        self.error_reporter = error_reporter or ErrorReporter(logger)
+        self.response_validation = response_validation
+        self.response_sample_rate = response_sample_rate
+
+    def methods(self) -> Mapping:
+        """Methods mapping for a payload: snapshot of Dispatcher, dispatcher itself for plain mappings."""
+        if isinstance(self.dispatcher, Dispatcher):
+            return self.dispatcher.snapshot()
+        return self.dispatcher
+
+    async def get_response_for_request(self, request: JSONRPC20Request,
+                                       methods: Mapping = None) -> Optional[JSONRPC20Response]:
+        """Get response for an individual request.
+
+        methods: methods snapshot of the payload, current snapshot by default
+        """
+        response_id = request.id or None
+        log_prefix = f'{__name__}::get_response_for_request'
+        call = self.inflight.register(request)
+        try:
+            output = await self._get_response_for_request(request, call, self.methods() if methods is None else methods)
+        except asyncio.CancelledError:
+            # cancelled not by registry - propagate
+            if not call.cancelled:
+                raise
+            # the task keeps running, see asyncio.Task.uncancel
+            task = asyncio.current_task()
+            if hasattr(task, 'uncancel'):
+                task.uncancel()
+            output = JSONRPC20Response(
+                error=JSONRPC20ServerError(
+                    data=[{
+                        "selector": 'cancelled',
+                        "reason": 'Request is cancelled',
+                    }]
+                ),
+                id=response_id
+            )
+            logger.warning(f'{log_prefix}: msg=request is cancelled, name={request.method}, phase={call.phase}, '
+                           f'http_id={request.extra_data.get("_id")}, {response_id=}')
+        finally:
+            self.inflight.unregister(call)
+
+        # -- result log
+        res_txt = ''
+        if output.result:
+            res_txt = 'SUCCESS'
+        if output.error:
+            res_txt = f'ERROR [{output.error.code}, {output.error.message}, {output.error.data}]'
+        logger.info(f'{log_prefix}: msg={res_txt}, name={request.method}, output={output.__class__.__name__}, '
+                    f'id={id(request)}, http_id={request.extra_data.get("_id")}, ip={request.extra_data.get("_ip")}, '
+                    f'cid={request.extra_data.get("cid")}, token_id={request.extra_data.get("token_id")}, {response_id}')
+
+        output.request = request
+
+        return output
 
-    async def get_response_for_request(self, request: JSONRPC20Request) -> Optional[JSONRPC20Response]:
-        """Get response for an individual request."""
-        output = None
+    async def _get_response_for_request(self, request: JSONRPC20Request, call, methods: Mapping) -> JSONRPC20Response:
+        """Execute request, call phases are tracked in registry."""
         response_id = request.id or None
         log_prefix = f'{__name__}::get_response_for_request'
         try:
-            method = self.dispatcher[request.method]
+            method = methods[request.method]
         except KeyError:
             # method not found
             output = JSONRPC20Response(
@@ -42,65 +128,92 @@ class AsyncJSONRPCResponseManager:
             )
         else:
             try:
+                # admission control, the current call is registered already
+                if self.admission and not self.admission.admit(len(self.inflight) - 1, getattr(method, 'priority', 0)):
+                    raise JSONRPC20ServerOverloadedException()
+
+                # per-tenant rate limit
+                if self.rate_limiter:
+                    self.rate_limiter.check(request.extra_data)
+
                 # controller - class with method
                 if isinstance(method, MethodSettings):
+                    # lazy registered method is imported on first call
+                    if not method.resolved:
+                        method.resolve()
                     method_settings = method
                     # deprecated log
                     if method.deprecated:
-                        logger.warning(f'{log_prefix}: msg=method is deprecated, name={method.name}, func_name={method.func_name}')
+                        self.error_reporter.warning(
+                            f'{log_prefix}: msg=method is deprecated, name={method.name}, func_name={method.func_name}',
+                            key=('deprecated', method.name))
 
                     # check ACL
+                    call.phase = PHASE_ACL
                     if method.acl or method.acl_func:
                         # { module_name: allowed_acl_value, }
                         if user_acl := request.extra_data.get('user_acl'):
                             if method.acl_func:
-                                if not method.acl_func(user_acl):
-                                    raise PermissionError('Method is forbidden')
+                                allowed = method.acl_func(user_acl)
                             else:
-                                for module_name in user_acl:
-                                    if module_name in method.acl:
-                                        if user_acl[module_name] & method.acl[module_name] == method.acl[module_name]:
-                                            break
-                                        else:
-                                            raise PermissionError('Method is forbidden')
-                                else:
-                                    raise PermissionError('Method is forbidden')
-
+                                allowed = method.compiled_acl.allows(user_acl)
+                            if not allowed:
+                                raise PermissionError('Method is forbidden')
 
                     # validate params
+                    call.phase = PHASE_VALIDATE
                     if method.schema:
-                        validation_errors = request.validate_params(method.schema)
+                        validation_errors = request.validate_params(method.schema, method.params_validator)
                         if validation_errors:
                             raise JSONRPC20InvalidParamsException(data=validation_errors)
 
                     # run methods
-                    obj = method.cls(request)
-                    method = getattr(obj, method.func_name)
-                    result, error = await method() \
-                        if inspect.iscoroutinefunction(method) \
-                        else method()   # type: JSONRPC20Response
+                    call.phase = PHASE_RUN
+                    if method_settings.instance_mode == INSTANCE_MODE_STATELESS:
+                        method = method_settings.stateless_method
+                        result, error = await self._execute(request, method, request, limiter=method_settings.limiter,
+                                                            circuit_breaker=method_settings.circuit_breaker)
+                    elif method_settings.instance_mode == INSTANCE_MODE_POOL:
+                        obj = method_settings.controller_pool.acquire(request)
+                        method = getattr(obj, method_settings.func_name)
+                        # controller of failed or cancelled call may be left inconsistent, it is not reused
+                        result, error = await self._execute(request, method, limiter=method_settings.limiter,
+                                                            circuit_breaker=method_settings.circuit_breaker)
+                        method_settings.controller_pool.release(obj)
+                    else:
+                        obj = method.cls(request)
+                        method = getattr(obj, method.func_name)
+                        result, error = await self._execute(request, method, limiter=method_settings.limiter,
+                                                            circuit_breaker=method_settings.circuit_breaker)
 
                     # validate result
+                    call.phase = PHASE_VALIDATE_RESULT
                     if result and method_settings.response_schema:
-                        if isinstance(result, list):
-                            v_result = []
-                            for res_item in result:
-                                v_res_item, validation_errors = validate_by_schema(method_settings.response_schema, res_item)
-                                if validation_errors:
-                                    raise JSONRPC20InvalidResultException(data=validation_errors, invalid_data=res_item, method=method_settings.name)
-                                v_result.append(v_res_item)
+                        mode = method_settings.response_validation or self.response_validation
+                        if mode == RESPONSE_VALIDATION_FULL:
+                            result = self._validate_result(method_settings, result)
+                        elif random.random() < self._sample_rate(method_settings):
+                            if mode == RESPONSE_VALIDATION_SHADOW:
+                                # off the critical path, result is returned as is
+                                asyncio.get_running_loop().call_soon(
+                                    self._shadow_validate_result, request, method_settings, result)
                             else:
-                                result = v_result
-                        else:
-                            result, validation_errors = validate_by_schema(method_settings.response_schema, result)
-                            if validation_errors:
-                                raise JSONRPC20InvalidResultException(data=validation_errors, invalid_data=result, method=method_settings.name)
+                                result = self._validate_result(method_settings, result)
 
                 # controller - function or object with method
                 else:
-                    result, error = await method(request) \
-                        if inspect.iscoroutinefunction(method) \
-                        else method(request)    # type: JSONRPC20Response
+                    binders = methods.binders if isinstance(methods, DispatcherSnapshot) else {}
+                    if request.method not in binders:
+                        call.phase = PHASE_RUN
+                        result, error = await self._execute(request, method, request)
+                    else:
+                        # registered with pass_params: method(*args, **kwargs) returns result
+                        binder = binders[request.method]
+                        args, kwargs = request.args, request.kwargs
+                        if binder is not None and not binder.accepts(args, kwargs):
+                            raise JSONRPC20InvalidParamsException()
+                        call.phase = PHASE_RUN
+                        result, error = await self._execute(request, functools.partial(method, *args, **kwargs)), None
 
             except JSONRPC20InvalidParamsException as dispatch_error:
                 output = JSONRPC20Response(
@@ -109,12 +222,7 @@ class AsyncJSONRPCResponseManager:
                 )
 
             except JSONRPC20InvalidResultException as e:
-                logger.error(f'{log_prefix}: msg=result is not valid by response schema, method={e.method}', exc_info=e, extra=dict(
-                    method=method,
-                    method_name=e.method,
-                    error=e.error.data,
-                    invalid_data=e.invalid_data,
-                ))
+                self._report_invalid_result(log_prefix, request, method, e)
                 output = JSONRPC20Response(
                     error=JSONRPC20ServerError(),
                     id=response_id
@@ -138,35 +246,29 @@ class AsyncJSONRPCResponseManager:
                     ),
                     id=response_id
                 )
-                logger.error(
+                self.error_reporter.exception(
                     f'{log_prefix}: name={request.method}, msg={type(e)}, output={output.__class__.__name__}, {response_id=}',
-                    exc_info=e,
+                    e,
+                    method=request.method,
                     extra=dict(
                         extra_data=request.extra_data
                     ))
 
             except Exception as e:
-                # TODO: fix check is_invalid_params
-                if 1 == 2 and is_invalid_params(method, *request.args, **request.kwargs):
-                    # Method's parameters are incorrect
-                    output = JSONRPC20Response(
-                        error=JSONRPC20InvalidParams(),
-                        id=response_id
-                    )
-                else:
-                    # Dispatcher method raised exception
-                    output = JSONRPC20Response(
-                        error=JSONRPC20ServerError(
-                            data=[{
-                                "selector": e.__class__.__name__,
-                                "reason": str(e),
-                            }]
-                        ),
-                        id=response_id
-                    )
-                logger.error(
+                # Dispatcher method raised exception
+                output = JSONRPC20Response(
+                    error=JSONRPC20ServerError(
+                        data=[{
+                            "selector": e.__class__.__name__,
+                            "reason": str(e),
+                        }]
+                    ),
+                    id=response_id
+                )
+                self.error_reporter.exception(
                     f'{log_prefix}: name={request.method}, msg={type(e)}, output={output.__class__.__name__}, {response_id=}',
-                    exc_info=e,
+                    e,
+                    method=request.method,
                     extra=dict(
                         extra_data=request.extra_data
                     ))
@@ -174,29 +276,115 @@ class AsyncJSONRPCResponseManager:
             else:
                 output = JSONRPC20Response(result=result, error=error, id=response_id)
 
-        # -- result log
-        res_txt = ''
-        if output.result:
-            res_txt = 'SUCCESS'
-        if output.error:
-            res_txt = f'ERROR [{output.error.code}, {output.error.message}, {output.error.data}]'
-        logger.info(f'{log_prefix}: msg={res_txt}, name={request.method}, output={output.__class__.__name__}, '
-                    f'id={id(request)}, http_id={request.extra_data.get("_id")}, ip={request.extra_data.get("_ip")}, '
-                    f'cid={request.extra_data.get("cid")}, token_id={request.extra_data.get("token_id")}, {response_id}')
-
-        output.request = request
-
         return output
 
-    async def get_response_for_request_body(self, request_body, extra_data: dict = None) -> Optional[JSONRPC20Response]:
+    def _sample_rate(self, method_settings: MethodSettings) -> float:
+        if method_settings.response_sample_rate is not None:
+            return method_settings.response_sample_rate
+        return self.response_sample_rate
+
+    @staticmethod
+    def _validate_result(method_settings: MethodSettings, result):
+        """Validate result by response schema, return dumped result or raise JSONRPC20InvalidResultException."""
+        if isinstance(result, list):
+            v_result, index, validation_errors = validate_many_by_schema(
+                method_settings.response_schema, result, method_settings.response_many_validator)
+            if validation_errors:
+                raise JSONRPC20InvalidResultException(
+                    data=validation_errors, method=method_settings.name, index=index,
+                    invalid_data=result if index is None else result[index])
+            return v_result
+
+        v_result, validation_errors = validate_by_schema(method_settings.response_schema, result,
+                                                         method_settings.response_validator)
+        if validation_errors:
+            raise JSONRPC20InvalidResultException(data=validation_errors, invalid_data=result, method=method_settings.name)
+        return v_result
+
+    def _shadow_validate_result(self, request: JSONRPC20Request, method_settings: MethodSettings, result) -> None:
+        """Validate result which is already returned, log errors only."""
+        try:
+            self._validate_result(method_settings, result)
+        except JSONRPC20InvalidResultException as e:
+            self._report_invalid_result(f'{__name__}::_shadow_validate_result', request, method_settings.name, e)
+        except Exception as e:
+            self.error_reporter.exception(
+                f'{__name__}::_shadow_validate_result: msg=fail validating result, method={method_settings.name}', e,
+                method=request.method)
+
+    def _report_invalid_result(self, log_prefix: str, request: JSONRPC20Request, method,
+                               e: JSONRPC20InvalidResultException) -> None:
+        self.error_reporter.exception(
+            f'{log_prefix}: msg=result is not valid by response schema, method={e.method}, index={e.index}', e,
+            method=request.method,
+            extra=dict(
+                method=method,
+                method_name=e.method,
+                error=e.error.data,
+                invalid_data=e.invalid_data,
+                index=e.index,
+            ))
+
+    @staticmethod
+    async def _call(func, *args):
+        return await func(*args) \
+            if inspect.iscoroutinefunction(func) \
+            else func(*args)
+
+    async def _execute(self, request: JSONRPC20Request, func, *args, limiter=None, circuit_breaker=None):
+        """Run method under circuit breaker, in tenant execution slot and under method concurrency limiter."""
+        if circuit_breaker:
+            async with circuit_breaker.slot():
+                return await self._execute_limited(request, func, *args, limiter=limiter)
+        return await self._execute_limited(request, func, *args, limiter=limiter)
+
+    async def _execute_limited(self, request: JSONRPC20Request, func, *args, limiter=None):
+        if self.scheduler:
+            async with self.scheduler.slot(request.extra_data):
+                if limiter:
+                    async with limiter.slot():
+                        return await self._call(func, *args)
+                return await self._call(func, *args)
+
+        if limiter:
+            async with limiter.slot():
+                return await self._call(func, *args)
+        return await self._call(func, *args)
+
+    def stats(self) -> dict:
+        """Load protection metrics: admission, tenants, per-method limiters and circuit breakers."""
+        methods = {}
+        for name, method in self.dispatcher.items():
+            if not isinstance(method, MethodSettings):
+                continue
+            method_stats = {}
+            if method.limiter:
+                method_stats['limiter'] = method.limiter.stats()
+            if method.circuit_breaker:
+                method_stats['circuit_breaker'] = method.circuit_breaker.stats()
+            if method.controller_pool:
+                method_stats['controller_pool'] = method.controller_pool.stats()
+            if method_stats:
+                methods[name] = method_stats
+
+        return dict(
+            inflight=len(self.inflight),
+            admission=self.admission.stats(len(self.inflight)) if self.admission else None,
+            rate_limiter=dict(rejected=self.rate_limiter.rejected) if self.rate_limiter else None,
+            scheduler=self.scheduler.stats() if self.scheduler else None,
+            methods=methods,
+        )
+
+    async def get_response_for_request_body(self, request_body, extra_data: dict = None,
+                                            methods: Mapping = None) -> Optional[JSONRPC20Response]:
         """Catch parse error as well"""
         try:
             request = JSONRPC20Request.from_body(request_body)
-            request.extra_data = extra_data
+            request.extra_data = extra_data if extra_data is not None else {}
         except ValueError as e:
             return JSONRPC20Response(error=JSONRPC20InvalidRequest(data=dict(reason=str(e))))
         else:
-            return await self.get_response_for_request(request)
+            return await self.get_response_for_request(request, methods)
 
     async def get_response_for_payload(self, payload: str, extra_data: dict = None, finish_callback = None)\
             -> Optional[Union[JSONRPC20Response, JSONRPC20BatchResponse]]:
@@ -217,9 +405,11 @@ class AsyncJSONRPCResponseManager:
             return JSONRPC20Response(error=JSONRPC20InvalidRequest())
 
         requests_bodies = request_data if is_batch_request else [request_data]
+        # all requests of payload use the same methods snapshot
+        methods = self.methods()
 
         responses = await asyncio.gather(*[
-            self.get_response_for_request_body(request_body, extra_data=copy.copy(extra_data))
+            self.get_response_for_request_body(request_body, extra_data=copy.copy(extra_data), methods=methods)
             for request_body in requests_bodies
         ])
 
@@ -237,7 +427,7 @@ class AsyncJSONRPCResponseManager:
                 else:
                     finish_callback(responses)
             except Exception as e:
-                logger.error(f'{__name__}::get_response_for_payload: msg=fail running finish_callback {e=}', exc_info=e)
+                self.error_reporter.exception(f'{__name__}::get_response_for_payload: msg=fail running finish_callback {e=}', e)
 
         if is_batch_request:
             if len(nonempty_responses) > 0:
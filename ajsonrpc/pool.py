@@ -0,0 +1,64 @@
+"""Controller instance modes of class methods.
+
+By default a controller is created per call: cls(request). Opt-in modes
+remove this per-request object churn:
+
+* stateless - one controller is created with request=None, the cached bound
+  method is called with request as argument: ``async def search(self, request)``.
+* pool - controllers are taken from a pool and reset with the request of the
+  call: ``controller.reset(request)``, see BaseJSONRPC20Controller.reset and
+  its reset_attributes.
+  Controllers of calls that raised or were cancelled are not reused.
+
+Usage::
+
+    dispatcher.add_class_method(Controller, 'search', instance_mode='pool', pool_size=32)
+
+"""
+from collections import deque
+
+
+# cls(request) for every call
+INSTANCE_MODE_REQUEST = 'request'
+# one controller, request is passed to method as argument
+INSTANCE_MODE_STATELESS = 'stateless'
+# controllers are reused, reset(request) before every call
+INSTANCE_MODE_POOL = 'pool'
+INSTANCE_MODES = (INSTANCE_MODE_REQUEST, INSTANCE_MODE_STATELESS, INSTANCE_MODE_POOL)
+
+
+class ControllerPool:
+
+    """Free controllers of class, controller is created when pool is empty."""
+
+    def __init__(self, cls: type, size: int = 64):
+        """
+        cls: controller class, cls(request) and controller.reset(request) are used
+        size: max number of free controllers kept in pool
+        """
+        if not callable(getattr(cls, 'reset', None)):
+            raise ValueError(f'controller {cls.__name__} has no reset(request) method for pool instance mode')
+        self.cls = cls
+        self.size = size
+        # number of created controllers
+        self.created = 0
+        self._free = deque()
+
+    def acquire(self, request):
+        if self._free:
+            controller = self._free.pop()
+            controller.reset(request)
+            return controller
+        self.created += 1
+        return self.cls(request)
+
+    def release(self, controller) -> None:
+        if len(self._free) < self.size:
+            self._free.append(controller)
+
+    def stats(self) -> dict:
+        return dict(
+            size=self.size,
+            free=len(self._free),
+            created=self.created,
+        )
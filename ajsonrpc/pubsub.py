@@ -0,0 +1,214 @@
+"""Server-to-client push of topics over persistent connections.
+
+Instead of polling a method, clients subscribe to its topic and the server
+pushes JSON-RPC notifications ``{"jsonrpc": "2.0", "method": topic, "params": ...}``
+to all subscribers. A message is encoded once per publish, not per subscriber.
+
+Every connection (websocket of JSONRPCAiohttp, JSONRPCStreamProtocol) has a
+Subscriber with a bounded queue of encoded messages. When a slow consumer
+fills it, the policy applies: "drop" - the oldest queued message is dropped,
+"disconnect" - the connection is closed.
+
+Usage::
+
+    pubsub = PubSub()
+    pubsub.register('status')
+    pubsub.add_methods(dispatcher)          # subscribe(topic), unsubscribe(topic)
+    api = JSONRPCAiohttp(pubsub=pubsub)     # or JSONRPCStreamProtocol(manager, pubsub=pubsub)
+    ...
+    pubsub.publish('status', dict(load=0.5))
+
+"""
+import asyncio
+import json
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from .core import (
+    JSONRPC20Request, JSONRPC20InvalidRequest, JSONRPC20DispatchException, JSONRPC20InvalidParamsException,
+)
+
+import logging
+logger = logging.getLogger()
+
+
+# request.extra_data key of the connection subscriber
+SUBSCRIBER_KEY = '_subscriber'
+
+# drop the oldest queued message
+POLICY_DROP = 'drop'
+# close the connection
+POLICY_DISCONNECT = 'disconnect'
+POLICIES = (POLICY_DROP, POLICY_DISCONNECT)
+
+
+class Subscriber:
+
+    """Bounded queue of encoded messages of one connection, sent in background."""
+
+    def __init__(self, send: Callable[[str], Awaitable], close: Callable = None,
+                 max_queue: int = 100, policy: str = POLICY_DROP):
+        """
+        send: async function(message) writing message to the connection
+        close: function() closing the connection, used by disconnect policy
+        max_queue: max number of queued messages
+        policy: POLICY_DROP or POLICY_DISCONNECT, applied when queue is full
+        """
+        if policy not in POLICIES:
+            raise ValueError(f'unknown policy {policy!r}, expected one of {", ".join(POLICIES)}')
+        self.send = send
+        self._close = close
+        self.max_queue = max_queue
+        self.policy = policy
+        # subscribed topics
+        self.topics = set()
+        self.queue = deque()
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+
+    def push(self, message: str) -> bool:
+        """Queue message, return False if it is not queued."""
+        if self.closed:
+            return False
+        if len(self.queue) >= self.max_queue:
+            if self.policy == POLICY_DISCONNECT:
+                logger.warning(f'{self.__class__.__name__}::push: msg=slow consumer is disconnected, '
+                               f'queue={len(self.queue)}, topics={sorted(self.topics)}')
+                self.close()
+                return False
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(message)
+        self._ready.set()
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self.queue:
+                try:
+                    await self.send(self.queue.popleft())
+                except ConnectionError:
+                    self.closed = True
+                    self.queue.clear()
+                    return
+                except Exception as e:
+                    # e.g. RuntimeError of closing websocket, encoding error: the connection is unusable
+                    logger.error(f'{self.__class__.__name__}::_run: msg=fail sending message, subscriber is closed, '
+                                 f'topics={sorted(self.topics)}, {e=}')
+                    self.close()
+                    return
+                self.sent += 1
+
+    def stop(self) -> None:
+        """Stop sending, the connection is closed."""
+        self.closed = True
+        self.queue.clear()
+        self._task.cancel()
+
+    def close(self) -> None:
+        """Stop sending, close the connection."""
+        if self.closed:
+            return
+        self.stop()
+        if self._close:
+            self._close()
+
+    def stats(self) -> dict:
+        return dict(
+            topics=len(self.topics),
+            queue=len(self.queue),
+            sent=self.sent,
+            dropped=self.dropped,
+        )
+
+
+class PubSub:
+
+    """Topics and their subscribers."""
+
+    def __init__(self, serialize: Callable = json.dumps, max_queue: int = 100, policy: str = POLICY_DROP):
+        """
+        serialize: encoder of notifications, as serialize of AsyncJSONRPCResponseManager
+        max_queue, policy: defaults of subscribers, see Subscriber
+        """
+        self.serialize = serialize
+        self.max_queue = max_queue
+        self.policy = policy
+        # topic -> subscribers
+        self.topics = {}
+
+    def register(self, topic: str) -> None:
+        self.topics.setdefault(topic, set())
+
+    def unregister(self, topic: str) -> None:
+        for subscriber in self.topics.pop(topic, ()):
+            subscriber.topics.discard(topic)
+
+    def subscriber(self, send: Callable[[str], Awaitable], close: Callable = None) -> Subscriber:
+        """Subscriber of new connection, call unsubscribe_all when the connection is closed."""
+        return Subscriber(send, close, max_queue=self.max_queue, policy=self.policy)
+
+    def subscribe(self, topic: str, subscriber: Subscriber) -> None:
+        """Raise KeyError if topic is not registered."""
+        self.topics[topic].add(subscriber)
+        subscriber.topics.add(topic)
+
+    def unsubscribe(self, topic: str, subscriber: Subscriber) -> None:
+        self.topics.get(topic, set()).discard(subscriber)
+        subscriber.topics.discard(topic)
+
+    def unsubscribe_all(self, subscriber: Subscriber) -> None:
+        for topic in list(subscriber.topics):
+            self.unsubscribe(topic, subscriber)
+        subscriber.stop()
+
+    def publish(self, topic: str, params=None) -> int:
+        """Push notification to subscribers of topic, return number of subscribers it is queued for."""
+        subscribers = self.topics.get(topic)
+        if not subscribers:
+            return 0
+
+        # encoded once for all subscribers
+        message = self.serialize(JSONRPC20Request(method=topic, params=params, is_notification=True).body)
+        queued = 0
+        for subscriber in list(subscribers):
+            if subscriber.push(message):
+                queued += 1
+            elif subscriber.closed:
+                self.unsubscribe_all(subscriber)
+        return queued
+
+    def add_methods(self, dispatcher, subscribe: str = 'subscribe', unsubscribe: str = 'unsubscribe') -> None:
+        """Add methods subscribe(topic) and unsubscribe(topic) to dispatcher."""
+        dispatcher.add_function(self._subscribe, name=subscribe)
+        dispatcher.add_function(self._unsubscribe, name=unsubscribe)
+
+    def stats(self) -> dict:
+        return dict(topics={topic: len(subscribers) for topic, subscribers in self.topics.items()})
+
+    def _topic(self, request) -> (str, Subscriber):
+        subscriber = request.extra_data.get(SUBSCRIBER_KEY)
+        if subscriber is None:
+            raise JSONRPC20DispatchException(
+                code=JSONRPC20InvalidRequest.CODE, message=JSONRPC20InvalidRequest.MESSAGE,
+                data=dict(reason='subscriptions require persistent connection'),
+            )
+        topic = request.args[0] if request.args else request.kwargs.get('topic')
+        if not isinstance(topic, str) or topic not in self.topics:
+            raise JSONRPC20InvalidParamsException(data=dict(topic=f'unknown topic {topic!r}'))
+        return topic, subscriber
+
+    async def _subscribe(self, request) -> (Optional[bool], None):
+        topic, subscriber = self._topic(request)
+        self.subscribe(topic, subscriber)
+        return True, None
+
+    async def _unsubscribe(self, request) -> (Optional[bool], None):
+        topic, subscriber = self._topic(request)
+        self.unsubscribe(topic, subscriber)
+        return True, None
@@ -0,0 +1,125 @@
+"""Rate-limited, deduplicated errors reporting.
+
+logger.error(..., exc_info=e) formats full traceback for every failed call.
+During an upstream outage it means thousands of identical tracebacks per
+second. ErrorReporter fingerprints exceptions by type, method and traceback
+location (no formatting needed), logs the first occurrence in full and
+aggregates repeats into periodic summary counts.
+
+Deduplication is opt-in, by default every error is logged in full::
+
+    manager = AsyncJSONRPCResponseManager(dispatcher, error_reporter=ErrorReporter(interval=60))
+
+Summaries are flushed by a timer of the running event loop, so counts of the
+last repeats are logged even when errors stop.
+
+"""
+import asyncio
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Optional
+
+import logging
+
+
+def exception_fingerprint(exc: BaseException, method: str = None) -> tuple:
+    """(exception type, method, file and line where exception is raised)."""
+    tb = exc.__traceback__
+    location = None
+    if tb is not None:
+        while tb.tb_next is not None:
+            tb = tb.tb_next
+        location = (tb.tb_frame.f_code.co_filename, tb.tb_lineno)
+    return type(exc).__name__, method, location
+
+
+class _Entry:
+    __slots__ = ('msg', 'level', 'count', 'suppressed')
+
+    def __init__(self, msg: str, level: int):
+        self.msg = msg
+        self.level = level
+        self.count = 1
+        self.suppressed = 0
+
+
+class ErrorReporter:
+
+    """Log the first occurrence of error, count repeats, log summary every interval seconds."""
+
+    def __init__(self, logger: logging.Logger = None, interval: float = 0, max_fingerprints: int = 10000):
+        """
+        logger: target logger, root logger by default
+        interval: summary interval in seconds, 0 - log every occurrence in full (default)
+        max_fingerprints: max number of stored fingerprints
+        """
+        self.logger = logger or logging.getLogger()
+        self.interval = interval
+        self.max_fingerprints = max_fingerprints
+        self._entries = OrderedDict()
+        self._next_flush = monotonic() + interval
+        # timer of pending summary
+        self._timer = None
+
+    def _report(self, key: Any, level: int, msg: str, exc_info: Optional[BaseException], extra: dict) -> bool:
+        if not self.interval:
+            self.logger.log(level, msg, exc_info=exc_info, extra=extra)
+            return True
+
+        entry = self._entries.get(key)
+        if entry is None:
+            self._entries[key] = _Entry(msg, level)
+            if len(self._entries) > self.max_fingerprints:
+                self._entries.popitem(last=False)
+            self.logger.log(level, msg, exc_info=exc_info, extra=extra)
+            logged = True
+        else:
+            entry.count += 1
+            entry.suppressed += 1
+            logged = False
+
+        if monotonic() >= self._next_flush:
+            self.flush()
+        elif not logged:
+            self._schedule_flush()
+        return logged
+
+    def _schedule_flush(self) -> None:
+        if self._timer is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # no event loop, summary is flushed by the next report after interval
+            return
+        self._timer = loop.call_later(max(self._next_flush - monotonic(), 0), self._timer_flush)
+
+    def _timer_flush(self) -> None:
+        self._timer = None
+        self.flush()
+
+    def exception(self, msg: str, exc: BaseException, method: str = None, extra: dict = None) -> bool:
+        """Report exception, return True if it is logged in full."""
+        return self._report(exception_fingerprint(exc, method), logging.ERROR, msg, exc, extra)
+
+    def warning(self, msg: str, key: Any, extra: dict = None) -> bool:
+        """Report warning deduplicated by key, return True if it is logged."""
+        return self._report(('warning', key), logging.WARNING, msg, None, extra)
+
+    def flush(self) -> None:
+        """Log summary of suppressed repeats, forget fingerprints without repeats."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._next_flush = monotonic() + self.interval
+        for key, entry in list(self._entries.items()):
+            if not entry.suppressed:
+                del self._entries[key]
+                continue
+            self.logger.log(entry.level, f'{self.__class__.__name__}::flush: msg=repeated {entry.suppressed} times '
+                                         f'in {self.interval}s (total={entry.count}), {key=}, first={entry.msg}')
+            entry.suppressed = 0
+
+    def close(self) -> None:
+        """Log pending summary, cancel the timer."""
+        self.flush()
@@ -0,0 +1,387 @@
+"""Marshmallow schema compiler.
+
+Marshmallow's generic field machinery (Unmarshaller, call_and_store, per-field
+closures and exceptions) is slow on the hot path. compile_schema turns a
+schema into generated Python function at registration time. The function
+checks required fields, types, nulls, defaults, lists and nested schemas
+directly and returns the same (data, errors) as
+:func:`ajsonrpc.utils.load_by_schema`, so calc_errors_from_vd gives the same
+errors.
+
+Fields with validators or field types without native support are
+deserialized by marshmallow field itself (per-field fallback). Schemas which
+could not be validated in a single pass (see is_single_pass_schema), have
+hooks, schema-level validators or custom error handlers are not compiled.
+
+Usage::
+
+    validator = compile_schema(ParamsSchema())
+    if validator:
+        v_data, errors = validator(params)
+
+"""
+import itertools
+import weakref
+from collections.abc import Mapping
+from typing import Callable, Optional
+
+from .utils import is_single_pass_schema
+
+import logging
+logger = logging.getLogger()
+
+
+# natively compiled field types
+_NATIVE_FIELDS = ('Raw', 'String', 'Integer', 'Float', 'Number', 'Boolean', 'Dict', 'List', 'Nested')
+
+
+class _Unsupported(Exception):
+    pass
+
+
+class _SchemaCompiler:
+
+    """Generate source of functions loading schema and its nested schemas."""
+
+    def __init__(self):
+        from marshmallow import Schema, ValidationError, fields, missing
+        from marshmallow.utils import is_collection
+
+        self.m_fields = fields
+        self.base_schema = Schema
+        self.ns = dict(
+            Mapping=Mapping,
+            ValidationError=ValidationError,
+            missing=missing,
+            is_collection=is_collection,
+        )
+        self.lines = []
+        self._names = itertools.count()
+        # id(schema) -> function name
+        self._schemas = {}
+
+    def name(self, prefix: str) -> str:
+        return f'{prefix}{next(self._names)}'
+
+    def const(self, value, prefix: str = '_c') -> str:
+        name = self.name(prefix)
+        self.ns[name] = value
+        return name
+
+    def messages(self, field, key: str, **kwargs) -> list:
+        """Messages of field.fail(key), formatted as marshmallow does."""
+        try:
+            field.fail(key, **kwargs)
+        except self.ns['ValidationError'] as e:
+            return list(e.messages)
+        raise _Unsupported(key)
+
+    def check_schema(self, schema) -> None:
+        processors = getattr(schema, '__processors__', {})
+        if any(processors.values()):
+            raise _Unsupported('schema processors')
+        if schema.partial or schema.strict or not schema.opts.index_errors:
+            raise _Unsupported('schema options')
+        if type(schema).handle_error is not self.base_schema.handle_error or schema.__error_handler__:
+            raise _Unsupported('schema error handler')
+
+    def is_native(self, field) -> bool:
+        f_type = type(field)
+        if f_type.__name__ not in _NATIVE_FIELDS or f_type is not getattr(self.m_fields, f_type.__name__, None):
+            return False
+        if field.validators:
+            return False
+        if isinstance(field, self.m_fields.List):
+            return self.is_native(field.container)
+        if isinstance(field, self.m_fields.Nested):
+            if field.nested == 'self' or isinstance(field.only, str):
+                return False
+            try:
+                self.check_schema(field.schema)
+            except _Unsupported:
+                return False
+        return True
+
+    # -- schema functions
+
+    def schema_function(self, schema) -> str:
+        """Name of function(data) -> (result, errors), equal to schema.load(data) with schema.many."""
+        key = id(schema)
+        if key in self._schemas:
+            return self._schemas[key]
+        self.check_schema(schema)
+
+        func_name = self.name('_load_')
+        self._schemas[key] = func_name
+        item_func = self.item_function(schema, top=False)
+        if not schema.many:
+            self._schemas[key] = item_func
+            return item_func
+
+        self.many_function(func_name, item_func)
+        return func_name
+
+    def many_function(self, func_name: str, item_func: str) -> None:
+        """Generate function(data) loading list of items, as marshmallow Unmarshaller with many=True."""
+        self.lines += [
+            f'def {func_name}(data):',
+            f'    if not is_collection(data):',
+            f'        return [], {{"_schema": ["Invalid input type."]}}',
+            f'    ret = []',
+            f'    errors = {{}}',
+            f'    for idx, item in enumerate(data):',
+            f'        if not isinstance(item, Mapping):',
+            f'            errors[idx] = errors.get(idx, {{}})',
+            f'            errors.setdefault("_schema", []).append("Invalid input type.")',
+            f'            ret.append(None)',
+            f'            continue',
+            f'        item_ret, item_errors = {item_func}(item)',
+            f'        if item_errors:',
+            f'            errors[idx] = item_errors',
+            f'        ret.append(item_ret)',
+            f'    return ret, errors',
+            '',
+        ]
+
+    def item_function(self, schema, top: bool) -> str:
+        func_name = self.name('_load_item_')
+        dict_class = self.const(schema.dict_class, '_dict_class')
+
+        body = []
+        for field_name, field in schema.fields.items():
+            body += self.field_lines(schema, field_name, field, top)
+
+        self.lines += [
+            f'def {func_name}(data):',
+            f'    if not isinstance(data, Mapping):',
+            f'        return None, {{"_schema": ["Invalid input type."]}}',
+            f'    ret = {dict_class}()',
+            f'    errors = {{}}',
+        ] + ['    ' + line for line in body] + [
+            f'    return ret, errors',
+            '',
+        ]
+        return func_name
+
+    def field_lines(self, schema, field_name: str, field, top: bool) -> list:
+        key = repr(field_name)
+        f = self.const(field, '_f')
+        lines = [f'# {field_name}: {type(field).__name__}', f'v = data.get({key}, missing)', 'if v is missing:']
+
+        # missing value
+        missing_lines = []
+        if field.required:
+            if isinstance(field, self.m_fields.Nested) or not self.is_native(field):
+                missing_lines += [
+                    'try:',
+                    f'    {f}.deserialize(missing, {key}, data)',
+                    'except ValidationError as e:',
+                    f'    errors[{key}] = e.messages if isinstance(e.messages, dict) else list(e.messages)',
+                ]
+            else:
+                missing_lines.append(f'errors[{key}] = {self.messages(field, "required")!r}')
+        elif top and field.default is not self.ns['missing']:
+            # dump fills in default values
+            missing_lines += [
+                'if isinstance(data, dict):',
+                f'    d = {f}.serialize({key}, data)',
+                '    if d is not missing:',
+                f'        ret[{key}] = d',
+            ]
+        lines += ['    ' + line for line in (missing_lines or ['pass'])]
+
+        lines.append('else:')
+        lines += ['    ' + line for line in self.value_lines(
+            field, 'v',
+            ok=lambda expr: [f'ret[{key}] = {expr}'],
+            err=lambda expr: [f'errors[{key}] = {expr}'],
+            attr=key,
+        )]
+        return lines
+
+    def value_lines(self, field, v: str, ok, err, attr: str = 'None') -> list:
+        """Lines of field.deserialize(v): ok(expr) - lines storing result, err(expr) - lines storing messages."""
+        if not self.is_native(field):
+            f = self.const(field, '_f')
+            data = 'data' if attr != 'None' else 'None'
+            return [
+                'try:',
+                f'    x = {f}.deserialize({v}, {attr}, {data})',
+                'except ValidationError as e:',
+            ] + ['    ' + line for line in err('e.messages if isinstance(e.messages, dict) else list(e.messages)')] + [
+                'else:',
+            ] + ['    ' + line for line in ok('x')]
+
+        lines = [f'if {v} is None:']
+        if field.allow_none is True:
+            lines += ['    ' + line for line in ok('None')]
+        else:
+            lines += ['    ' + line for line in err(repr(self.messages(field, 'null')))]
+        lines.append('else:')
+        lines += ['    ' + line for line in self.type_lines(field, v, ok, err)]
+        return lines
+
+    def type_lines(self, field, v: str, ok, err) -> list:
+        m_fields = self.m_fields
+        x = self.name('x')
+
+        if isinstance(field, m_fields.Number):
+            num_type = self.const(field.num_type, '_num')
+            return [
+                'try:',
+                f'    {x} = {num_type}({v})',
+                'except (TypeError, ValueError):',
+            ] + ['    ' + line for line in err(repr(self.messages(field, 'invalid')))] + [
+                'except OverflowError:',
+            ] + ['    ' + line for line in err(repr(self.messages(field, 'too_large')))] + [
+                'else:',
+            ] + ['    ' + line for line in ok(x)]
+
+        if isinstance(field, m_fields.String):
+            return [
+                f'if type({v}) is str:',
+            ] + ['    ' + line for line in ok(v)] + [
+                f'elif isinstance({v}, bytes):',
+                '    try:',
+                f'        {x} = {v}.decode("utf-8")',
+                '    except UnicodeDecodeError:',
+            ] + ['        ' + line for line in err(repr(self.messages(field, 'invalid_utf8')))] + [
+                '    else:',
+            ] + ['        ' + line for line in ok(x)] + [
+                f'elif isinstance({v}, str):',
+            ] + ['    ' + line for line in ok(f'str({v})')] + [
+                'else:',
+            ] + ['    ' + line for line in err(repr(self.messages(field, 'invalid')))]
+
+        if isinstance(field, m_fields.Boolean):
+            if not field.truthy:
+                return ok(f'bool({v})')
+            truthy = self.const(field.truthy, '_truthy')
+            falsy = self.const(field.falsy, '_falsy')
+            invalid = repr(self.messages(field, 'invalid'))
+            return [
+                'try:',
+                f'    {x} = True if {v} in {truthy} else False if {v} in {falsy} else None',
+                'except TypeError:',
+                f'    {x} = None',
+                f'if {x} is None:',
+            ] + ['    ' + line for line in err(invalid)] + [
+                'else:',
+            ] + ['    ' + line for line in ok(x)]
+
+        if isinstance(field, m_fields.Dict):
+            return [
+                f'if isinstance({v}, Mapping):',
+            ] + ['    ' + line for line in ok(v)] + [
+                'else:',
+            ] + ['    ' + line for line in err(repr(self.messages(field, 'invalid')))]
+
+        if isinstance(field, m_fields.List):
+            idx, each, result, item_errors = self.name('idx'), self.name('each'), self.name('res'), self.name('errs')
+            return [
+                f'if not is_collection({v}):',
+            ] + ['    ' + line for line in err(repr(self.messages(field, 'invalid')))] + [
+                'else:',
+                f'    {result} = []',
+                f'    {item_errors} = {{}}',
+                f'    for {idx}, {each} in enumerate({v}):',
+            ] + ['        ' + line for line in self.value_lines(
+                field.container, each,
+                ok=lambda expr: [f'{result}.append({expr})'],
+                err=lambda expr: [f'{item_errors}[{idx}] = {expr}'],
+            )] + [
+                f'    if {item_errors}:',
+            ] + ['        ' + line for line in err(item_errors)] + [
+                '    else:',
+            ] + ['        ' + line for line in ok(result)]
+
+        if isinstance(field, m_fields.Nested):
+            func = self.schema_function(field.schema)
+            f = self.const(field, '_f')
+            result, errors = self.name('res'), self.name('errs')
+            lines = []
+            if field.many:
+                lines += [
+                    f'if not is_collection({v}):',
+                    '    try:',
+                    f'        {f}.deserialize({v})',
+                    '    except ValidationError as e:',
+                ] + ['        ' + line for line in err('list(e.messages)')] + [
+                    'else:',
+                ]
+            else:
+                lines.append('if True:')
+            return lines + [
+                f'    {result}, {errors} = {func}({v})',
+                f'    if {errors}:',
+            ] + ['        ' + line for line in err(errors)] + [
+                '    else:',
+            ] + ['        ' + line for line in ok(result)]
+
+        # Raw
+        return ok(v)
+
+    def compile(self, schema, many: bool = False) -> Callable:
+        if schema.many or not is_single_pass_schema(schema):
+            raise _Unsupported('schema is not single pass')
+        self.check_schema(schema)
+
+        load_func = self.item_function(schema, top=True)
+        if many:
+            item_func, load_func = load_func, self.name('_load_many_')
+            self.many_function(load_func, item_func)
+        self.lines += [
+            'def validate(data):',
+            f'    ret, errors = {load_func}(data)',
+            '    if errors:',
+            f'        return {"[]" if many else "{}"}, errors',
+            '    return ret, {}',
+            '',
+        ]
+        source = '\n'.join(self.lines)
+        code = compile(source, f'<compiled schema {type(schema).__name__}>', 'exec')
+        exec(code, self.ns)
+        validate = self.ns['validate']
+        validate.source = source
+        return validate
+
+
+def compile_schema(schema, many: bool = False) -> Optional[Callable]:
+    """ compile marshmallow.Schema instance into function(data) -> (data, marshmallow errors)
+
+    Result is equal to ajsonrpc.utils.load_by_schema(schema, data, many).
+    many: validate list of items in one call, errors are keyed by item index
+    Return None if schema could not be compiled, use load_by_schema for it.
+    """
+    if schema is None:
+        return None
+    # methods sharing one schema instance share its validators
+    try:
+        return _compiled_cache[schema][many]
+    except (KeyError, TypeError):
+        pass
+
+    validate = _compile_schema(schema, many)
+    try:
+        _compiled_cache.setdefault(schema, {})[many] = validate
+    except TypeError:
+        # schema is not weak referenceable
+        pass
+    return validate
+
+
+# schema instance -> {many: compiled validator or None}
+_compiled_cache = weakref.WeakKeyDictionary()
+
+
+def _compile_schema(schema, many: bool) -> Optional[Callable]:
+    try:
+        return _SchemaCompiler().compile(schema, many)
+    except ImportError:
+        return None
+    except _Unsupported as e:
+        logger.debug(f'{__name__}::compile_schema: msg=schema is not compiled, schema={type(schema).__name__}, reason={e}')
+        return None
+    except Exception as e:
+        logger.warning(f'{__name__}::compile_schema: msg=fail compiling schema, schema={type(schema).__name__}, {e=}')
+        return None
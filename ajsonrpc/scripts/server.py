@@ -3,11 +3,19 @@ import asyncio
 import json
 import logging
 import importlib.util
+import os
+import select
+import signal
+import socket
 import sys
+import time
+from collections import deque
 from inspect import getmembers, isfunction
 from ajsonrpc import __version__
 from ajsonrpc.dispatcher import Dispatcher
+from ajsonrpc.http_parser import HTTPError, HTTPRequest, MAX_BODY_SIZE, make_parser
 from ajsonrpc.manager import AsyncJSONRPCResponseManager
+from ajsonrpc.transport import FRAMINGS, JSONRPCStreamProtocol
 
 
 logger = logging.getLogger(__name__)
@@ -20,34 +28,423 @@ else:
     create_task = asyncio.ensure_future
 
 
+REASONS = {
+    200: 'OK', 204: 'No Content', 400: 'Bad Request', 405: 'Method Not Allowed', 408: 'Request Timeout',
+    413: 'Payload Too Large', 431: 'Request Header Fields Too Large', 500: 'Internal Server Error',
+    501: 'Not Implemented', 505: 'HTTP Version Not Supported',
+}
+
+
+def http_response(status: int, body: bytes = b'', keep_alive: bool = True, headers: tuple = ()) -> bytes:
+    lines = [
+        f'HTTP/1.1 {status} {REASONS.get(status, "Unknown")}',
+        'Content-Type: application/json',
+        f'Content-Length: {len(body)}',
+        'Connection: keep-alive' if keep_alive else 'Connection: close',
+        *headers,
+    ]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
 class JSONRPCProtocol(asyncio.Protocol):
-    def __init__(self, json_rpc_manager):
+    """HTTP/1.1 connection: keep-alive, pipelined requests are answered in order.
+
+    Reading is paused while max_pipeline responses are pending or transport buffer is full.
+    Idle connections (no pending responses and no data for idle_timeout seconds) are closed.
+    """
+
+    def __init__(self, json_rpc_manager, connections: set = None, max_body_size: int = MAX_BODY_SIZE,
+                 idle_timeout: float = 60.0, max_pipeline: int = 32, use_httptools: bool = True):
         self.json_rpc_manager = json_rpc_manager
+        # open connections of the worker, drained on graceful shutdown
+        self.connections = connections if connections is not None else set()
+        self.max_body_size = max_body_size
+        self.idle_timeout = idle_timeout
+        self.max_pipeline = max_pipeline
+        self.use_httptools = use_httptools
+        self.transport = None
+        self.parser = None
+        # tasks (or futures) of http responses in order of requests
+        self.pending = deque()
+        # close after pending responses
+        self.closing = False
+        self._idle_handle = None
+        self._reading_paused = False
+        self._writing_paused = False
 
     def connection_made(self, transport):
         self.transport = transport
+        self.parser = make_parser(self.max_body_size, use_httptools=self.use_httptools)
+        self.connections.add(self)
+        self._start_idle_timer()
+
+    def connection_lost(self, exc):
+        self.connections.discard(self)
+        self._stop_idle_timer()
+        self.pending.clear()
 
     def data_received(self, data):
-        message = data.decode()
-        request_method, request_message = message.split('\r\n', 1)
-        if not request_method.startswith('POST'):
+        if self.closing:
+            return
+        self._stop_idle_timer()
+        error = None
+        try:
+            requests = self.parser.feed(data)
+        except HTTPError as e:
+            logger.warning('Bad HTTP request, status={}, reason={}'.format(e.status, e.reason))
+            # pipelined requests before the bad one are answered first
+            requests = e.requests
+            error = http_response(e.status, json.dumps(dict(error=e.reason)).encode(), keep_alive=False)
+
+        for request in requests:
+            self.handle_request(request)
+
+        if error is not None:
+            self.close_when_idle(error)
+            return
+
+        if self.parser.continue_pending and not self.pending:
+            self.parser.continue_pending = False
+            self.transport.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        self._update_reading()
+        if not self.pending:
+            self._start_idle_timer()
+
+    def handle_request(self, request: HTTPRequest):
+        if self.closing:
+            return
+        if request.method != 'POST':
             logger.warning('Incorrect HTTP method, should be POST')
+            task = self._done(http_response(405, keep_alive=request.keep_alive, headers=('Allow: POST',)))
+        else:
+            task = create_task(self.respond(request))
+        self.pending.append(task)
+        if not request.keep_alive:
+            # no more requests on this connection
+            self.closing = True
+        task.add_done_callback(self.flush)
+
+    async def respond(self, request: HTTPRequest) -> bytes:
+        try:
+            payload = await self.json_rpc_manager.get_payload_for_payload(request.body.decode('utf-8', 'replace'))
+        except Exception:
+            logger.exception('Fail handling request')
+            return http_response(500, keep_alive=request.keep_alive)
+
+        if not payload:
+            # notifications only
+            return http_response(204, keep_alive=request.keep_alive)
+        return http_response(200, payload.encode('utf-8'), keep_alive=request.keep_alive)
+
+    def flush(self, _=None):
+        # write done responses in order of requests
+        while self.pending and self.pending[0].done():
+            task = self.pending.popleft()
+            if self.transport.is_closing() or task.cancelled():
+                continue
+            self.transport.write(task.result())
+
+        if self.transport.is_closing():
+            return
+        if not self.pending:
+            if self.closing:
+                self.transport.close()
+                return
+            self._start_idle_timer()
+        self._update_reading()
+
+    def close_when_idle(self, response: bytes = None):
+        """Stop reading requests, close connection after pending responses (and response)."""
+        self.closing = True
+        if response is not None:
+            self.pending.append(self._done(response))
+        self.flush()
+
+    def pause_writing(self):
+        self._writing_paused = True
+        self._update_reading()
+
+    def resume_writing(self):
+        self._writing_paused = False
+        self._update_reading()
+
+    def _done(self, response: bytes) -> asyncio.Future:
+        future = asyncio.get_event_loop().create_future()
+        future.set_result(response)
+        return future
+
+    def _update_reading(self):
+        pause = self._writing_paused or len(self.pending) >= self.max_pipeline
+        if pause != self._reading_paused and not self.transport.is_closing():
+            self._reading_paused = pause
+            if pause:
+                self.transport.pause_reading()
+            else:
+                self.transport.resume_reading()
+
+    def _start_idle_timer(self):
+        self._stop_idle_timer()
+        if self.idle_timeout:
+            self._idle_handle = asyncio.get_event_loop().call_later(self.idle_timeout, self._idle)
+
+    def _stop_idle_timer(self):
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+
+    def _idle(self):
+        self._idle_handle = None
+        if not self.pending:
+            logger.debug('Close idle connection')
+            self.transport.close()
+
+
+def load_dispatcher(path: str) -> Dispatcher:
+    """Dispatcher of all functions of the module file."""
+    spec = importlib.util.spec_from_file_location("module", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # get functions from the module
+    methods = getmembers(module, isfunction)
+    logger.info('Extracted methods: {}'.format(methods))
+    return Dispatcher(dict(methods), pass_params=True)
+
+
+def create_socket(args) -> socket.socket:
+    """Listening socket shared by all workers."""
+    if args.unix:
+        if os.path.exists(args.unix):
+            os.unlink(args.unix)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(args.unix)
+        sock.listen(args.backlog)
+    else:
+        sock = socket.create_server((args.host, args.port or 0), backlog=args.backlog)
+    sock.setblocking(False)
+    return sock
+
+
+async def drain(server, connections: set, timeout: float):
+    """Stop accepting connections, wait for open ones up to timeout, close the rest."""
+    server.close()
+    # idle keep-alive connections are closed at once, busy ones after pending responses
+    for protocol in list(connections):
+        protocol.close_when_idle()
+    deadline = time.monotonic() + timeout
+    while connections and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    for protocol in list(connections):
+        protocol.transport.close()
+    if connections:
+        logger.warning('Closed {} connections after graceful timeout'.format(len(connections)))
+
+
+def serve(args, sock: socket.socket = None):
+    """Serve requests in this process until SIGTERM/SIGINT, then drain connections.
+
+    sock: listening socket shared with other workers, otherwise the socket is bound
+    by this process (with SO_REUSEPORT if args.reuse_port).
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    json_rpc_manager = AsyncJSONRPCResponseManager(dispatcher=load_dispatcher(args.module))
+    connections = set()
+
+    def protocol_factory():
+        if args.transport == 'stream':
+            return JSONRPCStreamProtocol(
+                json_rpc_manager,
+                framing=args.framing,
+                max_frame_size=args.max_body_size,
+                max_concurrency=args.max_pipeline,
+                connections=connections,
+            )
+        return JSONRPCProtocol(
+            json_rpc_manager, connections,
+            max_body_size=args.max_body_size,
+            idle_timeout=args.idle_timeout,
+            max_pipeline=args.max_pipeline,
+            use_httptools=args.http_parser == 'auto',
+        )
+
+    # Each client connection will create a new protocol instance
+    if args.unix:
+        coro = loop.create_unix_server(protocol_factory, path=None if sock else args.unix, sock=sock,
+                                       backlog=args.backlog)
+    elif sock is not None:
+        coro = loop.create_server(protocol_factory, sock=sock)
+    else:
+        coro = loop.create_server(
+            protocol_factory,
+            host=args.host,
+            port=args.port,
+            reuse_port=args.reuse_port or None,
+            backlog=args.backlog,
+        )
+    server = loop.run_until_complete(coro)
+
+    stopping = loop.create_future()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, lambda: stopping.done() or stopping.set_result(None))
+    # reload is handled by supervisor
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    logger.info('Serving on {}, pid={}'.format(server.sockets[0].getsockname(), os.getpid()))
+    try:
+        loop.run_until_complete(stopping)
+        logger.info('Graceful shutdown, pid={}, connections={}'.format(os.getpid(), len(connections)))
+        loop.run_until_complete(drain(server, connections, args.graceful_timeout))
+        loop.run_until_complete(server.wait_closed())
+    finally:
+        loop.close()
+
+
+class Supervisor:
+    """Forks workers and restarts crashed ones.
+
+    SIGHUP: start new workers (with reloaded module), gracefully stop the old ones.
+    SIGTERM, SIGINT: gracefully stop workers and exit.
+    Workers which exited less than restart_delay seconds after start are restarted
+    with restart_delay, so broken module does not fork in a loop.
+    """
+
+    def __init__(self, worker, workers: int, graceful_timeout: float = 30.0, restart_delay: float = 1.0):
+        """
+        worker: function() -> None, run in forked process
+        workers: number of processes
+        """
+        self.worker = worker
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.restart_delay = restart_delay
+        # pid -> start time of current workers
+        self.children = {}
+        # pid -> kill deadline of stopping workers
+        self.stopping = {}
+        # monotonic times of delayed restarts
+        self.restarts = []
+        self._wakeup = None
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.set_wakeup_fd(-1)
+                os.close(self._wakeup[0])
+                os.close(self._wakeup[1])
+                for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD, signal.SIGHUP):
+                    signal.signal(signum, signal.SIG_DFL)
+                self.worker()
+            except BaseException:
+                logger.exception('Worker failed, pid={}'.format(os.getpid()))
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+
+        self.children[pid] = time.monotonic()
+        logger.info('Started worker, pid={}'.format(pid))
+        return pid
+
+    def stop(self, pids) -> None:
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        for pid in pids:
+            self.children.pop(pid, None)
+            self.stopping[pid] = deadline
+            self.kill(pid, signal.SIGTERM)
+
+    @staticmethod
+    def kill(pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    @staticmethod
+    def exit_code(status: int) -> int:
+        """exit code of waitpid status, negative signal number if killed by signal"""
+        if os.WIFSIGNALED(status):
+            return -os.WTERMSIG(status)
+        if os.WIFEXITED(status):
+            return os.WEXITSTATUS(status)
+        return status
+
+    def reap(self, terminating: bool) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            code = self.exit_code(status)
+            if self.stopping.pop(pid, None) is not None:
+                logger.info('Stopped worker, pid={}, code={}'.format(pid, code))
+                continue
+
+            started = self.children.pop(pid, None)
+            if started is None:
+                continue
+            logger.error('Worker exited unexpectedly, pid={}, code={}'.format(pid, code))
+            if not terminating:
+                uptime = time.monotonic() - started
+                self.restarts.append(time.monotonic() + (self.restart_delay if uptime < self.restart_delay else 0))
+
+    def run(self) -> int:
+        read_fd, write_fd = self._wakeup = os.pipe()
+        os.set_blocking(read_fd, False)
+        os.set_blocking(write_fd, False)
+        signal.set_wakeup_fd(write_fd)
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD, signal.SIGHUP):
+            # handlers are no-ops, signals are read from wakeup fd
+            signal.signal(signum, lambda *_: None)
+
+        for _ in range(self.workers):
+            self.spawn()
+
+        terminating = False
+        while self.children or self.stopping or (self.restarts and not terminating):
+            now = time.monotonic()
+            deadlines = self.restarts + list(self.stopping.values())
+            timeout = max(0.0, min(deadlines) - now) if deadlines else None
+            try:
+                ready, _, _ = select.select([read_fd], [], [], timeout)
+            except InterruptedError:
+                ready = []
+            signals = os.read(read_fd, 512) if ready else b''
+
+            for signum in signals:
+                if signum in (signal.SIGTERM, signal.SIGINT) and not terminating:
+                    logger.info('Graceful shutdown of workers')
+                    terminating = True
+                    self.restarts.clear()
+                    self.stop(list(self.children))
+                elif signum == signal.SIGHUP and not terminating:
+                    logger.info('Graceful reload of workers')
+                    old = list(self.children)
+                    for _ in range(self.workers):
+                        self.spawn()
+                    self.stop(old)
+
+            self.reap(terminating)
 
-        _, payload = request_message.split('\r\n\r\n', 1)
-        task = create_task(self.json_rpc_manager.get_payload_for_payload(payload))
-        task.add_done_callback(self.handle_task_result)
-    
-    def handle_task_result(self, task):
-        res = task.result()
-        self.transport.write((
-            "HTTP/1.1 200 OK\r\n"
-            "Content-Type: application/json\r\n"
-            "\r\n"
-            +  str(res)
-        ).encode("utf-8"))
+            now = time.monotonic()
+            for pid, deadline in list(self.stopping.items()):
+                if deadline <= now:
+                    logger.warning('Kill worker after graceful timeout, pid={}'.format(pid))
+                    self.kill(pid, signal.SIGKILL)
+                    self.stopping[pid] = now + self.graceful_timeout
+            for due in [due for due in self.restarts if due <= now]:
+                self.restarts.remove(due)
+                self.spawn()
 
-        logger.info('Close the client socket')
-        self.transport.close()
+        signal.set_wakeup_fd(-1)
+        os.close(read_fd)
+        os.close(write_fd)
+        return 0
 
 
 def main():
@@ -59,40 +456,55 @@ def main():
         '--version', action='version',
         version='%(prog)s {version}'.format(version=__version__))
     parser.add_argument("--host", dest="host", default="127.0.0.1")
-    parser.add_argument("--port", dest="port")
+    parser.add_argument("--port", dest="port", type=int)
+    parser.add_argument(
+        "--workers", dest="workers", type=int, default=1,
+        help="number of worker processes, supervised and restarted on crash; SIGHUP reloads them")
+    parser.add_argument(
+        "--reuse-port", dest="reuse_port", action="store_true",
+        help="every worker binds its own socket with SO_REUSEPORT instead of sharing one listening socket")
+    parser.add_argument("--backlog", dest="backlog", type=int, default=1024)
+    parser.add_argument(
+        "--graceful-timeout", dest="graceful_timeout", type=float, default=30.0,
+        help="seconds to wait for open connections on shutdown and reload")
+    parser.add_argument(
+        "--max-body-size", dest="max_body_size", type=int, default=MAX_BODY_SIZE,
+        help="max size of request body (stream frame) in bytes, larger requests get 413")
+    parser.add_argument(
+        "--idle-timeout", dest="idle_timeout", type=float, default=60.0,
+        help="seconds to keep idle keep-alive connections open, 0 - no timeout")
+    parser.add_argument(
+        "--max-pipeline", dest="max_pipeline", type=int, default=32,
+        help="max number of requests per connection handled concurrently")
+    parser.add_argument(
+        "--http-parser", dest="http_parser", choices=('auto', 'python'), default='auto',
+        help="auto - httptools if it is installed, python - pure python parser")
+    parser.add_argument(
+        "--transport", dest="transport", choices=('http', 'stream'), default='http',
+        help="stream - persistent connections without HTTP, requests are multiplexed and answered by id")
+    parser.add_argument(
+        "--framing", dest="framing", choices=tuple(FRAMINGS), default='newline',
+        help="frames of stream transport: newline-delimited or 4 bytes big-endian length prefixed")
+    parser.add_argument(
+        "--unix", dest="unix",
+        help="path of Unix domain socket to listen on instead of --host/--port")
     parser.add_argument('module')
 
     args = parser.parse_args()
+    if args.reuse_port and (not hasattr(socket, 'SO_REUSEPORT') or not args.port or args.unix):
+        logger.warning('SO_REUSEPORT requires platform support and --port, shared socket is used')
+        args.reuse_port = False
 
-    spec = importlib.util.spec_from_file_location("module", args.module)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-    # get functions from the module
-    methods = getmembers(module, isfunction)
-    logger.info('Extracted methods: {}'.format(methods))
-    dispatcher = Dispatcher(dict(methods))
-
-    json_rpc_manager = AsyncJSONRPCResponseManager(dispatcher=dispatcher)
-    loop = asyncio.get_event_loop()
-    # Each client connection will create a new protocol instance
-    coro = loop.create_server(
-        lambda: JSONRPCProtocol(json_rpc_manager),
-        host=args.host,
-        port=args.port
-    )
-    server = loop.run_until_complete(coro)
+    if args.workers <= 1:
+        serve(args)
+        return
 
-    # Serve requests until Ctrl+C is pressed
-    logger.info('Serving on {}'.format(server.sockets[0].getsockname()))
-    try:
-        loop.run_forever()
-    except KeyboardInterrupt:
-        pass
-
-    # Close the server
-    server.close()
-    loop.run_until_complete(server.wait_closed())
-    loop.close()
+    sock = None if args.reuse_port else create_socket(args)
+    supervisor = Supervisor(lambda: serve(args, sock), args.workers, graceful_timeout=args.graceful_timeout)
+    code = supervisor.run()
+    if args.unix:
+        os.unlink(args.unix)
+    sys.exit(code)
 
 
 if __name__ == '__main__':
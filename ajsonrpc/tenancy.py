@@ -0,0 +1,215 @@
+"""Per-tenant rate limiting and fair scheduling.
+
+Tenant is identified by request.extra_data fields (cid, token_id, app_id...).
+TenantRateLimiter rejects calls of tenants exceeding their token bucket,
+FairScheduler shares execution slots across tenants under contention,
+so a single tenant firing huge batches could not starve others.
+
+Usage::
+
+    manager = AsyncJSONRPCResponseManager(
+        dispatcher,
+        rate_limiter=TenantRateLimiter(rate=100, burst=500, keys=('cid',)),
+        scheduler=FairScheduler(slots=64, keys=('cid',)),
+    )
+
+"""
+import asyncio
+import heapq
+import itertools
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Iterable, Mapping, Optional
+
+from .core import JSONRPC20RateLimitedException
+
+
+def tenant_key(extra_data: Optional[Mapping], keys: tuple) -> Any:
+    """Tenant key: value of the single key, tuple of values for many keys."""
+    extra_data = extra_data or {}
+    if len(keys) == 1:
+        return extra_data.get(keys[0])
+    return tuple(extra_data.get(k) for k in keys)
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = monotonic()
+
+    def take(self, tokens: float = 1) -> bool:
+        now = monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+
+class TenantRateLimiter:
+
+    """Token bucket per tenant, buckets of idle tenants are evicted (LRU)."""
+
+    def __init__(self,
+                 rate: float,
+                 burst: float = None,
+                 keys: Iterable[str] = ('cid',),
+                 limits: Mapping[Any, tuple] = None,
+                 max_tenants: int = 10000):
+        """
+        rate: calls per second
+        burst: bucket size, default - rate
+        keys: extra_data fields identifying tenant
+        limits: custom (rate, burst) by tenant key
+        max_tenants: max number of stored buckets
+        """
+        self.rate = rate
+        self.burst = burst or rate
+        self.keys = tuple(keys)
+        self.limits = limits or {}
+        self.max_tenants = max_tenants
+        # number of rejected calls
+        self.rejected = 0
+        self._buckets = OrderedDict()
+
+    def allow(self, extra_data: Optional[Mapping]) -> bool:
+        key = tenant_key(extra_data, self.keys)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(*self.limits.get(key, (self.rate, self.burst)))
+            if len(self._buckets) > self.max_tenants:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        if bucket.take():
+            return True
+        self.rejected += 1
+        return False
+
+    def check(self, extra_data: Optional[Mapping]) -> None:
+        """Raise JSONRPC20RateLimitedException if call is not allowed."""
+        if not self.allow(extra_data):
+            raise JSONRPC20RateLimitedException(data=[{
+                "selector": 'tenant',
+                "value": tenant_key(extra_data, self.keys),
+                "reason": 'Rate limit exceeded',
+            }])
+
+
+class _FairSlot:
+    __slots__ = ('scheduler', 'extra_data')
+
+    def __init__(self, scheduler: 'FairScheduler', extra_data: Optional[Mapping]):
+        self.scheduler = scheduler
+        self.extra_data = extra_data
+
+    async def __aenter__(self):
+        await self.scheduler.acquire(self.extra_data)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.scheduler.release()
+        return False
+
+
+class FairScheduler:
+
+    """Weighted fair queue of execution slots.
+
+    While slots are free calls run immediately. Under contention waiting calls
+    are granted by the smallest virtual finish tag: tag = max(virtual_time,
+    tenant_last_tag) + 1 / weight, so every tenant gets a share of slots
+    proportional to its weight instead of first come, first served.
+
+    """
+
+    def __init__(self,
+                 slots: int,
+                 keys: Iterable[str] = ('cid',),
+                 weights: Mapping[Any, float] = None,
+                 default_weight: float = 1.0,
+                 max_tenants: int = 10000):
+        """
+        slots: number of concurrent executions
+        keys: extra_data fields identifying tenant
+        weights: weight by tenant key
+        """
+        self.slots = slots
+        self.keys = tuple(keys)
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        self.max_tenants = max_tenants
+        # number of executing calls
+        self.inflight = 0
+        self._vtime = 0.0
+        self._tags = OrderedDict()
+        self._queue = []
+        # entries of cancelled waiters in queue, skipped on release
+        self._dead = 0
+        self._seq = itertools.count()
+
+    def slot(self, extra_data: Optional[Mapping]) -> _FairSlot:
+        """Async context manager holding execution slot."""
+        return _FairSlot(self, extra_data)
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue) - self._dead
+
+    async def acquire(self, extra_data: Optional[Mapping]) -> None:
+        if self.inflight < self.slots and not self.queued:
+            self.inflight += 1
+            return
+
+        key = tenant_key(extra_data, self.keys)
+        start = max(self._vtime, self._tags.get(key, 0.0))
+        finish = start + 1.0 / self.weights.get(key, self.default_weight)
+        self._tags[key] = finish
+        self._tags.move_to_end(key)
+        if len(self._tags) > self.max_tenants:
+            self._tags.popitem(last=False)
+
+        waiter = asyncio.get_event_loop().create_future()
+        heapq.heappush(self._queue, (finish, next(self._seq), start, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.cancelled():
+                # cancelled or timed out while waiting, entry is skipped
+                self._dead += 1
+                if self._dead > len(self._queue) // 2:
+                    self._compact()
+            else:
+                # slot is granted, but the call is cancelled
+                self.release()
+            raise
+
+    def _compact(self) -> None:
+        self._queue = [entry for entry in self._queue if not entry[3].done()]
+        heapq.heapify(self._queue)
+        self._dead = 0
+
+    def release(self) -> None:
+        self.inflight -= 1
+        while self._queue and self.inflight < self.slots:
+            _, _, start, waiter = heapq.heappop(self._queue)
+            if waiter.done():
+                self._dead -= 1
+                continue
+            self._vtime = max(self._vtime, start)
+            self.inflight += 1
+            waiter.set_result(None)
+
+    def stats(self) -> dict:
+        return dict(
+            slots=self.slots,
+            inflight=self.inflight,
+            queued=self.queued,
+            tenants=len(self._tags),
+        )
@@ -0,0 +1,45 @@
+"""Test compiled ACL."""
+import unittest
+
+from ..acl import CompiledACL
+from ..core import JSONRPC20Request, JSONRPC20InvalidRequest
+from ..dispatcher import Dispatcher
+from ..manager import AsyncJSONRPCResponseManager
+
+
+class Controller:
+    def __init__(self, request):
+        self.request = request
+
+    async def get(self):
+        return 'ok', None
+
+
+class TestCompiledACL(unittest.TestCase):
+    def test_any_module(self):
+        acl = CompiledACL({'users': 0b10, 'admin': 0b01})
+        self.assertTrue(acl.allows({'users': 0b11}))
+        self.assertTrue(acl.allows({'users': 0b01, 'admin': 0b01}))
+        # order of user modules does not matter
+        self.assertTrue(acl.allows({'admin': 0b01, 'users': 0b01}))
+        self.assertFalse(acl.allows({'users': 0b01}))
+        self.assertFalse(acl.allows({'other': 0b11}))
+
+    def test_unhashable_values(self):
+        acl = CompiledACL({'users': 1})
+        self.assertTrue(acl.allows({'users': 1, 'tags': [1]}))
+        self.assertFalse(acl.allows({'tags': [1]}))
+
+
+class TestManagerACL(unittest.IsolatedAsyncioTestCase):
+    async def test_forbidden(self):
+        dispatcher = Dispatcher()
+        dispatcher.add_class_method(Controller, 'get', prefix='', acl={'users': 2})
+        manager = AsyncJSONRPCResponseManager(dispatcher)
+
+        request = JSONRPC20Request('get', id=1, extra_data={'user_acl': {'admin': 2, 'users': 2}})
+        self.assertEqual((await manager.get_response_for_request(request)).result, 'ok')
+
+        request = JSONRPC20Request('get', id=1, extra_data={'user_acl': {'users': 1}})
+        response = await manager.get_response_for_request(request)
+        self.assertEqual(response.error.code, JSONRPC20InvalidRequest.CODE)
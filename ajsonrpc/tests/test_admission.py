@@ -0,0 +1,53 @@
+"""Test admission control."""
+import asyncio
+import unittest
+
+from ..admission import AdmissionController
+from ..core import JSONRPC20Request, JSONRPC20ServerOverloaded
+from ..dispatcher import Dispatcher
+from ..manager import AsyncJSONRPCResponseManager
+
+
+class Controller:
+    def __init__(self, request):
+        self.request = request
+
+    async def sleep(self):
+        await asyncio.sleep(0.05)
+        return 'done', None
+
+
+class TestAdmissionController(unittest.TestCase):
+    def test_inflight(self):
+        admission = AdmissionController(max_inflight=2)
+        self.assertTrue(admission.admit(0))
+        self.assertTrue(admission.admit(1))
+        self.assertFalse(admission.admit(2))
+        self.assertEqual(admission.rejected, 1)
+
+    def test_priority(self):
+        admission = AdmissionController(max_inflight=4, priority_step=0.5)
+        self.assertFalse(admission.admit(4))
+        self.assertTrue(admission.admit(4, priority=1))
+        self.assertFalse(admission.admit(6, priority=1))
+        self.assertFalse(admission.admit(3, priority=-1))
+
+    def test_no_limits(self):
+        self.assertTrue(AdmissionController().admit(1000))
+
+
+class TestManagerAdmission(unittest.IsolatedAsyncioTestCase):
+    async def test_shed_by_priority(self):
+        dispatcher = Dispatcher()
+        dispatcher.add_class_method(Controller, 'sleep', prefix='')
+        dispatcher.add_class_method(Controller, 'sleep', prefix='critical.', priority=1)
+        manager = AsyncJSONRPCResponseManager(dispatcher, admission=AdmissionController(max_inflight=1))
+
+        responses = await asyncio.gather(
+            manager.get_response_for_request(JSONRPC20Request('sleep', id=1)),
+            manager.get_response_for_request(JSONRPC20Request('sleep', id=2)),
+            manager.get_response_for_request(JSONRPC20Request('critical.sleep', id=3)),
+        )
+        self.assertEqual(responses[0].result, 'done')
+        self.assertEqual(responses[1].error, JSONRPC20ServerOverloaded())
+        self.assertEqual(responses[2].result, 'done')
@@ -0,0 +1,118 @@
+"""Test per-method circuit breaker."""
+import asyncio
+import unittest
+from unittest import mock
+
+from ..circuit import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from ..core import JSONRPC20Request, JSONRPC20CircuitOpenException, JSONRPC20ServerError
+from ..dispatcher import Dispatcher
+from ..manager import AsyncJSONRPCResponseManager
+
+
+class Controller:
+    fail = True
+
+    def __init__(self, request):
+        self.request = request
+
+    async def upstream(self):
+        if Controller.fail:
+            raise ConnectionError('upstream is down')
+        return 'ok', None
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_open_by_error_rate(self):
+        breaker = CircuitBreaker(error_rate=0.5, min_calls=4)
+        for ok in (True, True, False):
+            breaker.before_call()
+            breaker.after_call(0.01, ok=ok)
+        self.assertEqual(breaker.state, CLOSED)
+
+        breaker.before_call()
+        breaker.after_call(0.01, ok=False)
+        self.assertEqual(breaker.state, OPEN)
+        with self.assertRaises(JSONRPC20CircuitOpenException):
+            breaker.before_call()
+        self.assertEqual(breaker.stats()['rejected'], 1)
+
+    def test_open_by_latency(self):
+        breaker = CircuitBreaker(error_rate=1, min_calls=2, slow_call_duration=0.1)
+        for _ in range(2):
+            breaker.before_call()
+            breaker.after_call(1.0)
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_half_open(self):
+        breaker = CircuitBreaker(error_rate=1, min_calls=1, open_timeout=10, half_open_calls=1)
+        breaker.before_call()
+        breaker.after_call(0.01, ok=False)
+        self.assertEqual(breaker.state, OPEN)
+
+        with mock.patch('ajsonrpc.circuit.monotonic', return_value=breaker._opened_at + 11):
+            breaker.before_call()
+            self.assertEqual(breaker.state, HALF_OPEN)
+            # only one probe
+            with self.assertRaises(JSONRPC20CircuitOpenException):
+                breaker.before_call()
+            breaker.after_call(0.01)
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_half_open_fail(self):
+        breaker = CircuitBreaker(error_rate=1, min_calls=1, open_timeout=0)
+        breaker.before_call()
+        breaker.after_call(0.01, ok=False)
+        breaker.before_call()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        breaker.after_call(0.01, ok=False)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.opened, 2)
+
+
+    def test_stale_call_is_not_probe(self):
+        breaker = CircuitBreaker(error_rate=1, min_calls=1, open_timeout=0)
+        slow = breaker.before_call()
+        breaker.after_call(0.01, ok=False, ticket=breaker.before_call())
+        probe = breaker.before_call()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        # call admitted while closed finishes during half-open
+        breaker.after_call(0.01, ticket=slow)
+        self.assertEqual(breaker.state, HALF_OPEN)
+        breaker.after_call(0.01, ticket=probe)
+        self.assertEqual(breaker.state, CLOSED)
+
+
+class TestManagerCircuitBreaker(unittest.IsolatedAsyncioTestCase):
+    async def test_fail_fast(self):
+        dispatcher = Dispatcher()
+        breaker = CircuitBreaker(error_rate=1, min_calls=2)
+        dispatcher.add_class_method(Controller, 'upstream', prefix='', circuit_breaker=breaker)
+        manager = AsyncJSONRPCResponseManager(dispatcher)
+        self.assertEqual(breaker.name, 'upstream')
+
+        for i in range(3):
+            res = await manager.get_response_for_request(JSONRPC20Request('upstream', id=i))
+            self.assertEqual(res.error.code, JSONRPC20ServerError.CODE)
+        self.assertEqual(res.error.data, [{'selector': 'circuit', 'reason': 'Circuit breaker is open'}])
+        self.assertEqual(manager.stats()['methods']['upstream']['circuit_breaker']['state'], OPEN)
+
+    async def test_cancelled(self):
+        breaker = CircuitBreaker(error_rate=1, min_calls=1, open_timeout=0)
+        breaker.before_call()
+        breaker.after_call(0.01, ok=False)
+
+        async def probe():
+            async with breaker.slot():
+                await asyncio.sleep(1)
+
+        task = asyncio.ensure_future(probe())
+        await asyncio.sleep(0)
+        self.assertEqual(breaker.state, HALF_OPEN)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        # cancellation is not a failure, probe slot is free again
+        self.assertEqual(breaker.state, HALF_OPEN)
+        async with breaker.slot():
+            pass
+        self.assertEqual(breaker.state, CLOSED)
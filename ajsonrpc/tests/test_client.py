@@ -0,0 +1,148 @@
+"""Test async client."""
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from ..client import Client, JSONRPCError, TransportError
+from ..core import JSONRPC20Request, JSONRPC20BatchRequest
+from ..dispatcher import Dispatcher
+from ..manager import AsyncJSONRPCResponseManager
+from ..pubsub import PubSub
+from ..scripts.server import JSONRPCProtocol
+from ..transport import start_server, start_unix_server
+
+
+async def sleep(delay, what):
+    await asyncio.sleep(delay)
+    return what
+
+
+class TestHTTPClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.calls = 0
+
+        async def flaky(what):
+            # the first call times out
+            self.calls += 1
+            if self.calls == 1:
+                await asyncio.sleep(1)
+            return what
+
+        manager = AsyncJSONRPCResponseManager(Dispatcher(dict(sleep=sleep, flaky=flaky), pass_params=True))
+        self.payloads = []
+        get_payload_for_payload = manager.get_payload_for_payload
+
+        async def counted(payload):
+            self.payloads.append(json.loads(payload))
+            return await get_payload_for_payload(payload)
+
+        manager.get_payload_for_payload = counted
+        self.connections = set()
+        self.server = await asyncio.get_running_loop().create_server(
+            lambda: JSONRPCProtocol(manager, self.connections), host='127.0.0.1', port=0,
+        )
+        self.addAsyncCleanup(self.server.wait_closed)
+        self.addCleanup(self.server.close)
+        host, port = self.server.sockets[0].getsockname()
+        self.url = f'http://{host}:{port}/'
+        self.client = Client(self.url, pool_size=2, retry_backoff=0.01)
+        self.addAsyncCleanup(self.client.close)
+
+    async def test_call(self):
+        self.assertEqual(await self.client.call('sleep', [0, 'pong']), 'pong')
+        self.assertEqual(await self.client.call('sleep', dict(delay=0, what=[1])), [1])
+        with self.assertRaises(JSONRPCError) as context:
+            await self.client.call('unknown')
+        self.assertEqual(context.exception.code, -32601)
+        self.assertEqual(self.client.inflight, {})
+
+    async def test_pooled(self):
+        results = await asyncio.gather(*(self.client.call('sleep', [0.05, i]) for i in range(6)))
+        self.assertEqual(results, list(range(6)))
+        # keep-alive connections of the pool are reused
+        self.assertEqual(len(self.connections), 2)
+
+    async def test_batch(self):
+        batch = JSONRPC20BatchRequest([
+            JSONRPC20Request('sleep', [0, 'a'], id=self.client.next_id()),
+            JSONRPC20Request('unknown', id=self.client.next_id()),
+        ])
+        responses = await self.client.send(batch)
+        self.assertEqual(responses[0].result, 'a')
+        self.assertEqual(responses[1].error.code, -32601)
+
+    async def test_timeout_and_retry(self):
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.client.call('flaky', ['a'], timeout=0.05)
+        self.assertEqual(self.calls, 1)
+
+        self.calls = 0
+        self.assertEqual(await self.client.call('flaky', ['a'], timeout=0.05, idempotent=True), 'a')
+        self.assertEqual(self.calls, 2)
+
+    async def test_auto_batch(self):
+        async with Client(self.url, batch_window=0.01, max_batch_size=4) as client:
+            results = await asyncio.gather(*(client.call('sleep', [0, i]) for i in range(6)))
+            self.assertEqual(results, list(range(6)))
+            # full batch is sent at once, the rest after the window
+            self.assertEqual([len(p) for p in self.payloads], [4, 2])
+
+            with self.assertRaises(JSONRPCError):
+                await client.call('unknown')
+            # single request is not wrapped into batch
+            self.assertEqual(self.payloads[-1]['method'], 'unknown')
+
+            # caller gave up while waiting for the window, its request is not sent
+            with self.assertRaises(asyncio.TimeoutError):
+                await client.call('sleep', [0, 'late'], timeout=0.001)
+            await asyncio.sleep(0.02)
+            self.assertEqual(len(self.payloads), 3)
+            self.assertEqual(client.inflight, {})
+
+    async def test_connection_failed(self):
+        self.server.close()
+        await self.server.wait_closed()
+        await self.client.close()
+        with self.assertRaises(TransportError):
+            await self.client.call('sleep', [0, 'a'], idempotent=True)
+
+
+class TestStreamClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.manager = AsyncJSONRPCResponseManager(Dispatcher(dict(sleep=sleep), pass_params=True))
+
+    async def test_multiplexed(self):
+        server = await start_server(self.manager, host='127.0.0.1', port=0)
+        self.addAsyncCleanup(server.wait_closed)
+        self.addCleanup(server.close)
+        host, port = server.sockets[0].getsockname()
+        async with Client(f'tcp://{host}:{port}') as client:
+            slow = asyncio.ensure_future(client.call('sleep', [0.1, 'slow']))
+            self.assertEqual(await client.call('sleep', [0, 'fast']), 'fast')
+            self.assertFalse(slow.done())
+            self.assertEqual(await slow, 'slow')
+
+            # connection is lost, calls in flight fail
+            pending = asyncio.ensure_future(client.call('sleep', [1, 'lost']))
+            await asyncio.sleep(0.05)
+            client.transport._writer.transport.abort()
+            with self.assertRaises(TransportError):
+                await pending
+
+    async def test_unix_push(self):
+        pubsub = PubSub()
+        pubsub.register('status')
+        pubsub.add_methods(self.manager.dispatcher)
+        path = os.path.join(tempfile.mkdtemp(), 'api.sock')
+        server = await start_unix_server(self.manager, path=path, framing='length', pubsub=pubsub)
+        self.addAsyncCleanup(server.wait_closed)
+        self.addCleanup(server.close)
+
+        pushed = []
+        async with Client(f'unix://{path}', framing='length', on_notification=pushed.append) as client:
+            self.assertEqual(await client.call('subscribe', ['status']), True)
+            pubsub.publish('status', dict(load=1))
+            self.assertEqual(await client.call('sleep', [0, 'a']), 'a')
+            self.assertEqual([(r.method, r.params) for r in pushed], [('status', dict(load=1))])
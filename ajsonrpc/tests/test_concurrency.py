@@ -0,0 +1,82 @@
+"""Test adaptive concurrency limiters."""
+import asyncio
+import unittest
+
+from ..concurrency import ConcurrencyLimiter, AIMDLimiter, GradientLimiter
+from ..core import JSONRPC20Request, JSONRPC20ServerOverloaded, JSONRPC20ServerOverloadedException
+from ..dispatcher import Dispatcher
+from ..manager import AsyncJSONRPCResponseManager
+
+
+class Controller:
+    def __init__(self, request):
+        self.request = request
+
+    async def sleep(self):
+        await asyncio.sleep(0.02)
+        return 'done', None
+
+
+class TestLimiters(unittest.IsolatedAsyncioTestCase):
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            ConcurrencyLimiter()
+
+    async def test_reject_without_wait(self):
+        limiter = AIMDLimiter(initial_limit=1, max_wait=0)
+        await limiter.acquire()
+        with self.assertRaises(JSONRPC20ServerOverloadedException):
+            await limiter.acquire()
+        self.assertEqual(limiter.rejected, 1)
+        limiter.release(0.01)
+        self.assertEqual(limiter.inflight, 0)
+
+    async def test_queue(self):
+        limiter = AIMDLimiter(initial_limit=1, max_wait=1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        self.assertEqual(limiter.stats()['queued'], 1)
+        limiter.release(0.01)
+        await waiter
+        self.assertEqual(limiter.inflight, 1)
+
+    async def test_queue_timeout(self):
+        limiter = AIMDLimiter(initial_limit=1, max_wait=0.01)
+        await limiter.acquire()
+        with self.assertRaises(JSONRPC20ServerOverloadedException):
+            await limiter.acquire()
+        self.assertEqual(limiter.stats()['queued'], 0)
+
+    def test_aimd_backoff(self):
+        limiter = AIMDLimiter(initial_limit=10, latency_threshold=0.1, backoff_ratio=0.5)
+        limiter.inflight = 1
+        limiter.release(1.0)
+        self.assertEqual(limiter.limit, 5)
+        limiter.inflight = 1
+        limiter.release(0.01, ok=False)
+        self.assertEqual(limiter.limit, 2.5)
+
+    def test_gradient_degrades(self):
+        limiter = GradientLimiter(initial_limit=20, smoothing=1, latency_smoothing=1)
+        limiter.inflight = 1
+        limiter.release(0.01)
+        grown = limiter.limit
+        self.assertGreater(grown, 20)
+        for _ in range(5):
+            limiter.inflight = 1
+            limiter.release(0.1)
+        self.assertLess(limiter.limit, grown)
+
+
+class TestManagerLimiter(unittest.IsolatedAsyncioTestCase):
+    async def test_limit(self):
+        dispatcher = Dispatcher()
+        dispatcher.add_class_method(Controller, 'sleep', prefix='', limiter=AIMDLimiter(initial_limit=1, max_wait=0))
+        manager = AsyncJSONRPCResponseManager(dispatcher)
+
+        responses = await asyncio.gather(*[
+            manager.get_response_for_request(JSONRPC20Request('sleep', id=i)) for i in range(1, 3)
+        ])
+        self.assertEqual(responses[0].result, 'done')
+        self.assertEqual(responses[1].error.code, JSONRPC20ServerOverloaded.CODE)
@@ -1,3 +1,5 @@
+import asyncio
+import time
 import unittest
 from ..dispatcher import Dispatcher
 
@@ -93,6 +95,22 @@ class TestDispatcher(unittest.TestCase):
         self.assertIn("one", d)
         self.assertIn("two", d)
 
+    def test_pass_params(self):
+        d = Dispatcher({"one": lambda: 1}, pass_params=True)
+        d.add_object(Math(), prefix="", pass_params=True)
+
+        @d.add_function(pass_params=True)
+        def two():
+            return 2
+
+        d.add_function(lambda request: (None, None), name="request")
+        self.assertEqual(set(d.binders), {"one", "sum", "diff", "mul", "two"})
+
+        with d.bulk_update():
+            d["one"] = lambda request: (1, None)
+            d.add_function(lambda request: (None, None), name="three", pass_params=True)
+        self.assertEqual(set(d.binders), {"sum", "diff", "mul", "two", "three"})
+
     def test_del_method(self):
         d = Dispatcher()
         d["method"] = lambda: ""
@@ -120,3 +138,121 @@ class TestDispatcher(unittest.TestCase):
         self.assertEqual(Dispatcher._getattr_function(Math(), "sum")(3, 2), 5)
         self.assertEqual(Dispatcher._getattr_function(Math(), "diff")(3, 2), 1)
         self.assertEqual(Dispatcher._getattr_function(Math(), "mul")(3, 2), 6)
+
+    def test_class_shared_instance(self):
+        class Counter:
+            created = 0
+
+            def __init__(self):
+                Counter.created += 1
+                self.value = 0
+
+            def inc(self):
+                self.value += 1
+                return self.value
+
+            def get(self):
+                return self.value
+
+        class SubCounter(Counter):
+            def get(self):
+                return -self.value
+
+        d = Dispatcher(SubCounter, prefix="")
+        self.assertEqual(Counter.created, 1)
+        self.assertEqual(d["inc"](), 1)
+        self.assertEqual(d["get"](), -1)
+        self.assertIn("created", d)
+
+    def test_snapshot(self):
+        d = Dispatcher({"one": lambda: 1})
+        snapshot = d.snapshot()
+        d["two"] = lambda: 2
+        del d["one"]
+        self.assertEqual(list(snapshot), ["one"])
+        self.assertEqual(list(d), ["two"])
+        self.assertEqual(d.snapshot().version, snapshot.version + 2)
+        with self.assertRaises(TypeError):
+            snapshot.methods["three"] = lambda: 3
+
+    def test_bulk_update(self):
+        d = Dispatcher()
+        version = d.snapshot().version
+        with d.bulk_update():
+            for i in range(1000):
+                d[f"m{i}"] = lambda: None
+            self.assertEqual(len(d.snapshot()), 0)
+        self.assertEqual(len(d), 1000)
+        self.assertEqual(d.snapshot().version, version + 1)
+
+        with self.assertRaises(KeyError):
+            with d.bulk_update():
+                d["new"] = lambda: None
+                del d["missing"]
+        self.assertNotIn("new", d)
+
+    def test_bulk_update_reads(self):
+        d = Dispatcher({"old": lambda: 0})
+        f = lambda: 1
+        with d.bulk_update():
+            d["a"] = f
+            del d["old"]
+            self.assertIn("a", d)
+            self.assertNotIn("old", d)
+            self.assertEqual(len(d), 1)
+            self.assertIs(d.pop("a"), f)
+            self.assertEqual(list(d), [])
+            self.assertEqual(list(d.snapshot()), ["old"])
+        self.assertEqual(list(d), [])
+
+    def test_bulk_update_tasks(self):
+        d = Dispatcher()
+
+        async def bulk(started, done):
+            with d.bulk_update():
+                d["bulk"] = lambda: None
+                started.set()
+                await done.wait()
+                raise ValueError
+
+        async def main():
+            started, done = asyncio.Event(), asyncio.Event()
+            task = asyncio.ensure_future(bulk(started, done))
+            await started.wait()
+            # write of another task is not part of the open bulk update
+            d["other"] = lambda: None
+            self.assertEqual(list(d), ["other"])
+            done.set()
+            with self.assertRaises(ValueError):
+                await task
+
+        asyncio.run(main())
+        self.assertEqual(list(d), ["other"])
+
+    def test_register_many(self):
+        d = Dispatcher()
+        start = time.perf_counter()
+        for i in range(10000):
+            d[f"m{i}"] = lambda: None
+        # single writes do not copy methods
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(len(d.snapshot()), 10000)
+
+    def test_lazy_class_method(self):
+        d = Dispatcher()
+        d.add_class_method("ajsonrpc.tests.test_dispatcher:Math", "mul")
+        d.add_class_method("ajsonrpc.tests.test_dispatcher.Math", "sum", prefix="")
+        method = d["math.mul"]
+        self.assertFalse(method.resolved)
+        self.assertEqual(method.cls, "ajsonrpc.tests.test_dispatcher:Math")
+
+        self.assertEqual(d.warm_up(), 2)
+        self.assertIs(method.cls, Math)
+        self.assertIs(d["sum"].cls, Math)
+        self.assertEqual(d.warm_up(), 0)
+
+    def test_lazy_class_method_import_error(self):
+        d = Dispatcher()
+        d.add_class_method("ajsonrpc.tests.test_dispatcher:Missing", "mul")
+        with self.assertRaises(ImportError):
+            d.warm_up()
@@ -0,0 +1,110 @@
+"""Test incremental HTTP/1.1 request parsers."""
+import unittest
+
+from ..http_parser import HTTPError, HTTPParser, HttpToolsParser, httptools, make_parser
+
+PARSERS = [HTTPParser] + ([HttpToolsParser] if httptools else [])
+
+
+def post(body: bytes, *headers: str) -> bytes:
+    head = ['POST /api HTTP/1.1', 'Host: localhost', f'Content-Length: {len(body)}', *headers]
+    return ('\r\n'.join(head) + '\r\n\r\n').encode() + body
+
+
+CHUNKED = (
+    b'POST /api HTTP/1.1\r\nHost: localhost\r\nTransfer-Encoding: chunked\r\n\r\n'
+    b'4;ext=1\r\n{"a"\r\n'
+    b'3\r\n: 1\r\n'
+    b'1\r\n}\r\n'
+    b'0\r\nTrailer: x\r\n\r\n'
+)
+
+
+class TestHTTPParser(unittest.TestCase):
+    def feed(self, parser, data: bytes, step: int = None) -> list:
+        if step is None:
+            return parser.feed(data)
+        requests = []
+        for i in range(0, len(data), step):
+            requests += parser.feed(data[i:i + step])
+        return requests
+
+    def test_make_parser(self):
+        self.assertIsInstance(make_parser(use_httptools=False), HTTPParser)
+
+    def test_split_reads(self):
+        for parser_cls in PARSERS:
+            for step in (None, 1, 7):
+                with self.subTest(parser=parser_cls.__name__, step=step):
+                    requests = self.feed(parser_cls(), post(b'{"id": 1}') + CHUNKED, step)
+                    self.assertEqual([r.body for r in requests], [b'{"id": 1}', b'{"a": 1}'])
+                    self.assertEqual(requests[0].method, 'POST')
+                    self.assertEqual(requests[0].path, '/api')
+                    self.assertEqual(requests[0].headers['host'], 'localhost')
+                    self.assertTrue(requests[0].keep_alive)
+
+    def test_pipelined(self):
+        for parser_cls in PARSERS:
+            with self.subTest(parser=parser_cls.__name__):
+                data = b''.join(post(str(i).encode()) for i in range(5))
+                requests = parser_cls().feed(data + post(b'5')[:-1])
+                self.assertEqual([r.body for r in requests], [b'0', b'1', b'2', b'3', b'4'])
+
+    def test_keep_alive(self):
+        for parser_cls in PARSERS:
+            with self.subTest(parser=parser_cls.__name__):
+                self.assertFalse(parser_cls().feed(post(b'', 'Connection: close'))[0].keep_alive)
+                http10 = b'POST / HTTP/1.0\r\nContent-Length: 0\r\n\r\n'
+                self.assertFalse(parser_cls().feed(http10)[0].keep_alive)
+                self.assertTrue(parser_cls().feed(http10.replace(b'\r\n\r\n', b'\r\nConnection: keep-alive\r\n\r\n'))[0].keep_alive)
+
+    def test_expect_continue(self):
+        for parser_cls in PARSERS:
+            with self.subTest(parser=parser_cls.__name__):
+                parser = parser_cls()
+                data = post(b'{}', 'Expect: 100-continue')
+                self.assertEqual(parser.feed(data[:-2]), [])
+                self.assertTrue(parser.continue_pending)
+                self.assertEqual(len(parser.feed(data[-2:])), 1)
+                self.assertFalse(parser.continue_pending)
+
+    def test_limits(self):
+        for parser_cls in PARSERS:
+            with self.subTest(parser=parser_cls.__name__):
+                with self.assertRaises(HTTPError) as e:
+                    parser_cls(max_body_size=10).feed(post(b'x' * 11)[:-11])
+                self.assertEqual(e.exception.status, 413)
+
+                with self.assertRaises(HTTPError) as e:
+                    parser_cls(max_body_size=7).feed(CHUNKED)
+                self.assertEqual(e.exception.status, 413)
+
+                with self.assertRaises(HTTPError) as e:
+                    parser_cls(max_headers_size=100).feed(post(b'', 'X-Long: ' + 'x' * 200))
+                self.assertEqual(e.exception.status, 431)
+
+    def test_malformed(self):
+        cases = [
+            b'POST\r\n\r\n',
+            b'POST / HTTP/1.1\r\nContent-Length: x\r\n\r\n',
+            b'POST / HTTP/1.1\r\nContent-Length: 1\r\nContent-Length: 2\r\n\r\n',
+            b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\nContent-Length: 2\r\n\r\n',
+            b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\n',
+            b'POST / HTTP/1.1\r\nContent-Length: \xb2\r\n\r\n',
+            b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n+1\r\nx\r\n0\r\n\r\n',
+            b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n0x1\r\nx\r\n0\r\n\r\n',
+            b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n1_0\r\n' + b'x' * 16 + b'\r\n0\r\n\r\n',
+        ]
+        for parser_cls in PARSERS:
+            for data in cases:
+                with self.subTest(parser=parser_cls.__name__, data=data):
+                    with self.assertRaises(HTTPError) as e:
+                        parser_cls().feed(data)
+                    self.assertEqual(e.exception.status // 100, 4)
+
+    def test_requests_before_error(self):
+        for parser_cls in PARSERS:
+            with self.subTest(parser=parser_cls.__name__):
+                with self.assertRaises(HTTPError) as e:
+                    parser_cls().feed(post(b'{"id": 1}') + b'POST / HTTP/1.1\r\nContent-Length: x\r\n\r\n')
+                self.assertEqual([r.body for r in e.exception.requests], [b'{"id": 1}'])
@@ -0,0 +1,100 @@
+"""Test in-flight calls registry."""
+import asyncio
+import unittest
+
+from ..core import JSONRPC20Request, JSONRPC20ServerError
+from ..dispatcher import Dispatcher
+from ..manager import AsyncJSONRPCResponseManager
+
+try:
+    from aiohttp.test_utils import TestClient, TestServer
+    from ..backend.aiohttp_app import Application, ApiCfg, install_jsonrpc2_apis
+except ImportError:
+    TestClient = None
+
+
+class Controller:
+    def __init__(self, request):
+        self.request = request
+
+    async def sleep(self):
+        await asyncio.sleep(10)
+        return 'done', None
+
+    async def fast(self):
+        return 'fast', None
+
+
+class TestInFlightRegistry(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        dispatcher = Dispatcher()
+        dispatcher.add_class_method(Controller, 'sleep', prefix='')
+        dispatcher.add_class_method(Controller, 'fast', prefix='')
+        self.manager = AsyncJSONRPCResponseManager(dispatcher=dispatcher)
+
+    async def test_list_and_cancel(self):
+        req = JSONRPC20Request('sleep', id=1, extra_data={'cid': 5, '_id': 10})
+        task = asyncio.ensure_future(self.manager.get_response_for_request(req))
+        await asyncio.sleep(0)
+
+        calls = self.manager.inflight.calls()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0].method, 'sleep')
+        self.assertEqual(calls[0].cid, 5)
+        self.assertEqual(calls[0].http_id, 10)
+        self.assertEqual(calls[0].phase, 'run')
+
+        self.assertTrue(self.manager.inflight.cancel(calls[0].key))
+        res = await task
+        self.assertEqual(res.error.code, JSONRPC20ServerError.CODE)
+        self.assertEqual(res.id, 1)
+        self.assertEqual(len(self.manager.inflight), 0)
+
+    async def test_cancel_method(self):
+        tasks = [
+            asyncio.ensure_future(self.manager.get_response_for_request(
+                JSONRPC20Request('sleep', id=i, extra_data={})))
+            for i in range(1, 4)
+        ]
+        await asyncio.sleep(0)
+        self.assertEqual([c.id for c in self.manager.inflight.calls()], [1, 2, 3])
+
+        self.assertEqual(self.manager.inflight.cancel_method('sleep'), 3)
+        self.assertEqual(self.manager.inflight.cancel_method('sleep'), 0)
+        for res in await asyncio.gather(*tasks):
+            self.assertEqual(res.error.code, JSONRPC20ServerError.CODE)
+
+    async def test_unregister_on_finish(self):
+        res = await self.manager.get_response_for_request(JSONRPC20Request('fast', id=1, extra_data={}))
+        self.assertEqual(res.result, 'fast')
+        self.assertEqual(len(self.manager.inflight), 0)
+
+    async def test_outer_cancel_propagates(self):
+        req = JSONRPC20Request('sleep', id=1, extra_data={})
+        task = asyncio.ensure_future(self.manager.get_response_for_request(req))
+        await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(len(self.manager.inflight), 0)
+
+
+@unittest.skipIf(TestClient is None, 'aiohttp is not installed')
+class TestInFlightRoutes(unittest.IsolatedAsyncioTestCase):
+    def cfg(self, **kwargs) -> ApiCfg:
+        methods = [dict(cls=Controller, func_name='fast')]
+        return ApiCfg(title='admin', path='/admin', methods=methods, swagger=False, inflight=True, **kwargs)
+
+    async def test_auth_required(self):
+        with self.assertRaises(ValueError):
+            install_jsonrpc2_apis(Application(), [self.cfg()])
+
+        app = Application()
+        install_jsonrpc2_apis(app, [self.cfg(inflight_auth_callback=lambda r: r.headers.get('X-Admin') == '1')])
+        client = TestClient(TestServer(app))
+        await client.start_server()
+        self.addAsyncCleanup(client.close)
+        response = await client.post('/admin/jsonrpc/2.0/inflight/cancel', json=dict(method='fast'))
+        self.assertEqual(response.status, 403)
+        response = await client.get('/admin/jsonrpc/2.0/inflight', headers={'X-Admin': '1'})
+        self.assertEqual((await response.json())['count'], 0)
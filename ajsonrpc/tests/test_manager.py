@@ -1,8 +1,11 @@
 """Test Async JSON-RPC Response manager."""
+import asyncio
 import unittest
 import json
+from unittest import mock
 
 from ..core import JSONRPC20Request, JSONRPC20Response, JSONRPC20MethodNotFound, JSONRPC20InvalidParams, JSONRPC20ServerError, JSONRPC20DispatchException
+from ..dispatcher import Dispatcher
 from ..manager import AsyncJSONRPCResponseManager
 
 
@@ -17,7 +20,8 @@ class TestAsyncJSONRPCResponseManager(unittest.IsolatedAsyncioTestCase):
         async def async_sum(*args):
             return sum(args)
 
-        self.dispatcher = {
+        # upstream json-rpc functions, called with request params
+        self.dispatcher = Dispatcher({
             "subtract": subtract,
             "async_sum": async_sum,
             "dispatch_exception": lambda: raise_(
@@ -26,7 +30,7 @@ class TestAsyncJSONRPCResponseManager(unittest.IsolatedAsyncioTestCase):
                 )
             ),
             "unexpected_exception": lambda: raise_(ValueError("Unexpected")),
-        }
+        }, pass_params=True)
 
         self.manager = AsyncJSONRPCResponseManager(dispatcher=self.dispatcher)
 
@@ -236,3 +240,111 @@ class TestAsyncJSONRPCResponseManager(unittest.IsolatedAsyncioTestCase):
             {"jsonrpc": "2.0", "method": "notify_hello", "params": [7]},
         ]))
         self.assertIsNone(response)
+
+
+try:
+    from marshmallow import Schema, fields
+
+    class ResultSchema(Schema):
+        id = fields.Integer(required=True)
+except ImportError:
+    Schema = None
+
+
+class ResultController:
+    def __init__(self, request):
+        self.request = request
+
+    async def invalid(self):
+        return {'id': 'x'}, None
+
+    async def rows(self):
+        return [{'id': 1}, {'id': '2'}, {'id': 'x'}], None
+
+
+@unittest.skipIf(Schema is None, 'marshmallow is not installed')
+class TestResponseValidation(unittest.IsolatedAsyncioTestCase):
+    def make_manager(self, **kwargs) -> AsyncJSONRPCResponseManager:
+        dispatcher = Dispatcher()
+        for name in ('invalid', 'rows'):
+            dispatcher.add_class_method(ResultController, name, prefix='', response_schema=ResultSchema(), **kwargs)
+        manager = AsyncJSONRPCResponseManager(dispatcher)
+        manager.error_reporter = mock.Mock()
+        return manager
+
+    async def test_full(self):
+        manager = self.make_manager()
+        response = await manager.get_response_for_request(JSONRPC20Request('invalid', id=1))
+        self.assertEqual(response.error.code, JSONRPC20ServerError.CODE)
+
+        response = await manager.get_response_for_request(JSONRPC20Request('rows', id=1))
+        self.assertEqual(response.error.code, JSONRPC20ServerError.CODE)
+        error = manager.error_reporter.exception.call_args[0][1]
+        self.assertEqual((error.index, error.invalid_data), (2, {'id': 'x'}))
+
+    async def test_sample(self):
+        manager = self.make_manager(response_validation='sample', response_sample_rate=0)
+        response = await manager.get_response_for_request(JSONRPC20Request('invalid', id=1))
+        self.assertEqual(response.result, {'id': 'x'})
+
+    async def test_shadow(self):
+        manager = self.make_manager(response_validation='shadow')
+        response = await manager.get_response_for_request(JSONRPC20Request('invalid', id=1))
+        self.assertEqual(response.result, {'id': 'x'})
+        manager.error_reporter.exception.assert_not_called()
+        await asyncio.sleep(0)
+        manager.error_reporter.exception.assert_called_once()
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            AsyncJSONRPCResponseManager(Dispatcher(), response_validation='never')
+        with self.assertRaises(ValueError):
+            Dispatcher().add_class_method(ResultController, 'rows', response_validation='never')
+
+
+class TestParamsBinding(unittest.IsolatedAsyncioTestCase):
+    async def test_params(self):
+        dispatcher = Dispatcher()
+        dispatcher.add_function(lambda a, b=1: a - b, name='sub', pass_params=True)
+        dispatcher.add_function(lambda request: (request.params, None), name='echo')
+        # called with request by default, whatever its parameters are named
+        dispatcher.add_function(lambda r: (r.method, None), name='method')
+        manager = AsyncJSONRPCResponseManager(dispatcher)
+        manager.error_reporter = mock.Mock()
+
+        response = await manager.get_response_for_request(JSONRPC20Request('sub', params=[5, 3], id=1))
+        self.assertEqual(response.result, 2)
+        response = await manager.get_response_for_request(JSONRPC20Request('sub', params={'a': 5}, id=1))
+        self.assertEqual(response.result, 4)
+        response = await manager.get_response_for_request(JSONRPC20Request('echo', params=[1], id=1))
+        self.assertEqual(response.result, [1])
+        response = await manager.get_response_for_request(JSONRPC20Request('method', params=[1], id=1))
+        self.assertEqual(response.result, 'method')
+
+        for params in ([], [1, 2, 3], {'c': 1}):
+            response = await manager.get_response_for_request(JSONRPC20Request('sub', params=params, id=1))
+            self.assertEqual(response.error, JSONRPC20InvalidParams())
+        manager.error_reporter.exception.assert_not_called()
+
+        self.assertIn('sub', dispatcher.binders)
+        self.assertNotIn('echo', dispatcher.binders)
+        dispatcher['sub'] = lambda request: (None, None)
+        self.assertNotIn('sub', dispatcher.binders)
+
+
+@unittest.skipIf(Schema is None, 'marshmallow is not installed')
+class TestLazyRegistration(unittest.IsolatedAsyncioTestCase):
+    async def test_first_call(self):
+        dispatcher = Dispatcher()
+        dispatcher.add_class_method(f'{__name__}:ResultController', 'invalid', prefix='',
+                                    response_schema=f'{__name__}:ResultSchema')
+        manager = AsyncJSONRPCResponseManager(dispatcher)
+        manager.error_reporter = mock.Mock()
+
+        response = await manager.get_response_for_request(JSONRPC20Request('invalid', id=1))
+        self.assertEqual(response.error.code, JSONRPC20ServerError.CODE)
+        method = dispatcher['invalid']
+        self.assertTrue(method.resolved)
+        self.assertIs(method.cls, ResultController)
+        self.assertIsInstance(method.response_schema, ResultSchema)
+        self.assertIsNotNone(method.response_validator)
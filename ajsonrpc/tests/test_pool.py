@@ -0,0 +1,106 @@
+"""Test controller instance modes."""
+import unittest
+
+from ..backend.aiohttp_app.jsonrpc2_controller import BaseJSONRPC20Controller
+from ..core import JSONRPC20Request
+from ..dispatcher import Dispatcher
+from ..manager import AsyncJSONRPCResponseManager
+from ..pool import ControllerPool
+
+
+class Controller:
+    created = 0
+
+    def __init__(self, request):
+        Controller.created += 1
+        self.request = request
+
+    def reset(self, request):
+        self.request = request
+
+    async def echo(self):
+        return self.request.params, None
+
+    async def stateless_echo(self, request):
+        return request.params, None
+
+
+class TenantController(BaseJSONRPC20Controller):
+    reset_attributes = ('seen',)
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.cid = request.params[0]
+
+    def reset(self, request):
+        super().reset(request)
+        self.cid = request.params[0]
+
+    async def whoami(self):
+        if self.cid == 'fail':
+            raise ValueError(self.cid)
+        # state set during the call
+        self.seen = getattr(self, 'seen', 0) + 1
+        return [self.cid, self.seen], None
+
+
+class TestInstanceModes(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        Controller.created = 0
+
+    async def call(self, instance_mode: str, func_name: str) -> list:
+        dispatcher = Dispatcher()
+        dispatcher.add_class_method(Controller, func_name, prefix='', instance_mode=instance_mode)
+        manager = AsyncJSONRPCResponseManager(dispatcher)
+        return [
+            (await manager.get_response_for_request(JSONRPC20Request(func_name, params=[i], id=1))).result
+            for i in range(3)
+        ]
+
+    async def test_request(self):
+        self.assertEqual(await self.call('request', 'echo'), [[0], [1], [2]])
+        self.assertEqual(Controller.created, 3)
+
+    async def test_stateless(self):
+        self.assertEqual(await self.call('stateless', 'stateless_echo'), [[0], [1], [2]])
+        self.assertEqual(Controller.created, 1)
+
+    async def test_pool(self):
+        self.assertEqual(await self.call('pool', 'echo'), [[0], [1], [2]])
+        self.assertEqual(Controller.created, 1)
+
+    async def test_pool_reset(self):
+        dispatcher = Dispatcher()
+        dispatcher.add_class_method(TenantController, 'whoami', prefix='', instance_mode='pool')
+        manager = AsyncJSONRPCResponseManager(dispatcher)
+        results = []
+        for cid in ('a', 'fail', 'b'):
+            response = await manager.get_response_for_request(JSONRPC20Request('whoami', params=[cid], id=1))
+            results.append(response.result)
+        self.assertEqual(results, [['a', 1], None, ['b', 1]])
+        # controller of failed call is not returned to pool
+        self.assertEqual(dispatcher['whoami'].controller_pool.stats(), dict(size=64, free=1, created=2))
+
+    def test_default_reset(self):
+        controller = BaseJSONRPC20Controller(None)
+        controller.reset_attributes = ('user',)
+        controller.user = 'a'
+        controller.cache = 'kept'
+        request = JSONRPC20Request('whoami', id=1)
+        controller.reset(request)
+        self.assertIs(controller.request, request)
+        self.assertFalse(hasattr(controller, 'user'))
+        self.assertEqual(controller.cache, 'kept')
+
+    def test_pool_size(self):
+        pool = ControllerPool(Controller, size=1)
+        controllers = [pool.acquire(None), pool.acquire(None)]
+        for controller in controllers:
+            pool.release(controller)
+        self.assertEqual(pool.stats(), dict(size=1, free=1, created=2))
+
+    def test_no_reset(self):
+        with self.assertRaises(ValueError):
+            ControllerPool(object)
+        with self.assertRaises(ValueError):
+            Dispatcher().add_class_method(Controller, 'echo', instance_mode='shared')
@@ -0,0 +1,85 @@
+"""Test pre-fork warm-up and GC stats."""
+import gc
+import json
+import unittest
+from types import SimpleNamespace
+
+try:
+    from marshmallow import Schema, fields
+    from ..backend.aiohttp_app import Application, ApiCfg, install_jsonrpc2_apis
+    from ..backend.aiohttp_app.jsonrpc2_installer import SWAGGER_CFGS, SWAGGER_BODIES, swagger_handler
+    from ..backend.aiohttp_app.prefork import GCStats, prepare_fork, GC_STATS
+except ImportError:
+    Schema = None
+
+
+if Schema:
+    class ParamsSchema(Schema):
+        cid = fields.Integer(required=True)
+
+
+class Controller:
+    def __init__(self, request):
+        self.request = request
+
+    async def get(self):
+        """Get item"""
+        return self.request.params, None
+
+
+class TestGCStats(unittest.TestCase):
+    def test_collections(self):
+        stats = GCStats()
+        stats.install()
+        stats.install()
+        try:
+            gc.collect()
+        finally:
+            stats.uninstall()
+        gc.collect()
+
+        generation = stats.stats()['generations']['2']
+        self.assertEqual(generation['count'], 1)
+        self.assertGreater(generation['pause_total'], 0)
+        self.assertEqual(generation['pause_avg'], generation['pause_total'])
+        self.assertEqual(stats.last_pause, generation['pause_max'])
+
+        stats.reset()
+        self.assertEqual(stats.stats()['generations']['2']['count'], 0)
+
+
+@unittest.skipIf(Schema is None, 'aiohttp or marshmallow is not installed')
+class TestPrefork(unittest.TestCase):
+    def tearDown(self):
+        gc.unfreeze()
+        GC_STATS.uninstall()
+        SWAGGER_CFGS.pop('/docs/prefork/json', None)
+        SWAGGER_BODIES.pop('/docs/prefork/json', None)
+
+    def test_prefork(self):
+        methods = [dict(cls=f'{__name__}:Controller', func_name='get', schema=f'{__name__}:ParamsSchema')]
+        apis = install_jsonrpc2_apis(Application(), [ApiCfg(title='prefork', path='/prefork', methods=methods)])
+        self.assertTrue(callable(SWAGGER_CFGS['/docs/prefork/json']))
+
+        result = prepare_fork(apis)
+        self.assertEqual(result['methods'], 1)
+        self.assertGreater(result['frozen'], 0)
+        self.assertTrue(GC_STATS.installed)
+        self.assertIsInstance(SWAGGER_CFGS['/docs/prefork/json'], dict)
+        self.assertIn('/docs/prefork/json', SWAGGER_BODIES)
+        method = apis[0].manager.dispatcher['controller.get']
+        self.assertTrue(method.resolved)
+        self.assertIsNotNone(method.params_validator)
+
+        response = swagger_handler(SimpleNamespace(path='/docs/prefork/json', host='example.com'))
+        data = json.loads(response.text)
+        self.assertEqual(data['servers'], [dict(url='https://example.com'), dict(url='http://example.com')])
+        self.assertEqual(data['info']['title'], 'prefork')
+
+    def test_lazy_exports(self):
+        # importing any name of the package binds the prefork submodule as its attribute
+        from ..backend import aiohttp_app
+        from ..backend.aiohttp_app import install_jsonrpc2_apis, prepare_fork, GC_STATS as gc_stats
+        self.assertIs(prepare_fork, aiohttp_app.prefork.prepare_fork)
+        self.assertIs(gc_stats, GC_STATS)
+        self.assertTrue(callable(install_jsonrpc2_apis))
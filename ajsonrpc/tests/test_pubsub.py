@@ -0,0 +1,122 @@
+"""Test topics pushed over persistent connections."""
+import asyncio
+import json
+import unittest
+
+from ..core import JSONRPC20Request
+from ..dispatcher import Dispatcher
+from ..manager import AsyncJSONRPCResponseManager
+from ..pubsub import PubSub, Subscriber, POLICY_DISCONNECT
+from ..transport import start_server
+
+
+def request(method: str, *params, id=1) -> bytes:
+    return json.dumps(dict(jsonrpc='2.0', method=method, params=params, id=id)).encode() + b'\n'
+
+
+class TestPubSub(unittest.IsolatedAsyncioTestCase):
+    async def test_encoded_once(self):
+        encoded = []
+
+        def serialize(body):
+            encoded.append(body)
+            return json.dumps(body)
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        pubsub = PubSub(serialize=serialize)
+        pubsub.register('status')
+        subscribers = [pubsub.subscriber(send) for _ in range(3)]
+        for subscriber in subscribers:
+            pubsub.subscribe('status', subscriber)
+
+        self.assertEqual(pubsub.publish('status', dict(load=1)), 3)
+        self.assertEqual(pubsub.publish('other', dict(load=1)), 0)
+        await asyncio.sleep(0)
+        self.assertEqual(len(encoded), 1)
+        self.assertEqual([json.loads(m) for m in sent], [dict(jsonrpc='2.0', method='status', params=dict(load=1))] * 3)
+
+        pubsub.unsubscribe_all(subscribers[0])
+        self.assertEqual(pubsub.stats(), dict(topics=dict(status=2)))
+
+    async def test_slow_consumer(self):
+        blocked = asyncio.Event()
+
+        async def send(message):
+            await blocked.wait()
+
+        closed = []
+        pubsub = PubSub(max_queue=2)
+        pubsub.register('status')
+        dropping = pubsub.subscriber(send)
+        disconnecting = Subscriber(send, close=lambda: closed.append(True), max_queue=2, policy=POLICY_DISCONNECT)
+        pubsub.subscribe('status', dropping)
+        pubsub.subscribe('status', disconnecting)
+
+        # the first message is taken by send, the next ones are queued
+        pubsub.publish('status', [0])
+        await asyncio.sleep(0)
+        for i in range(1, 5):
+            pubsub.publish('status', [i])
+
+        self.assertEqual(dropping.stats()['dropped'], 2)
+        self.assertEqual([json.loads(m)['params'] for m in dropping.queue], [[3], [4]])
+        self.assertEqual(closed, [True])
+        self.assertTrue(disconnecting.closed)
+        self.assertEqual(pubsub.stats(), dict(topics=dict(status=1)))
+        blocked.set()
+        dropping.stop()
+
+    async def test_send_error(self):
+        async def send(message):
+            raise RuntimeError('websocket is closing')
+
+        closed = []
+        pubsub = PubSub()
+        pubsub.register('status')
+        subscriber = pubsub.subscriber(send, close=lambda: closed.append(True))
+        pubsub.subscribe('status', subscriber)
+
+        self.assertEqual(pubsub.publish('status', [0]), 1)
+        with self.assertLogs(level='ERROR'):
+            await asyncio.sleep(0.01)
+        self.assertTrue(subscriber.closed)
+        self.assertEqual(closed, [True])
+        # closed subscriber is unsubscribed by the next publish
+        self.assertEqual(pubsub.publish('status', [1]), 0)
+        self.assertEqual(pubsub.stats(), dict(topics=dict(status=0)))
+
+    async def test_subscribe_methods(self):
+        pubsub = PubSub()
+        pubsub.register('status')
+        dispatcher = Dispatcher()
+        pubsub.add_methods(dispatcher)
+        manager = AsyncJSONRPCResponseManager(dispatcher)
+
+        # no persistent connection
+        response = await manager.get_response_for_request(JSONRPC20Request('subscribe', params=['status'], id=1))
+        self.assertEqual(response.error.code, -32600)
+
+        server = await start_server(manager, host='127.0.0.1', port=0, pubsub=pubsub)
+        self.addAsyncCleanup(server.wait_closed)
+        self.addCleanup(server.close)
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname())
+        self.addCleanup(writer.close)
+
+        writer.write(request('subscribe', 'unknown', id=1) + request('subscribe', 'status', id=2))
+        responses = {}
+        for _ in range(2):
+            response = json.loads(await reader.readline())
+            responses[response['id']] = response
+        self.assertEqual(responses[1]['error']['code'], -32602)
+        self.assertEqual(responses[2]['result'], True)
+
+        pubsub.publish('status', dict(load=0.5))
+        self.assertEqual(json.loads(await reader.readline()), dict(jsonrpc='2.0', method='status', params=dict(load=0.5)))
+
+        writer.write(request('unsubscribe', 'status', id=3))
+        self.assertEqual(json.loads(await reader.readline())['result'], True)
+        self.assertEqual(pubsub.publish('status', dict(load=0.5)), 0)
@@ -0,0 +1,80 @@
+"""Test deduplicated errors reporting."""
+import asyncio
+import logging
+import unittest
+from unittest import mock
+
+from ..reporting import ErrorReporter, exception_fingerprint
+
+
+def fail(exc_cls=ValueError):
+    raise exc_cls('fail')
+
+
+class TestErrorReporter(unittest.TestCase):
+    def setUp(self):
+        self.logger = mock.Mock(spec=logging.Logger)
+
+    def _exc(self, exc_cls=ValueError):
+        try:
+            fail(exc_cls)
+        except Exception as e:
+            return e
+
+    def test_fingerprint(self):
+        fp = exception_fingerprint(self._exc(), 'method')
+        self.assertEqual(fp[:2], ('ValueError', 'method'))
+        self.assertEqual(fp, exception_fingerprint(self._exc(), 'method'))
+        self.assertNotEqual(fp, exception_fingerprint(self._exc(KeyError), 'method'))
+        self.assertNotEqual(fp, exception_fingerprint(self._exc(), 'other'))
+
+    def test_dedup_and_summary(self):
+        reporter = ErrorReporter(self.logger, interval=60)
+        self.assertTrue(reporter.exception('first', self._exc(), 'm'))
+        self.assertFalse(reporter.exception('second', self._exc(), 'm'))
+        self.assertFalse(reporter.exception('third', self._exc(), 'm'))
+        self.assertEqual(self.logger.log.call_count, 1)
+        self.assertIsNotNone(self.logger.log.call_args.kwargs['exc_info'])
+
+        reporter.flush()
+        self.assertEqual(self.logger.log.call_count, 2)
+        self.assertIn('repeated 2 times', self.logger.log.call_args.args[1])
+
+        # fingerprint without repeats is forgotten after flush
+        reporter.flush()
+        self.assertEqual(self.logger.log.call_count, 2)
+        reporter.flush()
+        self.assertTrue(reporter.exception('again', self._exc(), 'm'))
+
+    def test_periodic_flush(self):
+        reporter = ErrorReporter(self.logger, interval=60)
+        reporter.exception('first', self._exc(), 'm')
+        with mock.patch('ajsonrpc.reporting.monotonic', return_value=reporter._next_flush + 1):
+            reporter.exception('second', self._exc(), 'm')
+        self.assertEqual(self.logger.log.call_count, 2)
+        self.assertIn('repeated 1 times', self.logger.log.call_args.args[1])
+
+    def test_warning(self):
+        reporter = ErrorReporter(self.logger, interval=60)
+        self.assertTrue(reporter.warning('deprecated', key='m'))
+        self.assertFalse(reporter.warning('deprecated', key='m'))
+        self.assertEqual(self.logger.log.call_args.args[0], logging.WARNING)
+
+    def test_no_interval(self):
+        # default, every error is logged in full
+        reporter = ErrorReporter(self.logger)
+        for _ in range(3):
+            self.assertTrue(reporter.exception('error', self._exc(), 'm'))
+        self.assertEqual(self.logger.log.call_count, 3)
+
+    def test_timer_flush(self):
+        async def main():
+            reporter = ErrorReporter(self.logger, interval=0.05)
+            reporter.exception('first', self._exc(), 'm')
+            reporter.exception('second', self._exc(), 'm')
+            # no more errors, the summary is logged by the timer
+            await asyncio.sleep(0.1)
+
+        asyncio.run(main())
+        self.assertEqual(self.logger.log.call_count, 2)
+        self.assertIn('repeated 1 times', self.logger.log.call_args.args[1])
@@ -0,0 +1,152 @@
+"""Conformance of compiled schemas to marshmallow."""
+import random
+import unittest
+
+try:
+    from marshmallow import Schema, fields, validate, validates_schema, ValidationError
+except ImportError:
+    Schema = None
+
+from ..schema_compiler import compile_schema
+from ..utils import load_by_schema, calc_errors_from_vd
+from .test_utils import plain
+
+
+if Schema:
+    class TagSchema(Schema):
+        name = fields.String(required=True)
+        weight = fields.Float(allow_none=True)
+
+    class ItemSchema(Schema):
+        id = fields.Integer(required=True)
+        title = fields.String()
+        price = fields.Number()
+        tags = fields.Nested(TagSchema, many=True)
+        meta = fields.Raw()
+
+    class ParamsSchema(Schema):
+        cid = fields.Integer(required=True)
+        limit = fields.Integer(default=10)
+        active = fields.Boolean()
+        name = fields.String(allow_none=True)
+        ids = fields.List(fields.Integer())
+        matrix = fields.List(fields.List(fields.Float()))
+        rows = fields.Nested(ItemSchema, many=True)
+        item = fields.Nested(ItemSchema)
+        owner = fields.Nested(TagSchema, required=True)
+        info = fields.Dict()
+        kind = fields.String(validate=validate.OneOf(['a', 'b']))
+        email = fields.Email()
+        items_by_tag = fields.List(fields.Nested(TagSchema))
+
+    class OrderedParamsSchema(ParamsSchema):
+        class Meta:
+            ordered = True
+
+    class SchemaValidatorSchema(Schema):
+        id = fields.Integer()
+
+        @validates_schema
+        def check(self, data):
+            raise ValidationError('invalid')
+
+
+VALUES = [
+    0, 1, -7, 10 ** 400, 1.5, float('inf'), float('nan'), True, False, None,
+    '', '5', '2.5', 'a', 'b', 'true', 'x@example.com', b'bytes', b'\xff', '1e999',
+    [], [1, '2'], ['x', None], [[1, 2], ['a']], {}, {'k': 'v'}, (1, 2), object(),
+]
+
+
+def random_value(depth: int = 0):
+    roll = random.random()
+    if depth < 3 and roll < 0.15:
+        return [random_value(depth + 1) for _ in range(random.randint(0, 3))]
+    if depth < 3 and roll < 0.3:
+        return random_dict(TagSchema if random.random() < 0.5 else ItemSchema, depth + 1)
+    return random.choice(VALUES)
+
+
+def random_dict(schema, depth: int = 0) -> dict:
+    data = {}
+    for name in schema._declared_fields:
+        if random.random() < 0.7:
+            data[name] = random_value(depth)
+    if random.random() < 0.1:
+        data['unknown'] = random_value(depth)
+    return data
+
+
+def errors_list(errors: dict, data):
+    """calc_errors_from_vd output, exception type for error shapes it could not handle"""
+    try:
+        return calc_errors_from_vd(errors, data_on_validate=data)
+    except Exception as e:
+        return type(e)
+
+
+@unittest.skipIf(Schema is None, 'marshmallow is not installed')
+class TestSchemaCompiler(unittest.TestCase):
+    def assertConforms(self, schema, data):
+        validator = compile_schema(schema)
+        expected_data, expected_errors = load_by_schema(schema, data)
+        v_data, errors = validator(data)
+        msg = f'data={data!r}'
+        self.assertEqual(plain(errors), plain(expected_errors), msg)
+        self.assertEqual(plain(v_data), plain(expected_data), msg)
+        self.assertEqual(type(v_data), type(expected_data), msg)
+        if errors:
+            self.assertEqual(errors_list(errors, data), errors_list(expected_errors, data), msg)
+
+    def test_not_compiled(self):
+        self.assertIsNone(compile_schema(None))
+        self.assertIsNone(compile_schema(ParamsSchema(many=True)))
+        self.assertIsNone(compile_schema(ParamsSchema(strict=True)))
+        self.assertIsNone(compile_schema(SchemaValidatorSchema()))
+
+    def test_cached_per_instance(self):
+        schema = ParamsSchema()
+        self.assertIs(compile_schema(schema), compile_schema(schema))
+        self.assertIsNot(compile_schema(schema), compile_schema(schema, many=True))
+        self.assertIsNot(compile_schema(schema), compile_schema(ParamsSchema()))
+
+    def test_valid(self):
+        data = {
+            'cid': '1', 'active': 'true', 'ids': [1, '2'], 'matrix': [[1, '2.5']],
+            'rows': [{'id': 1, 'tags': [{'name': b'a', 'weight': None}]}],
+            'owner': {'name': 'x'}, 'kind': 'a', 'email': 'x@example.com',
+        }
+        v_data, errors = compile_schema(ParamsSchema())(data)
+        self.assertEqual(errors, {})
+        self.assertEqual(v_data['cid'], 1)
+        self.assertEqual(v_data['limit'], 10)
+        self.assertEqual(v_data['matrix'], [[1.0, 2.5]])
+        self.assertEqual(v_data['rows'][0]['tags'][0]['name'], 'a')
+
+    def test_invalid(self):
+        data = {'cid': 'x', 'ids': [1, 'y'], 'rows': [{'id': 1}, {}], 'kind': 'c'}
+        self.assertConforms(ParamsSchema(), data)
+        self.assertConforms(ParamsSchema(), [])
+        self.assertConforms(ParamsSchema(), None)
+
+    def test_many(self):
+        validator = compile_schema(ParamsSchema(), many=True)
+        v_data, errors = validator([{'cid': 1, 'owner': {'name': 'x'}}, {'cid': '2', 'limit': 3, 'owner': {'name': 'y'}}])
+        self.assertEqual(errors, {})
+        self.assertEqual([(row['cid'], row['limit']) for row in v_data], [(1, 10), (2, 3)])
+
+        random.seed(34)
+        for _ in range(100):
+            data = [random_dict(ParamsSchema) for _ in range(random.randint(0, 3))]
+            if random.random() < 0.2:
+                data.append(random_value())
+            expected_data, expected_errors = load_by_schema(ParamsSchema(), data, many=True)
+            v_data, errors = validator(data)
+            self.assertEqual(plain(errors), plain(expected_errors), f'data={data!r}')
+            self.assertEqual(plain(v_data), plain(expected_data), f'data={data!r}')
+
+    def test_randomized(self):
+        random.seed(33)
+        for schema in (ParamsSchema(), OrderedParamsSchema(), ItemSchema()):
+            for _ in range(300):
+                self.assertConforms(schema, random_dict(schema))
@@ -0,0 +1,156 @@
+"""Test HTTP protocol and multi-process mode of ajsonrpc.scripts.server."""
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import unittest
+import urllib.request
+
+from ..dispatcher import Dispatcher
+from ..manager import AsyncJSONRPCResponseManager
+from ..scripts.server import JSONRPCProtocol, Supervisor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def echo(s='pong'):
+    return s
+
+
+async def sleep(delay, what):
+    await asyncio.sleep(delay)
+    return what
+
+
+def rpc(method: str, *params, id=1, headers: str = '') -> bytes:
+    body = json.dumps(dict(jsonrpc='2.0', method=method, params=params, id=id)).encode()
+    return f'POST / HTTP/1.1\r\nContent-Length: {len(body)}\r\n{headers}\r\n'.encode() + body
+
+
+class TestProtocol(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        manager = AsyncJSONRPCResponseManager(Dispatcher(dict(echo=echo, sleep=sleep), pass_params=True))
+        self.connections = set()
+        self.server = await asyncio.get_running_loop().create_server(
+            lambda: JSONRPCProtocol(manager, self.connections, max_body_size=1024, idle_timeout=0.2),
+            host='127.0.0.1', port=0,
+        )
+        self.reader, self.writer = await asyncio.open_connection(*self.server.sockets[0].getsockname())
+
+    async def asyncTearDown(self):
+        self.writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def response(self):
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        status_line, *lines = head.decode().strip().split('\r\n')
+        headers = dict(line.lower().split(': ', 1) for line in lines)
+        body = await self.reader.readexactly(int(headers['content-length']))
+        return int(status_line.split()[1]), headers, json.loads(body) if body else None
+
+    async def test_pipelined_keep_alive(self):
+        self.writer.write(rpc('sleep', 0.1, 'slow', id=1) + rpc('echo', 'fast', id=2))
+        self.assertEqual([(await self.response())[2]['result'] for _ in range(2)], ['slow', 'fast'])
+
+        # split request, same connection
+        data = rpc('echo', id=3)
+        self.writer.write(data[:10])
+        await asyncio.sleep(0.01)
+        self.writer.write(data[10:])
+        status, headers, body = await self.response()
+        self.assertEqual((status, headers['connection'], body['result']), (200, 'keep-alive', 'pong'))
+
+    async def test_chunked_and_close(self):
+        body = json.dumps(dict(jsonrpc='2.0', method='echo', id=1)).encode()
+        self.writer.write(
+            b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n'
+            + f'{len(body):x}\r\n'.encode() + body + b'\r\n0\r\n\r\n'
+        )
+        status, headers, body = await self.response()
+        self.assertEqual((status, headers['connection'], body['result']), (200, 'close', 'pong'))
+        self.assertEqual(await self.reader.read(), b'')
+
+    async def test_errors(self):
+        self.writer.write(b'GET / HTTP/1.1\r\n\r\n')
+        self.assertEqual((await self.response())[0], 405)
+        self.writer.write(rpc('echo', 'x' * 2000))
+        status, headers, _ = await self.response()
+        self.assertEqual((status, headers['connection']), (413, 'close'))
+        self.assertEqual(await self.reader.read(), b'')
+
+    async def test_error_after_pipelined(self):
+        self.writer.write(rpc('echo', id=1) + 'POST / HTTP/1.1\r\nContent-Length: \xb2\r\n\r\n'.encode('latin-1'))
+        status, _, body = await self.response()
+        self.assertEqual((status, body['result']), (200, 'pong'))
+        self.assertEqual((await self.response())[0], 400)
+
+    async def test_idle_timeout(self):
+        self.writer.write(rpc('echo'))
+        await self.response()
+        self.assertEqual(await asyncio.wait_for(self.reader.read(), 1), b'')
+        self.assertFalse(self.connections)
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'fork is not supported')
+class TestWorkers(unittest.TestCase):
+    def setUp(self):
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'ajsonrpc.scripts.server', 'examples/methods.py',
+             '--port', str(self.port), '--workers', '2', '--graceful-timeout', '5'],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        self.addCleanup(self.process.kill)
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                self.call('echo')
+                return
+            except OSError:
+                time.sleep(0.05)
+
+    def call(self, method: str, params=None):
+        body = dict(jsonrpc='2.0', method=method, id=1, params=params or [])
+        request = urllib.request.Request(f'http://127.0.0.1:{self.port}', data=json.dumps(body).encode())
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read())['result']
+
+    def test_exit_code(self):
+        for code in (0, 3):
+            pid = os.fork()
+            if pid == 0:
+                os._exit(code)
+            self.assertEqual(Supervisor.exit_code(os.waitpid(pid, 0)[1]), code)
+
+        pid = os.fork()
+        if pid == 0:
+            time.sleep(10)
+            os._exit(0)
+        os.kill(pid, signal.SIGKILL)
+        self.assertEqual(Supervisor.exit_code(os.waitpid(pid, 0)[1]), -signal.SIGKILL)
+
+    def test_reload_drains_connections(self):
+        results = []
+        slow = threading.Thread(target=lambda: results.append(self.call('say_after', [0.5, 'slow'])))
+        slow.start()
+        time.sleep(0.2)
+
+        self.process.send_signal(signal.SIGHUP)
+        slow.join()
+        self.assertEqual(results, ['slow'])
+        self.assertEqual(self.call('echo'), 'pong')
+
+        self.process.send_signal(signal.SIGTERM)
+        self.assertEqual(self.process.wait(10), 0)
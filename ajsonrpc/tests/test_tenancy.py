@@ -0,0 +1,87 @@
+"""Test per-tenant rate limiting and fair scheduling."""
+import asyncio
+import unittest
+
+from ..core import JSONRPC20Request, JSONRPC20RateLimited
+from ..manager import AsyncJSONRPCResponseManager
+from ..tenancy import TenantRateLimiter, FairScheduler, tenant_key
+
+
+class TestTenantRateLimiter(unittest.TestCase):
+    def test_tenant_key(self):
+        self.assertEqual(tenant_key({'cid': 1, 'token_id': 2}, ('cid',)), 1)
+        self.assertEqual(tenant_key({'cid': 1}, ('cid', 'token_id')), (1, None))
+        self.assertIsNone(tenant_key(None, ('cid',)))
+
+    def test_bucket_per_tenant(self):
+        limiter = TenantRateLimiter(rate=0.001, burst=2)
+        self.assertTrue(limiter.allow({'cid': 1}))
+        self.assertTrue(limiter.allow({'cid': 1}))
+        self.assertFalse(limiter.allow({'cid': 1}))
+        self.assertTrue(limiter.allow({'cid': 2}))
+        self.assertEqual(limiter.rejected, 1)
+
+    def test_custom_limits(self):
+        limiter = TenantRateLimiter(rate=0.001, burst=1, limits={5: (0.001, 3)})
+        self.assertEqual(sum(limiter.allow({'cid': 5}) for _ in range(5)), 3)
+
+    def test_max_tenants(self):
+        limiter = TenantRateLimiter(rate=1, max_tenants=2)
+        for cid in range(5):
+            limiter.allow({'cid': cid})
+        self.assertEqual(len(limiter._buckets), 2)
+
+
+class TestFairScheduler(unittest.IsolatedAsyncioTestCase):
+    async def test_fair_order(self):
+        scheduler = FairScheduler(slots=1)
+        order = []
+
+        async def call(cid):
+            async with scheduler.slot({'cid': cid}):
+                order.append(cid)
+                await asyncio.sleep(0)
+
+        # tenant 1 fires a batch before tenant 2
+        await asyncio.gather(*[call(1) for _ in range(4)], *[call(2) for _ in range(2)])
+        self.assertEqual(order, [1, 1, 2, 1, 2, 1])
+        self.assertEqual(scheduler.inflight, 0)
+
+    async def test_weights(self):
+        scheduler = FairScheduler(slots=1, weights={2: 2})
+        order = []
+
+        async def call(cid):
+            async with scheduler.slot({'cid': cid}):
+                order.append(cid)
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*[call(1) for _ in range(4)], *[call(2) for _ in range(4)])
+        self.assertEqual(order[:6], [1, 2, 1, 2, 2, 1])
+
+    async def test_cancelled_waiters(self):
+        scheduler = FairScheduler(slots=1)
+        await scheduler.acquire({'cid': 1})
+        for _ in range(3):
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(scheduler.acquire({'cid': 2}), 0.01)
+        self.assertEqual(scheduler.stats()['queued'], 0)
+
+        waiter = asyncio.ensure_future(scheduler.acquire({'cid': 3}))
+        await asyncio.sleep(0)
+        self.assertEqual(scheduler.queued, 1)
+        scheduler.release()
+        await waiter
+        self.assertEqual((scheduler.inflight, scheduler.queued), (1, 0))
+
+
+class TestManagerRateLimit(unittest.IsolatedAsyncioTestCase):
+    async def test_rate_limited(self):
+        manager = AsyncJSONRPCResponseManager(
+            {'echo': lambda request: (request.params, None)},
+            rate_limiter=TenantRateLimiter(rate=0.001, burst=1),
+        )
+        res = await manager.get_response_for_request(JSONRPC20Request('echo', [1], id=1, extra_data={'cid': 1}))
+        self.assertEqual(res.result, [1])
+        res = await manager.get_response_for_request(JSONRPC20Request('echo', [1], id=2, extra_data={'cid': 1}))
+        self.assertEqual(res.error.code, JSONRPC20RateLimited.CODE)
@@ -0,0 +1,99 @@
+"""Test stream transport."""
+import asyncio
+import json
+import os
+import struct
+import tempfile
+import unittest
+
+from ..dispatcher import Dispatcher
+from ..manager import AsyncJSONRPCResponseManager
+from ..transport import (
+    FramingError, LengthPrefixedFraming, NewlineFraming, make_framing, start_server, start_unix_server,
+)
+
+
+async def sleep(delay, what):
+    await asyncio.sleep(delay)
+    return what
+
+
+def request(method: str, *params, id=1) -> bytes:
+    return json.dumps(dict(jsonrpc='2.0', method=method, params=params, id=id)).encode()
+
+
+class TestFraming(unittest.TestCase):
+    def test_newline(self):
+        framing = NewlineFraming(max_frame_size=8)
+        self.assertEqual(framing.feed(b'{"a"'), [])
+        self.assertEqual(framing.feed(b': 1}\n\r\n[]\n{'), [b'{"a": 1}', b'[]'])
+        self.assertEqual(framing.feed(b'}\n'), [b'{}'])
+        self.assertEqual(framing.encode(b'{}'), b'{}\n')
+        with self.assertRaises(FramingError):
+            framing.feed(b'x' * 9)
+        # complete frame in the same read
+        with self.assertRaises(FramingError):
+            NewlineFraming(max_frame_size=10).feed(b'x' * 100 + b'\n')
+
+    def test_length_prefixed(self):
+        framing = LengthPrefixedFraming(max_frame_size=8)
+        data = framing.encode(b'{"a": 1}') + framing.encode(b'[]')
+        self.assertEqual(data[:4], struct.pack('>I', 8))
+        self.assertEqual([frame for i in range(len(data)) for frame in framing.feed(data[i:i + 1])], [b'{"a": 1}', b'[]'])
+        with self.assertRaises(FramingError):
+            framing.feed(struct.pack('>I', 9))
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            make_framing('http')
+
+
+class TestStreamProtocol(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.manager = AsyncJSONRPCResponseManager(Dispatcher(dict(sleep=sleep), pass_params=True))
+
+    async def connect(self, framing: str = 'newline', **kwargs):
+        server = await start_server(self.manager, host='127.0.0.1', port=0, framing=framing, **kwargs)
+        self.addAsyncCleanup(server.wait_closed)
+        self.addCleanup(server.close)
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname())
+        self.addCleanup(writer.close)
+        return reader, writer
+
+    async def read(self, reader, framing: str) -> dict:
+        if framing == 'newline':
+            return json.loads(await reader.readline())
+        length, = struct.unpack('>I', await reader.readexactly(4))
+        return json.loads(await reader.readexactly(length))
+
+    async def test_out_of_order(self):
+        for framing in ('newline', 'length'):
+            with self.subTest(framing=framing):
+                reader, writer = await self.connect(framing)
+                encode = make_framing(framing).encode
+                writer.write(encode(request('sleep', 0.1, 'slow', id=1)) + encode(request('sleep', 0, 'fast', id=2)))
+                responses = [await self.read(reader, framing) for _ in range(2)]
+                self.assertEqual([(r['id'], r['result']) for r in responses], [(2, 'fast'), (1, 'slow')])
+
+    async def test_max_concurrency(self):
+        reader, writer = await self.connect(max_concurrency=1)
+        writer.write(request('sleep', 0.1, 'slow', id=1) + b'\n' + request('sleep', 0, 'fast', id=2) + b'\n')
+        responses = [await self.read(reader, 'newline') for _ in range(2)]
+        self.assertEqual([r['id'] for r in responses], [1, 2])
+
+    async def test_broken_stream(self):
+        reader, writer = await self.connect('length', max_frame_size=16)
+        writer.write(struct.pack('>I', 17))
+        self.assertEqual(await reader.read(), b'')
+
+    @unittest.skipUnless(hasattr(asyncio, 'open_unix_connection') and os.name == 'posix', 'no unix sockets')
+    async def test_unix(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'api.sock')
+            server = await start_unix_server(self.manager, path=path)
+            reader, writer = await asyncio.open_unix_connection(path)
+            writer.write(request('sleep', 0, 'unix') + b'\n')
+            self.assertEqual((await self.read(reader, 'newline'))['result'], 'unix')
+            writer.close()
+            server.close()
+            await server.wait_closed()
@@ -0,0 +1,160 @@
+"""Test utils: marshmallow validation helpers, params binding."""
+import functools
+import inspect
+import unittest
+from collections import OrderedDict
+
+try:
+    from marshmallow import Schema, fields, validate, post_load
+except ImportError:
+    Schema = None
+
+from ..utils import (
+    validate_by_schema, validate_many_by_schema, is_single_pass_schema, calc_errors_from_vd,
+    ParamsBinder, params_binder,
+)
+
+
+def two_pass_validate(schema, data):
+    """reference: schema.validate() followed by schema.dump()"""
+    v_data, errors = {}, []
+    v_errors = schema.validate(data)
+    if v_errors:
+        errors.extend(calc_errors_from_vd(errors=v_errors, data_on_validate=data))
+    else:
+        v_data, v_errors = schema.dump(data)
+        if v_errors:
+            errors.extend(calc_errors_from_vd(errors=v_errors, data_on_validate=data))
+    return v_data, errors
+
+
+def plain(value):
+    """nested OrderedDicts to dicts: fields order of unordered schemas is not stable in marshmallow itself"""
+    if isinstance(value, dict):
+        return {k: plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(plain(v) for v in value)
+    return value
+
+
+if Schema:
+    class ItemSchema(Schema):
+        id = fields.Integer(required=True)
+        name = fields.String()
+
+    class ParamsSchema(Schema):
+        cid = fields.Integer(required=True)
+        limit = fields.Integer(default=10)
+        active = fields.Boolean()
+        tags = fields.List(fields.String())
+        rows = fields.Nested(ItemSchema, many=True)
+        info = fields.Dict()
+        kind = fields.String(validate=validate.OneOf(['a', 'b']))
+
+    class OrderedParamsSchema(ParamsSchema):
+        class Meta:
+            ordered = True
+
+    class DateSchema(Schema):
+        dt = fields.DateTime()
+
+    class PostLoadSchema(Schema):
+        id = fields.Integer()
+
+        @post_load
+        def make(self, data):
+            return dict(data, loaded=True)
+
+    class RenamedSchema(Schema):
+        id = fields.Integer(load_from='ID')
+
+
+@unittest.skipIf(Schema is None, 'marshmallow is not installed')
+class TestValidateBySchema(unittest.TestCase):
+    def test_single_pass_schema(self):
+        self.assertTrue(is_single_pass_schema(ParamsSchema()))
+        self.assertTrue(is_single_pass_schema(OrderedParamsSchema()))
+        self.assertFalse(is_single_pass_schema(DateSchema()))
+        self.assertFalse(is_single_pass_schema(PostLoadSchema()))
+        self.assertFalse(is_single_pass_schema(RenamedSchema()))
+        self.assertFalse(is_single_pass_schema(ParamsSchema(many=True)))
+
+    def test_equal_to_two_pass(self):
+        payloads = [
+            {'cid': 1},
+            {'cid': '5', 'limit': '20', 'active': 'true'},
+            {'cid': 1, 'tags': ['a', 'b'], 'rows': [{'id': 1, 'name': 'x'}, {'id': '2'}], 'info': {'a': 1}},
+            {'cid': 1, 'kind': 'a', 'unknown': 1},
+            {'cid': 'x'},
+            {'limit': 5},
+            {'cid': 1, 'tags': ['a', 1], 'rows': [{'name': 'x'}]},
+            {'cid': 1, 'kind': 'c', 'active': 'maybe'},
+            {'cid': None},
+            [1, 2],
+        ]
+        for schema in (ParamsSchema(), OrderedParamsSchema(), DateSchema(), PostLoadSchema(), RenamedSchema()):
+            for data in payloads + [{'dt': '2020-01-01T00:00:00'}, {'ID': 1}, {'id': '1'}]:
+                with self.subTest(schema=schema.__class__.__name__, data=data):
+                    self.assertEqual(plain(validate_by_schema(schema, data)), plain(two_pass_validate(schema, data)))
+
+    def test_ordered_defaults(self):
+        v_data, errors = validate_by_schema(OrderedParamsSchema(), OrderedDict([('cid', 1), ('active', True)]))
+        self.assertEqual(errors, [])
+        self.assertEqual(list(v_data), ['cid', 'limit', 'active'])
+
+    def test_many(self):
+        rows = [{'cid': 1}, {'cid': '2', 'limit': 3}]
+        for schema in (ParamsSchema(), DateSchema()):
+            v_data, index, errors = validate_many_by_schema(schema, rows)
+            self.assertEqual((index, errors), (None, []))
+            self.assertEqual(plain(v_data), [plain(validate_by_schema(schema, row)[0]) for row in rows])
+
+        v_data, index, errors = validate_many_by_schema(ParamsSchema(), rows + [{'cid': 3}, {'cid': 'x'}, 1])
+        self.assertEqual(index, 3)
+        self.assertEqual(errors, validate_by_schema(ParamsSchema(), {'cid': 'x'})[1])
+
+        v_data, index, errors = validate_many_by_schema(ParamsSchema(), [{'cid': 1}, 'x'])
+        self.assertEqual(index, 1)
+        self.assertEqual(errors, [{'selector': '_schema', 'value': 'x', 'reason': 'Invalid input type.'}])
+
+
+class TestParamsBinder(unittest.TestCase):
+    def assertBinds(self, func, args, kwargs):
+        binder = ParamsBinder(func)
+        try:
+            inspect.signature(func).bind(*args, **kwargs)
+        except TypeError:
+            expected = False
+        else:
+            expected = True
+        self.assertEqual(binder.accepts(args, kwargs), expected, f'{func} {args} {kwargs}')
+
+    def test_accepts(self):
+        class Obj:
+            def method(self, a, b=1):
+                pass
+
+        def f(a, /, b, c=1, *args, d, e=2, **kwargs):
+            pass
+
+        funcs = [
+            lambda: None,
+            lambda a, b: None,
+            lambda a, b=1, *args: None,
+            lambda *, a: None,
+            f,
+            functools.partial(lambda a, b, c: None, 1),
+            functools.partial(lambda a, b, c: None, b=1),
+            Obj().method,
+        ]
+        calls = [
+            ([], {}), ([1], {}), ([1, 2], {}), ([1, 2, 3], {}), ([1, 2, 3, 4], {}),
+            ([], {'a': 1}), ([], {'a': 1, 'b': 2}), ([1], {'b': 2}), ([1], {'a': 2}),
+            ([1, 2], {'d': 1}), ([1], {'b': 1, 'd': 1, 'x': 1}), ([], {'c': 1}), ([1], {'c': 1}),
+        ]
+        for func in funcs:
+            for args, kwargs in calls:
+                self.assertBinds(func, args, kwargs)
+
+    def test_unresolved(self):
+        self.assertIsNone(params_binder(1))
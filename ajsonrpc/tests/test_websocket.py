@@ -0,0 +1,91 @@
+"""Test websocket handler of aiohttp backend."""
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+try:
+    from aiohttp import web, WSMsgType
+    from aiohttp.test_utils import TestClient, TestServer
+    from ..backend.aiohttp import JSONRPCAiohttp
+    from ..pubsub import PubSub
+except ImportError:
+    web = None
+
+
+async def sleep(delay, what):
+    await asyncio.sleep(delay)
+    return what
+
+
+def request(method: str, *params, id=1) -> str:
+    return json.dumps(dict(jsonrpc='2.0', method=method, params=params, id=id))
+
+
+@unittest.skipIf(web is None, 'aiohttp is not installed')
+class TestWebSocket(unittest.IsolatedAsyncioTestCase):
+    async def client(self, **kwargs) -> TestClient:
+        self.auth_calls = 0
+
+        def auth_callback(http_request):
+            self.auth_calls += 1
+            if http_request.headers.get('X-AccessToken') != 'token':
+                return 401, {}
+            return 200, dict(cid=1)
+
+        api = JSONRPCAiohttp(auth_callback=auth_callback, **kwargs)
+        api.add_function(sleep, pass_params=True)
+        if api.pubsub:
+            api.pubsub.add_methods(api.manager.dispatcher)
+        app = web.Application()
+        app.router.add_get('/ws', api.ws_handler)
+        client = TestClient(TestServer(app))
+        await client.start_server()
+        self.addAsyncCleanup(client.close)
+        return client
+
+    async def test_multiplexed(self):
+        client = await self.client()
+        async with client.ws_connect('/ws', headers={'X-AccessToken': 'token'}) as ws:
+            await ws.send_str(request('sleep', 0.1, 'slow', id=1))
+            await ws.send_str(request('sleep', 0, 'fast', id=2))
+            responses = [await ws.receive_json() for _ in range(2)]
+            self.assertEqual([(r['id'], r['result']) for r in responses], [(2, 'fast'), (1, 'slow')])
+
+            await ws.send_str(json.dumps([json.loads(request('sleep', 0, i, id=i)) for i in range(3)]))
+            self.assertEqual([r['result'] for r in await ws.receive_json()], [0, 1, 2])
+        self.assertEqual(self.auth_calls, 1)
+
+    async def test_max_concurrency(self):
+        client = await self.client(ws_max_concurrency=1)
+        async with client.ws_connect('/ws', headers={'X-AccessToken': 'token'}) as ws:
+            await ws.send_str(request('sleep', 0.1, 'slow', id=1))
+            await ws.send_str(request('sleep', 0, 'fast', id=2))
+            self.assertEqual([(await ws.receive_json())['id'] for _ in range(2)], [1, 2])
+
+    async def test_send_error(self):
+        client = await self.client()
+        async with client.ws_connect('/ws', headers={'X-AccessToken': 'token'}) as ws:
+            with mock.patch.object(web.WebSocketResponse, 'send_str', side_effect=RuntimeError('closing')):
+                with self.assertLogs(level='ERROR'):
+                    await ws.send_str(request('sleep', 0, 'a', id=1))
+                    msg = await asyncio.wait_for(ws.receive(), 1)
+            # the connection is closed instead of waiting for the sender forever
+            self.assertEqual(msg.type, WSMsgType.CLOSE)
+
+    async def test_unauthorized(self):
+        client = await self.client()
+        response = await client.get('/ws')
+        self.assertEqual(response.status, 401)
+
+    async def test_push(self):
+        pubsub = PubSub()
+        pubsub.register('status')
+        client = await self.client(pubsub=pubsub)
+        async with client.ws_connect('/ws', headers={'X-AccessToken': 'token'}) as ws:
+            await ws.send_str(request('subscribe', 'status'))
+            self.assertEqual((await ws.receive_json())['result'], True)
+            self.assertEqual(pubsub.publish('status', [1]), 1)
+            self.assertEqual(await ws.receive_json(), dict(jsonrpc='2.0', method='status', params=[1]))
+        await asyncio.sleep(0.05)
+        self.assertEqual(pubsub.stats(), dict(topics=dict(status=0)))
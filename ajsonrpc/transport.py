@@ -0,0 +1,268 @@
+"""JSON-RPC over persistent TCP or Unix domain socket connections.
+
+No HTTP: every message is one frame of the connection, either
+newline-delimited (json text has no raw newlines) or prefixed by 4 bytes
+big-endian length. Requests of a connection are handled concurrently and
+responses are written as soon as they are ready, clients match them by id.
+
+Backpressure: at most max_concurrency requests of a connection are executed,
+reading of the connection is paused while they are busy or the write buffer
+is above its high-water mark
+(clients that do not read responses do not make the server buffer them).
+
+Usage::
+
+    manager = AsyncJSONRPCResponseManager(dispatcher)
+    server = await start_server(manager, host='127.0.0.1', port=8889, framing='length')
+    server = await start_unix_server(manager, path='/run/api.sock')
+
+"""
+import asyncio
+import struct
+from collections import deque
+from typing import Optional
+
+from .pubsub import SUBSCRIBER_KEY
+
+import logging
+logger = logging.getLogger()
+
+
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+class FramingError(Exception):
+
+    """Broken stream, connection could not be read further."""
+
+
+class NewlineFraming:
+
+    """Frames are separated with b'\\n'."""
+
+    def __init__(self, max_frame_size: int = MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        self._buffer += data
+        frames = []
+        start = 0
+        while True:
+            end = self._buffer.find(b'\n', start)
+            if end < 0:
+                break
+            if end - start > self.max_frame_size:
+                raise FramingError(f'frame of {end - start} bytes is larger than {self.max_frame_size} bytes')
+            frame = bytes(self._buffer[start:end]).strip()
+            if frame:
+                frames.append(frame)
+            start = end + 1
+        del self._buffer[:start]
+        if len(self._buffer) > self.max_frame_size:
+            raise FramingError(f'frame is larger than {self.max_frame_size} bytes')
+        return frames
+
+    @staticmethod
+    def encode(payload: bytes) -> bytes:
+        return payload + b'\n'
+
+
+class LengthPrefixedFraming:
+
+    """Frames are prefixed with 4 bytes big-endian length."""
+
+    header = struct.Struct('>I')
+
+    def __init__(self, max_frame_size: int = MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        self._buffer += data
+        frames = []
+        start = 0
+        size = self.header.size
+        while len(self._buffer) - start >= size:
+            length, = self.header.unpack_from(self._buffer, start)
+            if length > self.max_frame_size:
+                raise FramingError(f'frame of {length} bytes is larger than {self.max_frame_size} bytes')
+            if len(self._buffer) - start - size < length:
+                break
+            frames.append(bytes(self._buffer[start + size:start + size + length]))
+            start += size + length
+        del self._buffer[:start]
+        return frames
+
+    @classmethod
+    def encode(cls, payload: bytes) -> bytes:
+        return cls.header.pack(len(payload)) + payload
+
+
+FRAMINGS = {
+    'newline': NewlineFraming,
+    'length': LengthPrefixedFraming,
+}
+
+
+def make_framing(framing: str, max_frame_size: int = MAX_FRAME_SIZE):
+    try:
+        return FRAMINGS[framing](max_frame_size)
+    except KeyError:
+        raise ValueError(f'unknown framing {framing!r}, expected one of {", ".join(FRAMINGS)}') from None
+
+
+class JSONRPCStreamProtocol(asyncio.Protocol):
+
+    """Persistent connection, requests are multiplexed and answered out of order."""
+
+    def __init__(self, json_rpc_manager, framing: str = 'newline', max_frame_size: int = MAX_FRAME_SIZE,
+                 max_concurrency: int = 64, write_buffer_high: int = 1024 * 1024,
+                 connections: set = None, extra_data: dict = None, pubsub=None):
+        """
+        json_rpc_manager: AsyncJSONRPCResponseManager
+        framing: 'newline' or 'length'
+        max_concurrency: max number of executing requests of connection, reading is paused above it
+        write_buffer_high: high-water mark of write buffer, reading is paused above it
+        connections: open connections, drained on graceful shutdown
+        extra_data: extra_data of all requests of connection
+        pubsub: topics pushed to the connection, see ajsonrpc.pubsub
+        """
+        self.json_rpc_manager = json_rpc_manager
+        self.framing_name = framing
+        self.max_frame_size = max_frame_size
+        self.max_concurrency = max_concurrency
+        self.write_buffer_high = write_buffer_high
+        self.connections = connections if connections is not None else set()
+        self.extra_data = extra_data
+        self.pubsub = pubsub
+        self.subscriber = None
+        self.transport = None
+        self.framing = None
+        # executing requests
+        self.tasks = set()
+        # received requests waiting for free concurrency slot
+        self.frames = deque()
+        # close after executing requests
+        self.closing = False
+        self._reading_paused = False
+        self._writing_paused = False
+        # resolved when write buffer is drained
+        self._drained = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.framing = make_framing(self.framing_name, self.max_frame_size)
+        transport.set_write_buffer_limits(high=self.write_buffer_high)
+        self.connections.add(self)
+        if self.pubsub:
+            self.subscriber = self.pubsub.subscriber(self.push, close=transport.close)
+            self.extra_data = dict(self.extra_data or {}, **{SUBSCRIBER_KEY: self.subscriber})
+
+    def connection_lost(self, exc):
+        self.connections.discard(self)
+        if self.subscriber:
+            self.pubsub.unsubscribe_all(self.subscriber)
+        if self._drained and not self._drained.done():
+            self._drained.set_exception(ConnectionResetError('connection is lost'))
+
+    def data_received(self, data):
+        if self.closing:
+            return
+        try:
+            frames = self.framing.feed(data)
+        except FramingError as e:
+            logger.warning(f'{self.__class__.__name__}::data_received: msg=broken stream, connection is closed, {e=}')
+            frames = []
+            self.closing = True
+
+        self.frames.extend(frames)
+        self._start_requests()
+        if self.closing:
+            self.close_when_idle()
+        self._update_reading()
+
+    def _start_requests(self) -> None:
+        while self.frames and len(self.tasks) < self.max_concurrency:
+            task = asyncio.ensure_future(self.respond(self.frames.popleft()))
+            self.tasks.add(task)
+            task.add_done_callback(self._request_done)
+
+    async def respond(self, frame: bytes) -> None:
+        response = await self.json_rpc_manager.get_response_for_payload(
+            frame.decode('utf-8', 'replace'), extra_data=self.extra_data,
+        )
+        if response is not None and not self.transport.is_closing():
+            payload = self.json_rpc_manager.serialize(response.body)
+            self.transport.write(self.framing.encode(payload.encode('utf-8')))
+
+    async def push(self, message: str) -> None:
+        """Write pushed notification, wait while write buffer is full."""
+        while self._writing_paused:
+            if self._drained is None or self._drained.done():
+                self._drained = asyncio.get_event_loop().create_future()
+            await self._drained
+        if self.transport.is_closing():
+            raise ConnectionResetError('connection is closed')
+        self.transport.write(self.framing.encode(message.encode('utf-8')))
+
+    def _request_done(self, task: asyncio.Task) -> None:
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f'{self.__class__.__name__}::_request_done: msg=fail handling request, e={task.exception()!r}')
+        self._start_requests()
+        if self.closing and not self.tasks:
+            self.transport.close()
+            return
+        self._update_reading()
+
+    def close_when_idle(self) -> None:
+        """Stop reading requests, close connection after received requests."""
+        self.closing = True
+        if not self.tasks:
+            self.transport.close()
+
+    def pause_writing(self):
+        self._writing_paused = True
+        self._update_reading()
+
+    def resume_writing(self):
+        self._writing_paused = False
+        if self._drained and not self._drained.done():
+            self._drained.set_result(None)
+        self._update_reading()
+
+    def _update_reading(self) -> None:
+        pause = self._writing_paused or len(self.tasks) >= self.max_concurrency or bool(self.frames)
+        if pause != self._reading_paused and not self.transport.is_closing():
+            self._reading_paused = pause
+            if pause:
+                self.transport.pause_reading()
+            else:
+                self.transport.resume_reading()
+
+
+async def start_server(json_rpc_manager, host: Optional[str] = None, port: Optional[int] = None,
+                       sock=None, **kwargs) -> asyncio.AbstractServer:
+    """TCP server, kwargs: JSONRPCStreamProtocol options and loop.create_server options"""
+    protocol_kwargs = _protocol_kwargs(kwargs)
+    return await asyncio.get_event_loop().create_server(
+        lambda: JSONRPCStreamProtocol(json_rpc_manager, **protocol_kwargs),
+        host=host, port=port, sock=sock, **kwargs,
+    )
+
+
+async def start_unix_server(json_rpc_manager, path: Optional[str] = None, sock=None,
+                            **kwargs) -> asyncio.AbstractServer:
+    """Unix domain socket server, kwargs: JSONRPCStreamProtocol options and loop.create_unix_server options"""
+    protocol_kwargs = _protocol_kwargs(kwargs)
+    return await asyncio.get_event_loop().create_unix_server(
+        lambda: JSONRPCStreamProtocol(json_rpc_manager, **protocol_kwargs),
+        path=path, sock=sock, **kwargs,
+    )
+
+
+def _protocol_kwargs(kwargs: dict) -> dict:
+    names = ('framing', 'max_frame_size', 'max_concurrency', 'write_buffer_high', 'connections', 'extra_data',
+             'pubsub')
+    return {name: kwargs.pop(name) for name in names if name in kwargs}
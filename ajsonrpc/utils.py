@@ -1,4 +1,25 @@
+import importlib
 import inspect
+import weakref
+from typing import Optional
+
+
+def import_string(path: str):
+    """ import object by dotted path: 'package.module:Class' or 'package.module.Class' """
+    if ':' in path:
+        module_name, _, attr = path.partition(':')
+    else:
+        module_name, _, attr = path.rpartition('.')
+    if not module_name or not attr:
+        raise ImportError(f'{path!r} is not a dotted path to object')
+
+    obj = importlib.import_module(module_name)
+    for name in attr.split('.'):
+        try:
+            obj = getattr(obj, name)
+        except AttributeError:
+            raise ImportError(f'module {module_name!r} has no attribute {attr!r}') from None
+    return obj
 
 
 def is_invalid_params(func, *args, **kwargs):
@@ -35,6 +56,60 @@ def is_invalid_params(func, *args, **kwargs):
     return not (len(params_required) <= len(args) <= len(params))
 
 
+class ParamsBinder:
+
+    """Signature of function, resolved once, for cheap checks of request params.
+
+    Used for functions called with request params as upstream json-rpc does:
+    func(*request.args, **request.kwargs), see Dispatcher.add_function(pass_params=True).
+    Works for partials, bound methods and callable objects.
+    """
+
+    __slots__ = ('positional', 'n_required', 'keywords', 'required_keywords', 'var_args', 'var_kwargs')
+
+    def __init__(self, func):
+        """Raise ValueError or TypeError if signature could not be resolved (some builtins)."""
+        parameters = list(inspect.signature(func).parameters.values())
+        positional_kinds = (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+        keyword_kinds = (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)
+        positional = [p for p in parameters if p.kind in positional_kinds]
+        # names of positional parameters, None for positional only
+        self.positional = tuple(p.name if p.kind == p.POSITIONAL_OR_KEYWORD else None for p in positional)
+        self.n_required = sum(1 for p in positional if p.default is p.empty)
+        self.keywords = frozenset(p.name for p in parameters if p.kind in keyword_kinds)
+        self.required_keywords = frozenset(
+            p.name for p in parameters if p.kind == p.KEYWORD_ONLY and p.default is p.empty)
+        self.var_args = any(p.kind == p.VAR_POSITIONAL for p in parameters)
+        self.var_kwargs = any(p.kind == p.VAR_KEYWORD for p in parameters)
+
+    def accepts(self, args: list, kwargs: dict) -> bool:
+        """True if func(*args, **kwargs) would not fail with TypeError of arguments binding."""
+        n_args = len(args)
+        if n_args > len(self.positional) and not self.var_args:
+            return False
+
+        for name in kwargs:
+            if name not in self.keywords and not self.var_kwargs:
+                return False
+            # passed as positional already
+            if name in self.positional[:n_args]:
+                return False
+
+        # required positional parameters not passed by position should be passed by name
+        for name in self.positional[n_args:self.n_required]:
+            if name is None or name not in kwargs:
+                return False
+        return all(name in kwargs for name in self.required_keywords)
+
+
+def params_binder(func) -> Optional[ParamsBinder]:
+    """ParamsBinder of function, None if signature could not be resolved."""
+    try:
+        return ParamsBinder(func)
+    except (TypeError, ValueError):
+        return None
+
+
 def calc_errors_from_vd(errors: dict, data_on_validate: dict = {}) -> list:
     """ calc errors from validate-data (errors) by UnmarshalResult """
     result_errors = []
@@ -67,17 +142,135 @@ def calc_errors_from_vd(errors: dict, data_on_validate: dict = {}) -> list:
     return result_errors
 
 
+# field types with equal load and dump output for valid input
+_SINGLE_PASS_FIELDS = ('Raw', 'String', 'Email', 'Url', 'Integer', 'Float', 'Number', 'Boolean', 'Dict', 'List', 'Nested')
+# hooks which change load or dump output
+_OUTPUT_PROCESSORS = ('pre_load', 'post_load', 'pre_dump', 'post_dump')
+# schema -> True if schema.load output equals schema.dump output
+_single_pass_cache = weakref.WeakKeyDictionary()
+
+
+def _is_single_pass_field(field, m_fields) -> bool:
+    if type(field).__name__ not in _SINGLE_PASS_FIELDS or type(field) is not getattr(m_fields, type(field).__name__, None):
+        return False
+    if field.load_from or field.dump_to or field.attribute or field.load_only or field.dump_only:
+        return False
+    if field.missing is not m_fields.missing_:
+        return False
+    if getattr(field, 'as_string', False):
+        return False
+    if isinstance(field, m_fields.List):
+        return _is_single_pass_field(field.container, m_fields) and field.container.default is m_fields.missing_
+    if isinstance(field, m_fields.Nested):
+        try:
+            nested_schema = field.schema
+        except Exception:
+            return False
+        return is_single_pass_schema(nested_schema, nested=True)
+    return True
+
+
+def is_single_pass_schema(schema, nested: bool = False) -> bool:
+    """ check if marshmallow.Schema.load output is equal to dump output, so validation could be done by load only
+
+    Schemas with load/dump hooks, field renames, load_only/dump_only, missing values, non-trivial field types
+    (DateTime, UUID, Decimal...) need validate() and dump() both.
+    Top level schema could have default values, they are filled in as dump does.
+    """
+    try:
+        return _single_pass_cache[schema][nested]
+    except KeyError:
+        pass
+    except TypeError:
+        return False
+
+    try:
+        from marshmallow import fields as m_fields
+    except ImportError:
+        return False
+
+    processors = getattr(schema, '__processors__', {})
+    result = not (
+        (schema.many and not nested) or schema.extra or schema.prefix or schema.load_only or schema.dump_only
+        or schema.opts.fields or schema.opts.additional or schema.opts.load_only or schema.opts.dump_only
+        or any(processors.get((tag, pass_many)) for tag in _OUTPUT_PROCESSORS for pass_many in (True, False))
+    ) and all(
+        _is_single_pass_field(field, m_fields) and (not nested or field.default is m_fields.missing_)
+        for field in schema.fields.values()
+    )
+
+    _single_pass_cache.setdefault(schema, {})[nested] = result
+    return result
+
+
+def _fill_defaults(schema, data, v_data):
+    """ fill in default values of missing fields as dump does """
+    if not isinstance(data, dict):
+        return v_data
+    filled = False
+    for field_name, field in schema.fields.items():
+        if field_name not in data and field.default is not field.missing:
+            value = field.serialize(field_name, data)
+            if value is not field.missing:
+                v_data[field_name] = value
+                filled = True
+    # keep fields order as dump does
+    if filled and schema.ordered:
+        v_data = schema.dict_class((k, v_data[k]) for k in schema.fields if k in v_data)
+    return v_data
+
+
+def load_by_schema(schema, data, many: bool = False) -> (dict, dict):
+    """ validate data and get dump output, return (data, marshmallow errors)
+
+    Single traversal (schema.load) for schemas with equal load and dump output,
+    schema.validate() and schema.dump() otherwise.
+    many: data is a list of items, errors are keyed by item index
+    """
+    empty = [] if many else {}
+    if is_single_pass_schema(schema):
+        v_data, v_errors = schema.load(data, many=many)
+        if v_errors:
+            return empty, v_errors
+        if many:
+            return [_fill_defaults(schema, item, v_item) for item, v_item in zip(data, v_data)], {}
+        return _fill_defaults(schema, data, v_data), {}
+
+    v_errors = schema.validate(data, many=many)
+    if v_errors:
+        return empty, v_errors
+    return schema.dump(data, many=many)
+
+
 # validate dict by schema
-def validate_by_schema(schema, data: dict) -> {dict, list}:
-    """ validate dict by marshmallow.Schema """
+def validate_by_schema(schema, data: dict, validator=None) -> {dict, list}:
+    """ validate dict by marshmallow.Schema
+
+    validator: compiled schema (see ajsonrpc.schema_compiler), used instead of marshmallow if set
+    """
     # validate-data, errors
     v_data, errors = {}, []
-    # validate
-    v_errors = schema.validate(data)
+    # validate and dump
+    v_data, v_errors = validator(data) if validator else load_by_schema(schema, data)
     if v_errors:
         errors.extend(calc_errors_from_vd(errors=v_errors, data_on_validate=data))
-    else:
-        v_data, v_errors = schema.dump(data)
-        if v_errors:
-            errors.extend(calc_errors_from_vd(errors=v_errors, data_on_validate=data))
     return v_data, errors
+
+
+def validate_many_by_schema(schema, data: list, validator=None) -> (list, int, list):
+    """ validate list of dicts by marshmallow.Schema in one pass
+
+    validator: compiled schema with many=True, used instead of marshmallow if set
+    return (validated data, index of the first invalid item, its errors)
+    """
+    v_data, v_errors = validator(data) if validator else load_by_schema(schema, data, many=True)
+    if not v_errors:
+        return v_data, None, []
+
+    indexes = [k for k in v_errors if isinstance(k, int)]
+    if not indexes:
+        return v_data, None, calc_errors_from_vd(errors=v_errors, data_on_validate=data)
+    index = min(indexes)
+    # item of not valid type is reported in '_schema' of the list
+    item_errors = v_errors[index] or {'_schema': v_errors.get('_schema', [])}
+    return v_data, index, calc_errors_from_vd(errors=item_errors, data_on_validate=data[index])
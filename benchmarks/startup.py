@@ -0,0 +1,300 @@
+"""Import-time and startup benchmark.
+
+Measures:
+    * import time of package modules, per ajsonrpc submodule (parsed from `python -X importtime`)
+    * registration of synthetic dispatchers with 10 / 1k / 10k methods, both as
+      plain add_class_method loop of existing callers and inside bulk_update()
+    * install_jsonrpc2_apis and Swagger generation (if aiohttp and marshmallow are installed)
+
+Timings are stored relative to a fixed pure python reference workload
+measured next to every run, so reports of different machines are comparable
+and slowdowns of the whole machine during a run cancel out.
+Writes JSON report and compares it with a stored baseline, exit code is 1 on regressions.
+Only import totals, registration and install timings are compared, import
+times of single submodules are too noisy and are reported only.
+
+Usage:
+    python benchmarks/startup.py --output startup-report.json --baseline benchmarks/startup-baseline.json
+    python benchmarks/startup.py --save-baseline benchmarks/startup-baseline.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+IMPORT_MODULES = (
+    'ajsonrpc',
+    'ajsonrpc.core',
+    'ajsonrpc.dispatcher',
+    'ajsonrpc.manager',
+    'ajsonrpc.backend.aiohttp_app',
+    'ajsonrpc.backend.aiohttp_app.jsonrpc2_installer',
+)
+METHODS_COUNTS = (10, 1000, 10000)
+
+# "import time: self [us] | cumulative | imported package"
+IMPORT_TIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+
+def parse_importtime(stderr: str) -> dict:
+    """{module: (self_us, cumulative_us)} of -X importtime output."""
+    result = {}
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            result[name] = (int(self_us), int(cumulative_us))
+    return result
+
+
+def measure_import(module: str, repeat: int) -> dict:
+    """Import of module in a fresh interpreter, best of repeat runs, relative to reference."""
+    best, best_reference = None, None
+    for _ in range(repeat):
+        reference = timed(reference_workload)
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        times = parse_importtime(proc.stderr)
+        if best is None or times[module][1] / reference < best[module][1] / best_reference:
+            best, best_reference = times, reference
+
+    def ratio(us: int) -> float:
+        return float(f'{us / 1e6 / best_reference:.4g}')
+
+    return dict(
+        total=ratio(best[module][1]),
+        submodules={
+            name: dict(self=ratio(self_us), cumulative=ratio(cumulative_us))
+            for name, (self_us, cumulative_us) in sorted(best.items())
+            if name.startswith('ajsonrpc')
+        },
+    )
+
+
+def synthetic_controller(count: int) -> type:
+    def make_method(i):
+        async def method(self):
+            return i, None
+        method.__name__ = f'method_{i}'
+        method.__doc__ = f'Synthetic method {i}'
+        return method
+
+    def __init__(self, request=None):
+        self.request = request
+
+    attrs = {f'method_{i}': make_method(i) for i in range(count)}
+    attrs['__init__'] = __init__
+    return type(f'Controller{count}', (), attrs)
+
+
+def reference_workload() -> None:
+    """Fixed pure python work (dicts, strings, calls), unit of relative timings."""
+    data = {f'key_{i}': i for i in range(100000)}
+    sorted(data, key=lambda key: data[key] % 97)
+
+
+def timed(func) -> float:
+    """Seconds of func call, GC is disabled while timing as timeit does."""
+    gc.collect()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        func()
+        return time.perf_counter() - started
+    finally:
+        gc.enable()
+
+
+def best_of(func, repeat: int, min_time: float = 0.02) -> float:
+    """Best of repeat runs of func relative to reference workload timed right before every run.
+
+    Fast functions are called several times per run, so every run takes at least min_time seconds.
+    """
+    number = max(1, int(min_time / max(timed(func), 1e-6)))
+
+    def calls():
+        for _ in range(number):
+            func()
+
+    best = None
+    for _ in range(repeat):
+        reference = timed(reference_workload)
+        ratio = timed(calls) / number / reference
+        best = ratio if best is None else min(best, ratio)
+    return float(f'{best:.4g}')
+
+
+def measure_registration(count: int, repeat: int) -> dict:
+    from ajsonrpc.dispatcher import Dispatcher
+
+    cls = synthetic_controller(count)
+    names = [f'method_{i}' for i in range(count)]
+
+    def add_class_methods():
+        # plain loop of existing callers, every method is a separate write
+        dispatcher = Dispatcher()
+        for name in names:
+            dispatcher.add_class_method(cls, name)
+        dispatcher.snapshot()
+
+    def add_class_methods_bulk():
+        dispatcher = Dispatcher()
+        with dispatcher.bulk_update():
+            for name in names:
+                dispatcher.add_class_method(cls, name)
+        dispatcher.snapshot()
+
+    def add_lazy_class_methods():
+        dispatcher = Dispatcher()
+        with dispatcher.bulk_update():
+            for name in names:
+                dispatcher.add_class_method('benchmarks.startup:Unused', name)
+
+    def add_class():
+        Dispatcher().add_class(cls)
+
+    return dict(
+        add_class_method=best_of(add_class_methods, repeat),
+        add_class_method_bulk=best_of(add_class_methods_bulk, repeat),
+        add_class_method_lazy=best_of(add_lazy_class_methods, repeat),
+        add_class=best_of(add_class, repeat),
+    )
+
+
+def measure_install(count: int, repeat: int) -> dict:
+    try:
+        from marshmallow import Schema, fields
+        from ajsonrpc.backend.aiohttp_app import Application, ApiCfg, install_jsonrpc2_apis
+        from ajsonrpc.backend.aiohttp_app.jsonrpc2_installer import generate_api_swagger
+    except ImportError as e:
+        return dict(skipped=str(e))
+
+    class ParamsSchema(Schema):
+        cid = fields.Integer(required=True)
+        name = fields.String()
+        tags = fields.List(fields.String())
+
+    cls = synthetic_controller(count)
+    methods = [dict(cls=cls, func_name=f'method_{i}', schema=ParamsSchema()) for i in range(count)]
+
+    def install(lazy_swagger: bool):
+        apis = install_jsonrpc2_apis(Application(), [
+            ApiCfg(title='bench', path='/api', methods=methods, lazy_swagger=lazy_swagger),
+        ])
+        return apis[0]
+
+    api = install(True)
+    api_cfg = ApiCfg(title='bench', path='/api', methods=methods)
+    return dict(
+        install=best_of(lambda: install(True), repeat),
+        install_with_swagger=best_of(lambda: install(False), repeat),
+        swagger=best_of(lambda: generate_api_swagger(api.manager.dispatcher, api_cfg), repeat),
+    )
+
+
+def flatten(report: dict, prefix: str = '') -> dict:
+    """{'a.b.c': timing} of nested report, metadata is skipped."""
+    result = {}
+    for key, value in report.items():
+        if key == 'meta':
+            continue
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            result.update(flatten(value, f'{name}.'))
+        elif isinstance(value, (int, float)):
+            result[name] = value
+    return result
+
+
+def gated(name: str) -> bool:
+    """Metric is compared with baseline: imports.<module>.total, registration.*, install.*"""
+    if name.startswith('imports.'):
+        return name.endswith('.total') and '.submodules.' not in name
+    return name.startswith(('registration.', 'install.'))
+
+
+def compare(report: dict, baseline: dict, tolerance: float, min_delta: float) -> list:
+    """Regressions: (metric, baseline, current) of gated metrics slower by more than tolerance and min_delta.
+
+    Reports are relative, min_delta is in reference units too.
+    """
+    current, previous = flatten(report), flatten(baseline)
+    regressions = []
+    for name, value in sorted(current.items()):
+        if not gated(name):
+            continue
+        base = previous.get(name)
+        if base is None:
+            continue
+        if value > base * (1 + tolerance) and value - base > min_delta:
+            regressions.append((name, base, value))
+    return regressions
+
+
+def run(args) -> (dict, float):
+    """(report relative to reference workload, best reference time in seconds)"""
+    reference = min(timed(reference_workload) for _ in range(max(args.repeat, 5)))
+    report = dict(
+        meta=dict(
+            python=sys.version.split()[0],
+            platform=platform.platform(),
+            repeat=args.repeat,
+            created=time.strftime('%Y-%m-%dT%H:%M:%S'),
+            units='reference workload time',
+        ),
+        imports={module: measure_import(module, args.repeat) for module in IMPORT_MODULES},
+        registration={str(count): measure_registration(count, args.repeat) for count in args.counts},
+        install={str(count): measure_install(count, args.repeat) for count in args.counts},
+    )
+    return report, reference
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ajsonrpc import-time and startup benchmark')
+    parser.add_argument('--output', help='path of JSON report')
+    parser.add_argument('--baseline', help='path of baseline JSON report to compare with')
+    parser.add_argument('--save-baseline', help='write report as new baseline')
+    parser.add_argument('--repeat', type=int, default=5, help='best of N runs')
+    parser.add_argument('--counts', type=int, nargs='+', default=METHODS_COUNTS, help='numbers of methods')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed relative slowdown')
+    parser.add_argument('--min-delta', type=float, default=0.002,
+                        help='ignore slowdowns less than seconds (on this machine)')
+    args = parser.parse_args()
+
+    report, reference = run(args)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                f.write(text + '\n')
+    if not args.output and not args.save_baseline:
+        print(text)
+
+    print(f'reference workload: {reference * 1000:.2f} ms')
+    for name, value in sorted(flatten(report).items()):
+        if gated(name):
+            print(f'{name:70} {value * reference * 1000:10.2f} ms {value:10.2f} x')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.min_delta / reference)
+        for name, base, value in regressions:
+            print(f'REGRESSION {name}: {base:.2f} x -> {value:.2f} x of reference')
+        if regressions:
+            sys.exit(1)
+        print(f'no regressions against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
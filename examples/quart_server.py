@@ -5,7 +5,7 @@ app = Quart("Example App")
 app.api = JSONRPCQuart()
 app.route("/jsonrpc", methods=["POST",])(app.api.handler)
 
-@app.api.add_function
+@app.api.add_function(pass_params=True)
 async def add(a, b):
     return a + b
 
@@ -5,7 +5,7 @@ app = Sanic("Example App")
 api = JSONRPCSanic()
 app.route("/jsonrpc", methods=["POST",])(api.handler)
 
-@api.add_function
+@api.add_function(pass_params=True)
 async def add(a, b):
     return a + b
 
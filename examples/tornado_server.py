@@ -4,7 +4,7 @@ from ajsonrpc.backend.tornado import JSONRPCTornado
 
 api = JSONRPCTornado()
 
-@api.add_function
+@api.add_function(pass_params=True)
 async def add(a, b):
     return a + b
 